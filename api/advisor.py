@@ -0,0 +1,174 @@
+import json
+import re
+import statistics
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from app.models import CustomUser
+
+# Requests replayed when no capture file is given: the hot read paths of api/urls.py
+DEFAULT_REQUESTS = [
+    {'method': 'GET', 'path': '/api/all_recipes/'},
+    {'method': 'GET', 'path': '/api/all_recipes/?pagination=cursor'},
+    {'method': 'GET', 'path': '/api/all_recipes/?ordering=-rating'},
+    {'method': 'GET', 'path': '/api/all_recipes/my_recipes/', 'user': '*chef'},
+    {'method': 'GET', 'path': '/api/all_recipes/{recipe}/reviews/?pagination=cursor', 'user': '*any'},
+    {'method': 'GET', 'path': '/api/my_favourites/', 'user': '*any'},
+    {'method': 'GET', 'path': '/api/products/?category={product_category}&pagination=cursor'},
+    {'method': 'GET', 'path': '/api/orders/?pagination=cursor'},
+]
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHERE_COLUMN_RE = r'"{table}"\."(\w+)"\s*(?:=|IN\b)'
+FROM_TABLE_RE = re.compile(r'\bFROM "(\w+)"')
+ORDER_COLUMN_RE = r'"{table}"\."(\w+)"\s*(ASC|DESC)'
+
+
+def load_requests(path):
+    """Read a capture file: a JSON list, or NDJSON with one request per line."""
+    with open(path, encoding='utf-8') as handle:
+        content = handle.read().strip()
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def _placeholders():
+    """Values for the {recipe}/{product_category} placeholders of DEFAULT_REQUESTS."""
+    from app.models import Recipe, ProductCategories
+    return {
+        'recipe': Recipe.objects.order_by('pk').values_list('pk', flat=True).first() or 0,
+        'product_category': ProductCategories.objects.order_by('pk').values_list('pk', flat=True).first() or 0,
+    }
+
+
+def _resolve_user(name):
+    if not name:
+        return None
+    if name == '*chef':
+        return CustomUser.objects.filter(recipes__isnull=False).first()
+    if name == '*any':
+        return CustomUser.objects.filter(favorites__isnull=False).first() or CustomUser.objects.first()
+    return CustomUser.objects.filter(username=name).first()
+
+
+def capture_sql(requests):
+    """Replay requests through the test client and collect every SQL statement they ran."""
+    placeholders = _placeholders()
+    statements = []
+    for spec in requests:
+        client = APIClient(HTTP_HOST='localhost')
+        user = _resolve_user(spec.get('user'))
+        if user is not None:
+            client.force_authenticate(user=user)
+        path = spec['path'].format(**placeholders)
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, spec.get('method', 'GET').lower())(path, spec.get('data'), format='json')
+        statements.extend(
+            {'request': f'{spec.get("method", "GET")} {path}', 'status': response.status_code, 'sql': query['sql']}
+            for query in captured.captured_queries
+        )
+    return statements
+
+
+def normalize(sql):
+    return LITERAL_RE.sub('?', sql)
+
+
+def explain(sql):
+    """Return [(table, problem)] for sequential scans and index-less sorts in the query plan."""
+    findings = []
+    main_table = FROM_TABLE_RE.search(sql)
+    main_table = main_table.group(1) if main_table else None
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            stack = [plan[0]['Plan']]
+            while stack:
+                node = stack.pop()
+                if node.get('Node Type') == 'Seq Scan':
+                    findings.append((node['Relation Name'], 'seq scan'))
+                elif node.get('Node Type') in ('Sort', 'Incremental Sort') and main_table:
+                    findings.append((main_table, 'sort'))
+                stack.extend(node.get('Plans', []))
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            for *_, detail in cursor.fetchall():
+                match = re.match(r'SCAN (\w+)', detail)
+                if match and 'USING' not in detail and not match.group(1).endswith('_fts'):
+                    findings.append((match.group(1), 'seq scan'))
+                elif detail.startswith('USE TEMP B-TREE FOR ORDER BY') and main_table:
+                    findings.append((main_table, 'sort'))
+    return findings
+
+
+def time_query(sql, repeat):
+    timings = []
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def propose_index(table, sql):
+    """Equality/IN columns first, then ORDER BY columns: the shape of a composite B-tree index."""
+    where = sql.split(' WHERE ', 1)[1] if ' WHERE ' in sql else ''
+    where = where.split(' ORDER BY ', 1)[0]
+    columns = []
+    for column in re.findall(WHERE_COLUMN_RE.format(table=table), where):
+        if column not in columns and column != 'id':
+            columns.append(column)
+    order = sql.split(' ORDER BY ', 1)[1] if ' ORDER BY ' in sql else ''
+    for column, direction in re.findall(ORDER_COLUMN_RE.format(table=table), order):
+        entry = f'-{column}' if direction == 'DESC' else column
+        if column not in columns and entry not in columns and column != 'id':
+            columns.append(entry)
+    return tuple(columns)
+
+
+def analyze(requests, repeat=5):
+    """
+    Replay, EXPLAIN and time every distinct statement. Returns a report with the
+    statements that scan whole tables and the composite indexes that would avoid them.
+    """
+    seen, findings = set(), []
+    proposals = defaultdict(lambda: {'queries': 0, 'total_ms': 0.0, 'examples': []})
+    for statement in capture_sql(requests):
+        shape = normalize(statement['sql'])
+        if shape in seen or not statement['sql'].lstrip().upper().startswith('SELECT'):
+            continue
+        seen.add(shape)
+        problems = explain(statement['sql'])
+        if not problems:
+            continue
+        elapsed = time_query(statement['sql'], repeat)
+        proposed = set()
+        for table, problem in problems:
+            columns = propose_index(table, statement['sql'])
+            findings.append({**statement, 'table': table, 'problem': problem, 'median_ms': round(elapsed, 3),
+                             'proposed_index': list(columns)})
+            if columns and (table, columns) not in proposed:
+                proposed.add((table, columns))
+                proposal = proposals[(table, columns)]
+                proposal['queries'] += 1
+                proposal['total_ms'] += elapsed
+                if len(proposal['examples']) < 3:
+                    proposal['examples'].append(statement['request'])
+    return {
+        'statements': len(seen),
+        'findings': findings,
+        'proposals': [
+            {'table': table, 'fields': list(columns), 'queries': data['queries'],
+             'total_ms': round(data['total_ms'], 3), 'examples': data['examples']}
+            for (table, columns), data in sorted(proposals.items(), key=lambda item: -item[1]['total_ms'])
+        ],
+    }
@@ -0,0 +1,193 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.http import Http404
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.pagination import LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from . import views
+from .caching import CachedListMixin
+from .conditional import ConditionalGetMixin
+from .facets import FacetedListMixin
+from .fastpath import fast_queryset, fast_serializer
+from .paginations import KeysetOptInMixin
+
+
+async def apaginate(paginator, queryset, request):
+    """
+    paginate_queryset() of a page number or limit/offset paginator with the COUNT and the page
+    query run through the async ORM. Leaves the paginator ready for get_paginated_response().
+    """
+    if isinstance(paginator, PageNumberPagination):
+        paginator.request = request
+        page_size = paginator.get_page_size(request)
+        if not page_size:
+            return None
+        django_paginator = paginator.django_paginator_class(queryset, page_size)
+        django_paginator.count = await queryset.acount()  # Fills the cached_property page() reads
+        page_number = paginator.get_page_number(request, django_paginator)
+        try:
+            page = django_paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(paginator.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        page.object_list = [row async for row in page.object_list]
+        if django_paginator.num_pages > 1 and paginator.template is not None:
+            paginator.display_page_controls = True
+        paginator.page = page
+        return page.object_list
+
+    if isinstance(paginator, LimitOffsetPagination):
+        paginator.request = request
+        paginator.limit = paginator.get_limit(request)
+        if paginator.limit is None:
+            return None
+        paginator.count = await queryset.acount()
+        paginator.offset = paginator.get_offset(request)
+        if paginator.count > paginator.limit and paginator.template is not None:
+            paginator.display_page_controls = True
+        if paginator.count == 0 or paginator.offset > paginator.count:
+            return []
+        return [row async for row in queryset[paginator.offset:paginator.offset + paginator.limit]]
+
+    raise TypeError(f'{type(paginator).__name__} has no async twin')
+
+
+def _fast_path(view, request):
+    """The FastSerializer for this request, or None when the viewset's own code has to answer it."""
+    paginator = view.paginator
+    if isinstance(paginator, KeysetOptInMixin) and paginator.wants_keyset(request):
+        return None  # Cursor pages (and ?count=estimate's EXPLAIN) stay on the sync paginator
+    if isinstance(view, FacetedListMixin) and view.requested_facets(request):
+        return None  # The facet aggregates are added by the viewset's list()
+    if paginator is not None and not isinstance(paginator, (PageNumberPagination, LimitOffsetPagination)):
+        return None
+    return fast_serializer(view)
+
+
+def _prepare_list(view, request, *args, **kwargs):
+    """
+    The synchronous part of a list request, in one thread hop: authentication, permissions,
+    conditional GET, the response cache and the filtered queryset (filter validation and ranked
+    search may query). Returns (response, None) when that settles it, else (None, (fast, queryset)).
+    Requests the fast path can't reproduce are answered here by the viewset's own list().
+    """
+    view.initial(request, *args, **kwargs)
+    fast = _fast_path(view, request)
+    if fast is None:
+        return view.list(request, *args, **kwargs), None
+    if isinstance(view, ConditionalGetMixin):
+        etag, last_modified, not_modified = view.validators = view.list_validators(request)
+        if not_modified is not None:
+            return view._validated(not_modified, etag, last_modified), None
+    if isinstance(view, CachedListMixin):
+        response = view.cached_list(request)
+        if response is not None:
+            return _with_validators(view, response), None
+    return None, (fast, fast_queryset(view, fast))
+
+
+def _with_validators(view, response):
+    if isinstance(view, ConditionalGetMixin):
+        return view._validated(response, *view.validators[:2])
+    return response
+
+
+def _finish_list(view, request, response):
+    if isinstance(view, CachedListMixin):
+        response = view.cache_list(request, response)
+    return _with_validators(view, response)
+
+
+async def _list(view, request, *args, **kwargs):
+    response, plan = await sync_to_async(_prepare_list)(view, request, *args, **kwargs)
+    if plan is None:
+        return response
+
+    fast, queryset = plan
+    page = await apaginate(view.paginator, queryset, request) if view.paginator is not None else None
+    if page is not None:
+        response = view.get_paginated_response(await fast.aserialize(page))
+    else:
+        response = Response(await fast.aserialize([row async for row in queryset]))
+    return await sync_to_async(_finish_list)(view, request, response)
+
+
+def _prepare_detail(view, request, *args, **kwargs):
+    """The synchronous part of a retrieve request; (response, None) or (None, (fast, filtered queryset))."""
+    view.initial(request, *args, **kwargs)
+    fast = fast_serializer(view) if isinstance(view, ConditionalGetMixin) and view.detail_modified_field else None
+    if fast is None:
+        return view.retrieve(request, *args, **kwargs), None
+    return None, (fast, view.filter_queryset(view.get_queryset()).prefetch_related(None))
+
+
+async def _retrieve(view, request, *args, **kwargs):
+    response, plan = await sync_to_async(_prepare_detail)(view, request, *args, **kwargs)
+    if plan is None:
+        return response
+
+    fast, queryset = plan
+    lookup = view.kwargs[view.lookup_url_kwarg or view.lookup_field]
+    try:
+        instance = await queryset.aget(**{view.lookup_field: lookup})
+    except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):  # As get_object_or_404()
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+    view.check_object_permissions(request, instance)
+
+    etag, last_modified, not_modified = await sync_to_async(view.detail_validators)(
+        request, getattr(instance, view.detail_modified_field))
+    if not_modified is not None:
+        return view._validated(not_modified, etag, last_modified)
+
+    # The row and every relation of the body are independent queries
+    pk = instance.pk
+    row, maps = await asyncio.gather(
+        queryset.values(*fast.columns).aget(pk=pk),
+        fast.afetch_relations([pk]),
+    )
+    return view._validated(Response(fast.serialize([row], maps)[0]), etag, last_modified)
+
+
+HANDLERS = {'list': _list, 'retrieve': _retrieve}
+
+
+def as_async_view(viewset_class, action):
+    """
+    An async view answering GET/HEAD like `viewset_class`'s `action` ('list' or 'retrieve'):
+    the same authentication, permissions, filters, pagination, response cache, conditional GET
+    and bytes. Rows and relations are read through the async ORM, relations concurrently, so
+    the event loop serves other requests while they are in flight.
+    """
+    handler = HANDLERS[action]
+
+    async def view(request, *args, **kwargs):
+        # ViewSetMixin.as_view() and APIView.dispatch(), minus the synchronous handler call
+        self = viewset_class()
+        self.action_map = {'get': action, 'head': action}
+        self.args, self.kwargs = args, kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            if request.method.lower() not in self.action_map:
+                raise MethodNotAllowed(request.method)
+            response = await handler(self, request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    view.cls = viewset_class
+    view.actions = {'get': f'{action}_async', 'head': f'{action}_async'}  # Labels in api.metrics
+    return csrf_exempt(view)
+
+
+recipe_list = as_async_view(views.RecipeViewSet, 'list')
+recipe_detail = as_async_view(views.RecipeViewSet, 'retrieve')
+product_list = as_async_view(views.ProductViewSet, 'list')
+tag_list = as_async_view(views.TagViewSet, 'list')
+category_list = as_async_view(views.CategoryViewSet, 'list')
+review_list = as_async_view(views.ReviewViewSet, 'list')
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from app.models import CustomUser
+
+TOKEN_VERSION_KEY = 'rapi:token-version:{}'
+
+
+def current_token_version(user_id):
+    """The user's token_version, cached; None when the user no longer exists."""
+    key = TOKEN_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = CustomUser.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, timeout=settings.TOKEN_VERSION_CACHE_TIMEOUT)  # Bounds staleness if a delete is missed
+    return version
+
+
+def forget_token_version(user_id):
+    """Drop the cached version after token_version was written, so this worker checks the new one."""
+    cache.delete(TOKEN_VERSION_KEY.format(user_id))
+
+
+def revoke_tokens(user_id):
+    """Invalidate every access token issued to the user so far (their claims are out of date)."""
+    CustomUser.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    forget_token_version(user_id)
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Embeds the authorization claims that StatelessJWTAuthentication trusts."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['username'] = user.username
+        token['role'] = user.role
+        token['token_version'] = user.token_version
+        return token
+
+
+class TokenPrincipal(TokenUser):
+    """request.user built from the access token's claims, without a database row."""
+
+    @property
+    def role(self):
+        return self.token.get('role')
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """simplejwt's user lookup, rejecting tokens issued before the user's claims last changed."""
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        version = validated_token.get('token_version')
+        if version is not None and version != user.token_version:
+            raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+        return user
+
+
+class StatelessJWTAuthentication(VersionedJWTAuthentication):
+    """
+    With STATELESS_JWT on, safe requests carrying role claims authenticate as a TokenPrincipal:
+    no CustomUser query, only a cached token_version check so role changes revoke old tokens.
+    Unsafe requests still load the user, since views save it onto rows. Only set on views whose
+    safe actions read nothing but request.user's id and role; the default (djoser's
+    /auth/users/me/, UserViewSet, ...) loads the whole user.
+    """
+
+    def authenticate(self, request):
+        self.stateless = settings.STATELESS_JWT and request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        version = validated_token.get('token_version')
+        if self.stateless and version is not None and 'role' in validated_token:
+            if current_token_version(validated_token['user_id']) != version:
+                raise AuthenticationFailed('Token has been revoked.', code='token_revoked')
+            return TokenPrincipal(validated_token)
+        return super().get_user(validated_token)
@@ -0,0 +1,429 @@
+import asyncio
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.urls import URLResolver, reverse
+from rest_framework.test import APIClient
+
+from app.models import (
+    CustomUser, Favorite, IngredientModel, IngredientName, Order, OrderItem, Product, Recipe, RoleRequest,
+)
+from .authentication import RoleTokenObtainPairSerializer
+from .indexes import InMemoryIndex
+
+# One entry per (url name, method) exercised by bench_api. `kwargs`, `query` and `data` may use the
+# {placeholders} of benchmark_context(); `write` entries run in a rolled-back transaction so every
+# iteration sees the same dataset.
+ROUTES = [
+    {'name': 'api-root', 'method': 'get'},
+    {'name': 'recipes-list', 'method': 'get', 'query': '?limit=20'},
+    {'name': 'recipes-list', 'label': 'recipes-list-cursor', 'method': 'get', 'query': '?pagination=cursor'},
+    {'name': 'recipes-list', 'label': 'recipes-list-search', 'method': 'get', 'query': '?search=Recipe 1'},
+    {'name': 'recipes-list', 'label': 'recipes-list-facets', 'method': 'get', 'query': '?facets=categories,tags,ingredients_used'},
+    {'name': 'recipes-detail', 'method': 'get', 'kwargs': {'pk': '{recipe}'}},
+    {'name': 'recipes-my-recipes', 'method': 'get', 'user': 'chef'},
+    {'name': 'recipes-pantry', 'method': 'get', 'query': '?ingredients={pantry}'},
+    {'name': 'recipes-similar', 'method': 'get', 'kwargs': {'pk': '{recipe}'}},
+    {'name': 'recipes-more-like-this', 'method': 'get', 'kwargs': {'pk': '{recipe}'}},
+    {'name': 'recipes-bulk-export', 'method': 'get', 'user': 'admin'},
+    {'name': 'recipes-by-tags', 'method': 'get', 'query': '?tags={tag}'},
+    {'name': 'recipe_ingredients_model-list', 'method': 'get', 'user': 'chef', 'kwargs': {'recipe_pk': '{recipe}'}},
+    {'name': 'recipe_ingredients_model-detail', 'method': 'get', 'user': 'chef',
+     'kwargs': {'recipe_pk': '{recipe}', 'pk': '{ingredient_model}'}},
+    {'name': 'recipe_reviews-list', 'method': 'get', 'user': 'user', 'kwargs': {'recipe_pk': '{recipe}'}},
+    {'name': 'recipe_reviews-detail', 'method': 'get', 'user': 'user', 'kwargs': {'recipe_pk': '{recipe}', 'pk': '{review}'}},
+    {'name': 'ingredients-list', 'method': 'get'},
+    {'name': 'ingredients-detail', 'method': 'get', 'kwargs': {'pk': '{ingredient}'}},
+    {'name': 'users-list', 'method': 'get', 'user': 'admin'},
+    {'name': 'users-detail', 'method': 'get', 'user': 'admin', 'kwargs': {'pk': '{user}'}},
+    {'name': 'Tags-list', 'method': 'get'},
+    {'name': 'Tags-detail', 'method': 'get', 'kwargs': {'pk': '{tag}'}},
+    {'name': 'categories-list', 'method': 'get'},
+    {'name': 'categories-detail', 'method': 'get', 'kwargs': {'pk': '{category}'}},
+    {'name': 'favourites-list', 'method': 'get', 'user': 'user'},
+    {'name': 'favourites-detail', 'method': 'get', 'user': 'user', 'kwargs': {'pk': '{favorite}'}},
+    {'name': 'favourites-recommended', 'method': 'get', 'user': 'user'},
+    {'name': 'role-requests-list', 'method': 'get', 'user': 'admin'},
+    {'name': 'role-requests-detail', 'method': 'get', 'user': 'admin', 'kwargs': {'pk': '{role_request}'}},
+    {'name': 'product-list', 'method': 'get'},
+    {'name': 'product-list', 'label': 'product-list-category', 'method': 'get', 'query': '?category={product_category}'},
+    {'name': 'product-detail', 'method': 'get', 'kwargs': {'pk': '{product}'}},
+    {'name': 'productcategories-list', 'method': 'get'},
+    {'name': 'productcategories-detail', 'method': 'get', 'kwargs': {'pk': '{product_category}'}},
+    {'name': 'order-list', 'method': 'get', 'query': '?limit=20'},
+    {'name': 'order-detail', 'method': 'get', 'kwargs': {'pk': '{order}'}},
+    {'name': 'order-export', 'method': 'get', 'user': 'admin', 'query': '?export_format=ndjson&status=pending'},
+    {'name': 'orderitem-list', 'method': 'get', 'query': '?limit=20'},
+    {'name': 'orderitem-detail', 'method': 'get', 'kwargs': {'pk': '{order_item}'}},
+    {'name': 'metrics', 'method': 'get', 'user': 'admin'},
+    {'name': 'typeahead', 'method': 'get', 'query': '?q=ing'},
+    {'name': 'async-recipes-list', 'method': 'get'},
+    {'name': 'async-recipes-detail', 'method': 'get', 'kwargs': {'pk': '{recipe}'}},
+    {'name': 'async-recipe-reviews-list', 'method': 'get', 'user': 'user', 'kwargs': {'recipe_pk': '{recipe}'}},
+    {'name': 'async-product-list', 'method': 'get'},
+    {'name': 'async-tags-list', 'method': 'get'},
+    {'name': 'async-categories-list', 'method': 'get'},
+    # Writes
+    {'name': 'recipes-list', 'label': 'recipes-create', 'method': 'post', 'user': 'chef', 'write': True,
+     'data': {'title': 'Benchmark stew', 'description': 'Slow', 'instructions': 'Stir',
+              'ingredients_used': ['{ingredient_name}'], 'tags': ['{tag_name}'], 'categories': '{category_name}',
+              'author': '{chef_username}'}},
+    {'name': 'recipes-detail', 'label': 'recipes-update', 'method': 'patch', 'user': 'chef', 'write': True,
+     'kwargs': {'pk': '{recipe}'}, 'data': {'title': 'Renamed for the benchmark'}},
+    {'name': 'recipe_reviews-list', 'label': 'reviews-create', 'method': 'post', 'user': 'user', 'write': True,
+     'kwargs': {'recipe_pk': '{recipe}'}, 'data': {'user': '{user}', 'recipe': '{recipe}', 'rating': 4, 'comment': 'Good'}},
+    {'name': 'order-checkout', 'method': 'post', 'user': 'user', 'write': True,
+     'data': {'items': [{'product': '{product}', 'quantity': 1}]}},
+    {'name': 'recipes-bulk-import', 'method': 'post', 'user': 'admin', 'write': True, 'content_type': 'application/x-ndjson',
+     'body': '{{"title": "Imported for the benchmark", "author": "{chef_username}", "tags": ["{tag_name}"], '
+             '"ingredients_used": ["{ingredient_name}"], "ingredients": [{{"name": "{ingredient_name}", "quantity": "1"}}]}}\n'},
+    {'name': 'role-requests-approve', 'method': 'get', 'user': 'admin', 'write': True, 'kwargs': {'pk': '{role_request}'}},
+    {'name': 'recipe_ingredients_model-bulk-replace', 'method': 'put', 'user': 'chef', 'write': True,
+     'kwargs': {'recipe_pk': '{recipe}'}, 'data': [{'name': '{ingredient}', 'quantity': '2', 'unit': 'cups'}]},
+]
+
+
+def benchmark_context():
+    """Ids and users the ROUTES placeholders refer to, picked from the seeded dataset."""
+    recipe = Recipe.objects.filter(reviews__isnull=False, ingredient_model_set__isnull=False).order_by('pk').first()
+    favorite = Favorite.objects.order_by('pk').first()
+    product = Product.objects.order_by('-stock', 'pk').first()
+    admin = CustomUser.objects.filter(role='admin').order_by('pk').first() or \
+        CustomUser.objects.create_user(username='bench-admin', email='bench-admin@example.com', password='bench', role='admin')
+    role_request = RoleRequest.objects.filter(approved=False).first() or \
+        RoleRequest.objects.create(user=favorite.user, requested_role='chef')
+    users = {'admin': admin, 'chef': recipe.author, 'user': favorite.user}
+    tag = recipe.tags.order_by('pk').first()
+    ingredient = IngredientName.objects.order_by('pk').first()
+    ids = {
+        'recipe': recipe.pk, 'chef': recipe.author_id, 'user': favorite.user_id, 'favorite': favorite.pk,
+        'review': recipe.reviews.order_by('pk').first().pk,
+        'ingredient_model': recipe.ingredient_model_set.order_by('pk').first().pk,
+        'ingredient': ingredient.pk, 'ingredient_name': ingredient.name,
+        'pantry': ','.join(str(pk) for pk in IngredientModel.objects.filter(recipe=recipe).values_list('name_id', flat=True)),
+        'tag': tag.pk, 'tag_name': tag.name, 'category': recipe.categories_id, 'category_name': recipe.categories.name,
+        'chef_username': recipe.author.username,
+        'product': product.pk, 'product_category': product.category_id,
+        'order': Order.objects.order_by('pk').first().pk, 'order_item': OrderItem.objects.order_by('pk').first().pk,
+        'role_request': role_request.pk,
+    }
+    return users, ids
+
+
+def _fill(value, ids):
+    """Substitute placeholders; a value that is exactly one placeholder keeps the id's type."""
+    if isinstance(value, str):
+        if value.startswith('{') and value.endswith('}') and value[1:-1] in ids:
+            return ids[value[1:-1]]
+        return value.format(**ids)
+    if isinstance(value, list):
+        return [_fill(item, ids) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, ids) for key, item in value.items()}
+    return value
+
+
+def uncovered_routes():
+    """URL names in api.urls that no ROUTES entry exercises."""
+    from api.urls import urlpatterns
+    return set(_names(urlpatterns)) - {route['name'] for route in ROUTES}
+
+
+def _names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+class QueryCounter:
+    """execute_wrapper counting statements; unlike CaptureQueriesContext it has no 9000-query log cap."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _request(client, route, ids):
+    url = reverse(route['name'], kwargs=_fill(route.get('kwargs', {}), ids)) + _fill(route.get('query', ''), ids)
+    send = getattr(client, route['method'])
+    if 'body' in route:
+        response = send(url, data=route['body'].format(**ids), content_type=route['content_type'])
+    elif 'data' in route:
+        response = send(url, _fill(route['data'], ids), format='json')
+    else:
+        response = send(url)
+    if response.streaming:
+        b''.join(response.streaming_content)  # Producing the body is part of the cost
+    return response
+
+
+def _timed_request(client, route, ids):
+    started = time.perf_counter()
+    if route.get('write'):
+        with transaction.atomic():
+            response = _request(client, route, ids)
+            transaction.set_rollback(True)
+    else:
+        response = _request(client, route, ids)
+    return response, time.perf_counter() - started
+
+
+def percentile(ordered, share):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def run_benchmarks(iterations=50, warmup=5, only=None):
+    """
+    Drive every ROUTES entry through the test client; the first warmup request records the query count.
+    Returns {label: {status, queries, rps, p50_ms, p95_ms, p99_ms}}.
+    """
+    cache.clear()
+    InMemoryIndex.reset_all()
+    users, ids = benchmark_context()
+    results = {}
+    for route in ROUTES:
+        label = route.get('label', route['name'])
+        if only and not any(part in label for part in only):
+            continue
+        client = APIClient()
+        if route.get('user'):
+            client.force_authenticate(user=users[route['user']])
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response, _ = _timed_request(client, route, ids)
+        for _ in range(max(0, warmup - 1)):
+            _timed_request(client, route, ids)
+        timings = sorted(_timed_request(client, route, ids)[1] for _ in range(iterations))
+        if route.get('write'):
+            # Signal receivers patched the rolled-back rows into the indexes; rebuild them from the database
+            InMemoryIndex.reset_all()
+        results[label] = {
+            'status': response.status_code,
+            'queries': counter.count,
+            'rps': round(len(timings) / sum(timings), 1),
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        }
+    return results
+
+
+def compare(results, baseline, threshold=0.25, min_delta_ms=1.0):
+    """
+    Regressions against a saved baseline: more queries than before, or a p50 more than
+    `threshold` slower (ignoring differences under `min_delta_ms`, which are timer noise).
+    """
+    regressions = []
+    for label, current in results.items():
+        previous = baseline.get(label)
+        if previous is None:
+            continue
+        if current['queries'] > previous['queries']:
+            regressions.append(f'{label}: {previous["queries"]} -> {current["queries"]} queries')
+        slower = current['p50_ms'] - previous['p50_ms']
+        if slower > min_delta_ms and current['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+            regressions.append(f'{label}: p50 {previous["p50_ms"]}ms -> {current["p50_ms"]}ms')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump({'meta': meta, 'routes': results}, handle, indent=2, sort_keys=True)
+
+
+# Sync endpoints and their api.async_views twins, driven concurrently by bench_asgi
+CONCURRENCY_ROUTES = [
+    {'label': 'recipes-list', 'sync': 'recipes-list', 'async': 'async-recipes-list'},
+    {'label': 'recipes-detail', 'sync': 'recipes-detail', 'async': 'async-recipes-detail', 'kwargs': {'pk': '{recipe}'}},
+    {'label': 'reviews-list', 'sync': 'recipe_reviews-list', 'async': 'async-recipe-reviews-list', 'user': 'user',
+     'kwargs': {'recipe_pk': '{recipe}'}},
+    {'label': 'product-list', 'sync': 'product-list', 'async': 'async-product-list'},
+    {'label': 'tags-list', 'sync': 'Tags-list', 'async': 'async-tags-list'},
+    {'label': 'categories-list', 'sync': 'categories-list', 'async': 'async-categories-list'},
+]
+
+
+class LatencyInjector:
+    """
+    execute_wrapper sleeping `seconds` before every statement, on every connection opened while
+    installed (each thread has its own), so an in-process database behaves like one across a network.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def _install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            # Outermost: connection.execute_wrapper() pops the last entry on exit, whatever it is
+            connection.execute_wrappers.insert(0, self)
+
+    def __enter__(self):
+        if self.seconds:
+            connection_created.connect(self._install)
+            for wrapper in connections.all(initialized_only=True):
+                self._install(None, wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self._install)
+        for wrapper in connections.all(initialized_only=True):
+            if self in wrapper.execute_wrappers:
+                wrapper.execute_wrappers.remove(self)
+
+
+def _headers(user):
+    if user is None:
+        return {}
+    return {'authorization': f'JWT {RoleTokenObtainPairSerializer.get_token(user).access_token}'}
+
+
+def wsgi_get(application, path, query='', headers=None):
+    """GET through a WSGI callable the way a server worker does; returns the status code."""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'testserver', 'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ[f'HTTP_{name.upper().replace("-", "_")}'] = value
+    status = []
+    body = application(environ, lambda line, response_headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()  # Sends request_finished, as servers do
+    return status[0]
+
+
+async def asgi_get(application, path, query='', headers=None):
+    """GET through an ASGI callable the way an ASGI server does; returns the status code."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), *((name.encode(), value.encode()) for name, value in (headers or {}).items())],
+        'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    received, disconnected, status = [], asyncio.Event(), []
+
+    async def receive():
+        if received:
+            await disconnected.wait()  # The client stays connected until cancelled
+            return {'type': 'http.disconnect'}
+        received.append(True)
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def _summary(timings, statuses, elapsed):
+    timings.sort()
+    return {
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'errors': sum(1 for status in statuses if status >= 400),
+    }
+
+
+def run_wsgi_clients(application, target, clients, requests, threads):
+    """
+    `clients` closed-loop clients sending `requests` GETs each to a WSGI worker with `threads`
+    threads (gunicorn's gthread model): a request waits for a free thread, and that wait counts.
+    """
+    path, query, headers = target
+    slots = threading.BoundedSemaphore(threads)
+    timings, statuses = [], []
+
+    def client(index):
+        for number in range(requests):
+            started = time.perf_counter()
+            with slots:
+                status = wsgi_get(application, path, query.format(n=f'{index}-{number}'), headers)
+            timings.append(time.perf_counter() - started)
+            statuses.append(status)
+        connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    return _summary(timings, statuses, time.perf_counter() - started)
+
+
+def run_asgi_clients(application, target, clients, requests):
+    """`clients` closed-loop clients sending `requests` GETs each to one ASGI event loop."""
+    path, query, headers = target
+    timings, statuses = [], []
+
+    async def client(index):
+        for number in range(requests):
+            started = time.perf_counter()
+            statuses.append(await asgi_get(application, path, query.format(n=f'{index}-{number}'), headers))
+            timings.append(time.perf_counter() - started)
+
+    async def main():
+        await asyncio.gather(*(client(index) for index in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return _summary(timings, statuses, time.perf_counter() - started)
+
+
+def run_concurrency(wsgi_application, asgi_application, clients, requests=20, threads=4, cold=True, only=None):
+    """
+    Throughput and latency of each CONCURRENCY_ROUTES pair: the sync endpoint through the WSGI
+    application, its async twin through the ASGI one, at each client count. With `cold`, every
+    request carries a distinct query parameter, so the response cache never answers it.
+    Returns {label: {clients: {'wsgi': summary, 'asgi': summary}}}.
+    """
+    cache.clear()
+    users, ids = benchmark_context()
+    results = {}
+    for route in CONCURRENCY_ROUTES:
+        if only and not any(part in route['label'] for part in only):
+            continue
+        kwargs = _fill(route.get('kwargs', {}), ids)
+        query = _fill(route.get('query', ''), ids)
+        if cold:
+            query = f'{query}&_bench={{n}}' if query else '_bench={n}'
+        headers = _headers(users.get(route.get('user')))
+        sync_target = (reverse(route['sync'], kwargs=kwargs), query, headers)
+        async_target = (reverse(route['async'], kwargs=kwargs), query, headers)
+        results[route['label']] = {
+            count: {
+                'wsgi': run_wsgi_clients(wsgi_application, sync_target, count, requests, threads),
+                'asgi': run_asgi_clients(asgi_application, async_target, count, requests),
+            }
+            for count in clients
+        }
+    return results
@@ -0,0 +1,306 @@
+import json
+
+from django.db import DatabaseError, transaction
+from django.db.models import Prefetch
+
+from app.models import Category, CustomUser, IngredientModel, IngredientName, PostImage, Recipe, Tag
+from .caching import bump_version
+from .indexes import RECIPE_ALTERNATIVES, RECIPE_ROWS
+from .search import recipe_index
+
+INGREDIENT_FIELDS = ('quantity', 'unit', 'order', 'alternative_ingredient_quantity', 'alternative_ingredient_unit')
+
+
+class RecordError(Exception):
+    pass
+
+
+class IngredientListError(Exception):
+    """Raised with one entry per list item naming an unknown or repeated ingredient."""
+    def __init__(self, errors):
+        super().__init__('Invalid ingredient list')
+        self.errors = errors
+
+
+def iter_chunks(lines, chunk_size):
+    """Group an iterable of NDJSON lines (str or bytes) into [(line number, raw line), ...] chunks."""
+    chunk = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        chunk.append((number, line))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resolve_names(model, names):
+    """Map names to ids, creating the missing rows in one bulk insert."""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    resolved = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names - resolved.keys()
+    if missing:
+        # ignore_conflicts: a concurrent import may have created the same names in between
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        resolved.update(model.objects.filter(name__in=missing).values_list('name', 'id'))
+        bump_version(model)
+    return resolved
+
+
+def check_text(value, model, field, label, required=False):
+    """A string within the column's max_length, or (unless required) null."""
+    if value is None and not required:
+        return
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise RecordError(f'"{label}" must be a {"non-empty " if required else ""}string.')
+    max_length = model._meta.get_field(field).max_length
+    if max_length is not None and len(value) > max_length:
+        raise RecordError(f'"{label}" is longer than {max_length} characters.')
+
+
+def parse_record(raw):
+    """Decode one line and check every value's type and length, so bad records fail here rather than in the database."""
+    if isinstance(raw, bytes):
+        try:
+            raw = raw.decode('utf-8')
+        except UnicodeDecodeError as exc:
+            raise RecordError(f'Invalid UTF-8: {exc}')
+    try:
+        record = json.loads(raw)
+    except ValueError as exc:
+        raise RecordError(f'Invalid JSON: {exc}')
+    if not isinstance(record, dict):
+        raise RecordError('Each line must be a JSON object.')
+    if not isinstance(record.get('title'), str) or not record['title'].strip():
+        raise RecordError('"title" is required.')
+    if not isinstance(record.get('author'), str):
+        raise RecordError('"author" (a username) is required.')
+    check_text(record['title'], Recipe, 'title', 'title', required=True)
+    for field in ('description', 'instructions', 'slug'):
+        check_text(record.get(field), Recipe, field, field)
+    check_text(record.get('categories'), Category, 'name', 'categories')
+    for key in ('tags', 'ingredients_used', 'ingredients', 'images'):
+        if not isinstance(record.get(key, []), list):
+            raise RecordError(f'"{key}" must be a list.')
+    for name in record.get('tags', []):
+        check_text(name, Tag, 'name', 'tags[]', required=True)
+    for name in record.get('ingredients_used', []):
+        check_text(name, IngredientName, 'name', 'ingredients_used[]', required=True)
+    for path in record.get('images', []):
+        check_text(path, PostImage, 'image', 'images[]', required=True)
+    for ingredient in record.get('ingredients', []):
+        if not isinstance(ingredient, dict) or not isinstance(ingredient.get('name'), str):
+            raise RecordError('Every entry of "ingredients" needs a "name".')
+        check_text(ingredient['name'], IngredientName, 'name', 'ingredients[].name', required=True)
+        check_text(ingredient.get('alternative_ingredient'), IngredientName, 'name', 'ingredients[].alternative_ingredient')
+        for field in INGREDIENT_FIELDS:
+            if field == 'order':
+                order = ingredient.get('order')
+                if order is not None and (not isinstance(order, int) or isinstance(order, bool) or order < 0):
+                    raise RecordError('"ingredients[].order" must be a non-negative integer.')
+            else:
+                check_text(ingredient.get(field), IngredientModel, field, f'ingredients[].{field}')
+    return record
+
+
+class RecipeImporter:
+    """
+    Streams NDJSON recipes into the database a chunk at a time: names are resolved with one
+    lookup per model, and recipes, M2M rows and IngredientModel rows are written with bulk_create.
+    A bad record is reported with its line number and never aborts the rest of the import.
+    """
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.created_ids = []
+        self.errors = []
+
+    def run(self, lines):
+        for chunk in iter_chunks(lines, self.chunk_size):
+            self.import_chunk(chunk)
+        if self.created:
+            bump_version(Recipe)
+            bump_version(RECIPE_ROWS, self.created_ids)  # The in-memory indexes read them in whole
+        return {'created': self.created, 'errors': self.errors}
+
+    def import_chunk(self, chunk):
+        records = []
+        for number, raw in chunk:
+            try:
+                records.append((number, parse_record(raw)))
+            except RecordError as exc:
+                self.errors.append({'line': number, 'error': str(exc)})
+        records = self.check_references(records)
+        if not records:
+            return
+        try:
+            with transaction.atomic():
+                self.write(records)
+        except DatabaseError:
+            # Something in the batch clashed: retry record by record to pin the error down
+            for number, record in records:
+                try:
+                    with transaction.atomic():
+                        self.write([(number, record)])
+                except DatabaseError as exc:
+                    self.errors.append({'line': number, 'error': str(exc)})
+
+    def check_references(self, records):
+        """Drop records whose author is unknown or whose slug is already taken."""
+        usernames = {record['author'] for _, record in records}
+        self.authors = dict(CustomUser.objects.filter(username__in=usernames).values_list('username', 'id'))
+        slugs = [record['slug'] for _, record in records if record.get('slug')]
+        taken = set(Recipe.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+
+        valid = []
+        for number, record in records:
+            slug = record.get('slug')
+            if record['author'] not in self.authors:
+                self.errors.append({'line': number, 'error': f'Unknown author "{record["author"]}".'})
+            elif slug and slug in taken:
+                self.errors.append({'line': number, 'error': f'Slug "{slug}" already exists.'})
+            else:
+                if slug:
+                    taken.add(slug)
+                valid.append((number, record))
+        return valid
+
+    def write(self, records):
+        tags = resolve_names(Tag, (name for _, record in records for name in record.get('tags', [])))
+        categories = resolve_names(Category, (record.get('categories') for _, record in records))
+        ingredients = resolve_names(IngredientName, (
+            name for _, record in records
+            for name in record.get('ingredients_used', []) + [
+                value for ingredient in record.get('ingredients', [])
+                for value in (ingredient['name'], ingredient.get('alternative_ingredient'))
+            ]
+        ))
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                title=record['title'],
+                description=record.get('description') or '',
+                instructions=record.get('instructions') or '',
+                categories_id=categories.get(record.get('categories')),
+                author_id=self.authors[record['author']],
+                is_published=bool(record.get('is_published', False)),
+                slug=record.get('slug') or None,
+            )
+            for _, record in records
+        ])
+
+        tag_rows, ingredient_rows, ingredient_models, images = [], [], [], []
+        for recipe, (_, record) in zip(recipes, records):
+            for tag_id in {tags[name] for name in record.get('tags', [])}:
+                tag_rows.append(Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id))
+            # Every detailed ingredient is also a used ingredient, as the serializer/admin flow produces
+            used = set(record.get('ingredients_used', [])) | {item['name'] for item in record.get('ingredients', [])}
+            for name_id in {ingredients[name] for name in used}:
+                ingredient_rows.append(Recipe.ingredients_used.through(recipe_id=recipe.pk, ingredientname_id=name_id))
+            for item in record.get('ingredients', []):
+                ingredient_models.append(IngredientModel(
+                    recipe_id=recipe.pk,
+                    name_id=ingredients[item['name']],
+                    alternative_ingredient_id=ingredients.get(item.get('alternative_ingredient')),
+                    author_id=recipe.author_id,
+                    **{field: item.get(field) for field in INGREDIENT_FIELDS},
+                ))
+            for path in record.get('images', []):
+                images.append(PostImage(recipe_id=recipe.pk, image=path))
+
+        Recipe.tags.through.objects.bulk_create(tag_rows)
+        Recipe.ingredients_used.through.objects.bulk_create(ingredient_rows)
+        IngredientModel.objects.bulk_create(ingredient_models)
+        PostImage.objects.bulk_create(images)
+        recipe_index.index(recipe.pk for recipe in recipes)
+        self.created += len(recipes)
+        self.created_ids.extend(recipe.pk for recipe in recipes)
+
+
+def sync_recipe_ingredients(recipe, items, author_id):
+    """
+    Make the recipe's IngredientModel rows match `items` (validated dicts in display order, keyed
+    by ingredient name id): new names are inserted, changed rows updated and missing ones deleted,
+    one bulk statement each. An item without `order` gets its 1-based position. ingredients_used
+    gains the new names through the M2M manager, whose signals keep the search, pantry and
+    similarity indexes current. Removed lines keep their ingredients_used link: it may have been
+    set on its own through the recipe, and the M2M rows don't record which lines added them.
+    Call inside a transaction.
+    Returns (rows in list order, {'created': n, 'updated': n, 'deleted': n}).
+    """
+    referenced = {item['name'] for item in items} | ({item.get('alternative_ingredient') for item in items} - {None})
+    known = set(IngredientName.objects.filter(pk__in=referenced).values_list('pk', flat=True))
+    errors, seen = [], set()
+    for index, item in enumerate(items):
+        for field in ('name', 'alternative_ingredient'):
+            if item.get(field) is not None and item[field] not in known:
+                errors.append({'index': index, 'error': f'Unknown ingredient {item[field]} in "{field}".'})
+        if item['name'] in seen:
+            errors.append({'index': index, 'error': f'Ingredient {item["name"]} is listed twice.'})
+        seen.add(item['name'])
+    if errors:
+        raise IngredientListError(errors)
+
+    existing = {row.name_id: row for row in IngredientModel.objects.filter(recipe_id=recipe.pk)}
+    fields = (*INGREDIENT_FIELDS, 'alternative_ingredient_id')
+    rows, created, updated = [], [], []
+    for index, item in enumerate(items):
+        values = {field: item.get(field) for field in INGREDIENT_FIELDS}
+        values['alternative_ingredient_id'] = item.get('alternative_ingredient')
+        if values['order'] is None:
+            values['order'] = index + 1
+        row = existing.pop(item['name'], None)
+        if row is None:
+            row = IngredientModel(recipe_id=recipe.pk, name_id=item['name'], author_id=author_id, **values)
+            created.append(row)
+        elif any(getattr(row, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(row, field, value)
+            updated.append(row)
+        rows.append(row)
+
+    if existing:
+        IngredientModel.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+    IngredientModel.objects.bulk_create(created)
+    IngredientModel.objects.bulk_update(updated, fields)
+    if created or updated:
+        bump_version(IngredientModel)  # Bulk writes send no signals
+        bump_version(RECIPE_ALTERNATIVES, [recipe.pk])
+    if created:
+        recipe.ingredients_used.add(*(row.name_id for row in created))  # Already linked names are left alone
+    return rows, {'created': len(created), 'updated': len(updated), 'deleted': len(existing)}
+
+
+def export_recipes(queryset=None, chunk_size=1000):
+    """Yield one NDJSON line per recipe, in the format RecipeImporter reads."""
+    queryset = (queryset if queryset is not None else Recipe.objects.all()).order_by('pk')
+    queryset = queryset.select_related('author', 'categories').prefetch_related(
+        'tags', 'ingredients_used', 'post_images',
+        Prefetch('ingredient_model_set', queryset=IngredientModel.objects.select_related('name', 'alternative_ingredient')),
+    )
+    for recipe in queryset.iterator(chunk_size=chunk_size):  # Prefetches run per chunk, keeping memory flat
+        record = {
+            'title': recipe.title,
+            'description': recipe.description,
+            'instructions': recipe.instructions,
+            'categories': recipe.categories.name if recipe.categories else None,
+            'tags': [tag.name for tag in recipe.tags.all()],
+            'ingredients_used': [name.name for name in recipe.ingredients_used.all()],
+            'ingredients': [
+                dict(
+                    name=item.name.name,
+                    alternative_ingredient=item.alternative_ingredient.name if item.alternative_ingredient else None,
+                    **{field: getattr(item, field) for field in INGREDIENT_FIELDS},
+                )
+                for item in recipe.ingredient_model_set.all()
+            ],
+            'images': [image.image.name for image in recipe.post_images.all() if image.image],
+            'author': recipe.author.username,
+            'is_published': recipe.is_published,
+            'slug': recipe.slug,
+        }
+        yield json.dumps(record) + '\n'
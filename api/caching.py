@@ -0,0 +1,147 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from .replicas import read_routing
+
+VERSION_KEY = 'rapi:version:{}'
+STATS_KEY = 'rapi:cache:{}'
+MODIFIED_KEY = 'rapi:modified:{}'
+CHANGES_KEY = 'rapi:changes:{}:{}'
+CHANGE_LOG_SPAN = 1000  # Most versions get_changes() reads back; further behind, callers start over
+
+
+def _model_label(model):
+    # Data that isn't a model of its own (e.g. RATINGS_VERSION) is versioned under a plain name
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def get_version(model):
+    """Current version counter of a model (0 until its first change)."""
+    return cache.get(VERSION_KEY.format(_model_label(model)), 0)
+
+
+def get_versions(models):
+    """Version counters for several models in one cache round-trip."""
+    keys = [VERSION_KEY.format(_model_label(model)) for model in models]
+    values = cache.get_many(keys)
+    return tuple(values.get(key, 0) for key in keys)
+
+
+def _increment(key):
+    """Add one to a counter and return its new value."""
+    if cache.add(key, 1, timeout=None):  # Counters never expire
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:  # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def _bump(model, ids):
+    version = _increment(VERSION_KEY.format(_model_label(model)))
+    if ids is not None:
+        # Outlives any index stamped with an older version: those are rebuilt after IN_MEMORY_INDEX_MAX_AGE anyway
+        cache.set(CHANGES_KEY.format(_model_label(model), version), ids, timeout=settings.IN_MEMORY_INDEX_MAX_AGE)
+    cache.set(MODIFIED_KEY.format(_model_label(model)), time.time(), timeout=None)
+
+
+def bump_version(model, ids=None):
+    """
+    Invalidate every cached response that depends on `model`. Inside a transaction the counter
+    moves again once it commits: a concurrent reader may have rebuilt entries from the
+    pre-commit rows under the first bump, and those must not outlive the commit.
+    `ids` (of the rows changed) are logged under the new version for get_changes().
+    """
+    ids = None if ids is None else list(ids)
+    _bump(model, ids)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(model, ids))
+
+
+def get_changes(model, since, until):
+    """
+    Every id bump_version() logged for `model` from version `since` (exclusive) to `until`, or
+    None when any of those bumps logged no ids, its entry was evicted, the counter restarted
+    or is more than CHANGE_LOG_SPAN versions ahead.
+    """
+    if not since < until <= since + CHANGE_LOG_SPAN:
+        return None
+    keys = [CHANGES_KEY.format(_model_label(model), version) for version in range(since + 1, until + 1)]
+    values = cache.get_many(keys)
+    if len(values) != len(keys):
+        return None
+    return {row_id for ids in values.values() for row_id in ids}
+
+
+def get_modified(models):
+    """
+    Unix time of each model's last bump_version(). A model never bumped, or whose entry was
+    evicted, counts as modified now, so validators built from these never go backwards.
+    """
+    keys = [MODIFIED_KEY.format(_model_label(model)) for model in models]
+    values = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in values:
+            cache.add(key, now, timeout=None)
+            values[key] = now
+    return tuple(values[key] for key in keys)
+
+
+def _count(event):
+    _increment(STATS_KEY.format(event))
+
+
+def cache_stats():
+    """Hit/miss counters shared by every process using the same cache backend."""
+    values = cache.get_many([STATS_KEY.format('hit'), STATS_KEY.format('miss')])
+    return {
+        'hits': values.get(STATS_KEY.format('hit'), 0),
+        'misses': values.get(STATS_KEY.format('miss'), 0),
+    }
+
+
+def response_cache_key(request, prefix, models):
+    """Key on the host, path, normalised query string and the versions of every dependency."""
+    query = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    versions = get_versions(models)
+    raw = f'{request.get_host()}|{request.path}|{query}|{versions}'
+    return f'rapi:response:{prefix}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+class CachedListMixin:
+    """
+    Caches the serialized `list` response of a viewset.
+    Entries are invalidated implicitly: bumping a dependency's version changes the key.
+    """
+    cache_dependencies = ()  # Models whose changes alter the list output
+
+    def list(self, request, *args, **kwargs):
+        response = self.cached_list(request)
+        if response is None:
+            response = self.cache_list(request, super().list(request, *args, **kwargs))
+        return response
+
+    def cached_list(self, request):
+        """The cached response for this list request, or None on a miss."""
+        # A client pinned after its write must not get a body a lagging replica produced
+        data = cache.get(response_cache_key(request, self.basename, self.cache_dependencies)) if read_routing() != 'pinned' else None
+        if data is None:
+            _count('miss')
+            return None
+        _count('hit')
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    def cache_list(self, request, response):
+        if response.status_code == 200:
+            # Replica reads may lag the version bump, so they are only trusted for the pin window
+            timeout = settings.PRIMARY_PIN_SECONDS if read_routing() == 'replica' else settings.RESPONSE_CACHE_TIMEOUT
+            cache.set(response_cache_key(request, self.basename, self.cache_dependencies), response.data, timeout=timeout)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F
+
+from app.models import Order, OrderItem, Product
+from .caching import bump_version
+
+
+class CheckoutError(Exception):
+    """Raised with one entry per order line that could not be fulfilled."""
+    def __init__(self, failures):
+        super().__init__('Checkout failed')
+        self.failures = failures
+
+
+def place_order(user, lines):
+    """
+    Create an order and all its items in one transaction, decrementing stock as it goes.
+
+    Each decrement is a conditional UPDATE ... SET stock = stock - n WHERE stock >= n, so the
+    database arbitrates concurrent checkouts: there is no read-modify-write window to oversell
+    in. Products are updated in id order so two checkouts never wait on each other's locks
+    in opposite order. If any line fails, everything is rolled back and CheckoutError lists
+    every submitted line (by its index in `lines`) of the products that failed. Otherwise each
+    submitted line becomes one OrderItem, in the same order, so items[i] is lines[i].
+    """
+    quantities, line_numbers = defaultdict(int), defaultdict(list)
+    for index, line in enumerate(lines):
+        quantities[line['product']] += line['quantity']
+        line_numbers[line['product']].append(index)
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk(list(quantities))
+        failures = {product_id: {'error': 'Product not found.'} for product_id in quantities if product_id not in products}
+        short = []
+        for product_id in sorted(products):
+            quantity = quantities[product_id]
+            if not Product.objects.filter(pk=product_id, stock__gte=quantity).update(stock=F('stock') - quantity):
+                short.append(product_id)
+        if short:
+            available = dict(Product.objects.filter(pk__in=short).values_list('pk', 'stock'))
+            for product_id in short:
+                # Repeated lines of a product draw on the same stock, so `requested_total` is what fell short
+                failures[product_id] = {'requested_total': quantities[product_id], 'available': available.get(product_id, 0),
+                                        'error': 'Insufficient stock.'}
+        if failures:
+            transaction.set_rollback(True)
+            raise CheckoutError(sorted((
+                {'line': index, 'product': product_id, 'requested': lines[index]['quantity'], **failure}
+                for product_id, failure in failures.items() for index in line_numbers[product_id]
+            ), key=lambda failure: failure['line']))
+
+        order = Order.objects.create(user=user)
+        items = OrderItem.objects.bulk_create([
+            # Snapshot today's price: later price changes must not rewrite past orders
+            OrderItem(order=order, product_id=line['product'], quantity=line['quantity'], price=products[line['product']].price)
+            for line in lines
+        ])
+    bump_version(Product)  # Stock changed through update(), which sends no signals
+    return order, items
@@ -0,0 +1,85 @@
+import hashlib
+
+from django.db.models import prefetch_related_objects
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from app.models import Recipe
+from .caching import get_modified, get_versions
+
+
+def touch_recipes(recipe_ids):
+    """Move updated_at forward for recipes whose rendered relations changed (images, tags, ingredients)."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())  # No signals
+
+
+def make_etag(request, *parts):
+    """Strong ETag over the host, path, normalised query string and the given validator parts."""
+    query = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+    raw = f'{request.get_host()}|{request.path}|{query}|{parts}'
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+class ConditionalGetMixin:
+    """
+    ETag/Last-Modified for `list` and, when `detail_modified_field` is set, `retrieve`.
+    Validators come from the cache version counters and bump times of `cache_dependencies`
+    (lists) or the row's modified field plus `detail_dependencies` (detail), so a matching
+    If-None-Match/If-Modified-Since gets a 304 before anything is serialized.
+    """
+    cache_dependencies = ()  # Models whose changes alter the list output
+    detail_modified_field = None  # e.g. 'updated_at'; kept current for everything the detail renders
+    detail_dependencies = ()  # Related models rendered by name (renames don't touch the row)
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified, not_modified = self.list_validators(request)
+        if not_modified is not None:
+            return self._validated(not_modified, etag, last_modified)
+        return self._validated(super().list(request, *args, **kwargs), etag, last_modified)
+
+    def list_validators(self, request):
+        """(ETag, Last-Modified, the 304 response when the client's copy is current else None) of a list request."""
+        models = self.cache_dependencies
+        versions, modified = get_versions(models), get_modified(models)
+        etag = make_etag(request, versions, modified)
+        last_modified = int(max(modified)) if modified else None
+        return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.detail_modified_field is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        # get_object(), but the planner's prefetches wait until we know a body is needed
+        queryset = self.filter_queryset(self.get_queryset())
+        prefetches = queryset._prefetch_related_lookups
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        instance = get_object_or_404(queryset.prefetch_related(None), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, instance)
+
+        etag, last_modified, not_modified = self.detail_validators(request, getattr(instance, self.detail_modified_field))
+        if not_modified is not None:
+            return self._validated(not_modified, etag, last_modified)
+
+        prefetch_related_objects([instance], *prefetches)
+        serializer = self.get_serializer(instance)
+        return self._validated(Response(serializer.data), etag, last_modified)
+
+    def detail_validators(self, request, row_modified):
+        models = self.detail_dependencies
+        versions, modified = get_versions(models), get_modified(models)
+        etag = make_etag(request, row_modified.isoformat(), versions, modified)
+        last_modified = int(max((row_modified.timestamp(), *modified)))
+        return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    @staticmethod
+    def _validated(response, etag, last_modified):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
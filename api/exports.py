@@ -0,0 +1,108 @@
+import csv
+import datetime
+import json
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+
+from app.models import Order
+
+ORDER_EXPORT_COLUMNS = [
+    'order_id', 'user', 'status', 'created_at', 'updated_at',
+    'item_id', 'product_id', 'product_name', 'quantity', 'price',
+]
+ORDER_EXPORT_FIELDS = [
+    'id', 'user__username', 'status', 'created_at', 'updated_at',
+    'items__id', 'items__product_id', 'items__product__name', 'items__quantity', 'items__price',
+]
+
+
+class ExportFilterError(ValueError):
+    pass
+
+
+def _parse_bound(value, end=False):
+    """Accept a date (whole day, inclusive) or a full datetime."""
+    try:
+        day = parse_date(value)  # First: parse_datetime() also takes a bare date, as midnight
+        if day is None:
+            moment = parse_datetime(value)
+        else:
+            moment = datetime.datetime.combine(day + datetime.timedelta(days=1) if end else day, datetime.time.min)
+            if end:
+                moment -= datetime.timedelta(microseconds=1)
+    except (ValueError, OverflowError):  # Well-formed but impossible (2024-02-30, T25:00:00) or past 9999-12-31
+        moment = None
+    if moment is None:
+        raise ExportFilterError(f'Invalid date: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_orders(queryset=None, start=None, end=None, status=None):
+    queryset = queryset if queryset is not None else Order.objects.all()
+    if start:
+        queryset = queryset.filter(created_at__gte=_parse_bound(start))
+    if end:
+        queryset = queryset.filter(created_at__lte=_parse_bound(end, end=True))
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset
+
+
+def order_rows(queryset, chunk_size=2000):
+    """
+    One row per order line (orders without lines yield a single row of None item columns),
+    read through a server-side cursor so memory stays flat however long the history is.
+    """
+    rows = queryset.order_by('id', 'items__id').values_list(*ORDER_EXPORT_FIELDS)
+    return rows.iterator(chunk_size=chunk_size)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    """File-like object whose write() hands the line straight back to the generator."""
+    def write(self, value):
+        return value
+
+
+def export_orders_csv(queryset, chunk_size=2000):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_EXPORT_COLUMNS)
+    for row in order_rows(queryset, chunk_size):
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def export_orders_ndjson(queryset, chunk_size=2000):
+    """One JSON object per order with its lines nested under "items"."""
+    current = None
+    for row in order_rows(queryset, chunk_size):
+        order_id, username, status, created_at, updated_at, item_id, product_id, product_name, quantity, price = row
+        if current is None or current['order_id'] != order_id:
+            if current is not None:
+                yield json.dumps(current) + '\n'
+            current = {
+                'order_id': order_id, 'user': username, 'status': status,
+                'created_at': _cell(created_at), 'updated_at': _cell(updated_at), 'items': [],
+            }
+        if item_id is not None:
+            current['items'].append({
+                'item_id': item_id, 'product_id': product_id, 'product_name': product_name,
+                'quantity': quantity, 'price': _cell(price),
+            })
+    if current is not None:
+        yield json.dumps(current) + '\n'
+
+
+EXPORTERS = {
+    'csv': (export_orders_csv, 'text/csv'),
+    'ndjson': (export_orders_ndjson, 'application/x-ndjson'),
+}
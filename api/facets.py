@@ -0,0 +1,82 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from rest_framework.exceptions import ValidationError
+
+from app.models import Category, IngredientName, Recipe, Tag
+from .caching import get_versions
+from .ratings import RATINGS_VERSION
+from .replicas import read_routing
+
+# facet -> (table with one row per recipe and value, its recipe column, value id column, value name lookup)
+FACETS = {
+    'categories': (Recipe, 'pk', 'categories_id', 'categories__name'),
+    'tags': (Recipe.tags.through, 'recipe_id', 'tag_id', 'tag__name'),
+    'ingredients_used': (Recipe.ingredients_used.through, 'recipe_id', 'ingredientname_id', 'ingredientname__name'),
+}
+FACET_DEPENDENCIES = (Recipe, RATINGS_VERSION, Tag, Category, IngredientName)  # Ratings: ?min_rating=
+FACET_KEY = 'rapi:facets:{}'
+
+
+def facet_counts(queryset, names, limit):
+    """
+    {facet: [{'id', 'name', 'count'}]} of the `limit` values most used by the recipes of
+    `queryset`, most used first. One grouped query per facet, over a subquery of the ids.
+    """
+    recipe_ids = queryset.order_by().values('pk')
+    facets = {}
+    for name in names:
+        model, recipe_column, id_column, name_lookup = FACETS[name]
+        rows = (model.objects.filter(**{f'{recipe_column}__in': recipe_ids}, **{f'{id_column}__isnull': False})
+                .values_list(id_column, name_lookup).annotate(count=Count(recipe_column))
+                .order_by('-count', name_lookup, id_column)[:limit])
+        facets[name] = [{'id': value_id, 'name': value_name, 'count': count} for value_id, value_name, count in rows]
+    return facets
+
+
+class FacetedListMixin:
+    """
+    `list` with ?facets=categories,tags,ingredients_used adds a `facets` key to the page: the
+    counts of each value over every recipe matching the current search and filters. They are
+    cached per filter signature, so paging or reordering the same browse view reuses them.
+    """
+    facets_query_param = 'facets'
+    facet_limit_query_param = 'facet_limit'
+    # Parameters that change the page but not the set of matching rows
+    facet_ignored_params = ('page', 'page_size', 'limit', 'offset', 'cursor', 'pagination', 'count', 'ordering', 'fields',
+                            'format', 'facets', 'facet_limit')
+
+    def requested_facets(self, request):
+        names = [name.strip() for value in request.query_params.getlist(self.facets_query_param)
+                 for name in value.split(',') if name.strip()]
+        unknown = sorted(set(names) - set(FACETS))
+        if unknown:
+            raise ValidationError({"error": f"Unknown facets: {', '.join(unknown)}. Choose from {', '.join(FACETS)}."})
+        return list(dict.fromkeys(names))
+
+    def list(self, request, *args, **kwargs):
+        names = self.requested_facets(request)
+        response = super().list(request, *args, **kwargs)
+        if names and response.status_code == 200 and isinstance(response.data, dict):
+            response.data['facets'] = self.get_facets(request, names)
+        return response
+
+    def get_facets(self, request, names):
+        try:
+            limit = max(1, min(int(request.query_params.get(self.facet_limit_query_param, 20)), 100))
+        except ValueError:
+            raise ValidationError({"error": "facet_limit must be an integer"})
+        signature = sorted((key, value) for key in request.query_params if key not in self.facet_ignored_params
+                           for value in request.query_params.getlist(key))
+        raw = f'{request.path}|{sorted(names)}|{signature}|{limit}|{get_versions(FACET_DEPENDENCIES)}'
+        key = FACET_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+        # As CachedListMixin: pinned clients skip the cache, replica reads are only trusted for the pin window
+        routing = read_routing()
+        facets = cache.get(key) if routing != 'pinned' else None
+        if facets is None:
+            facets = facet_counts(self.filter_queryset(self.get_queryset()), names, limit)
+            timeout = settings.PRIMARY_PIN_SECONDS if routing == 'replica' else settings.RESPONSE_CACHE_TIMEOUT
+            cache.set(key, facets, timeout=timeout)
+        return facets
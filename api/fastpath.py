@@ -0,0 +1,195 @@
+import asyncio
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .images import VariantImageField, requested_variant, variant_url
+
+# Field classes whose to_representation() returns database values unchanged
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField, serializers.FloatField)
+
+
+class Unsupported(Exception):
+    """The serializer has a field the fast path can't reproduce exactly; use DRF instead."""
+
+
+class FastSerializer:
+    """
+    Read-only twin of a ModelSerializer instance that builds the same dicts from values() rows.
+
+    Column fields are formatted by the serializer's own field objects (or passed through for
+    types whose representation is the raw value), FK slugs come from joins in the same values()
+    query, and M2M slugs and nested reverse relations from one grouped query per relation, put in
+    the primary key order RECIPE_PLANNER's prefetches use. Field order and ?fields= pruning are
+    whatever the serializer instance has, so output matches it byte for byte.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.request = serializer.context.get('request')
+        self.image_size = requested_variant(self.request)
+        self.columns = {self.model._meta.pk.attname}
+        self.getters = []  # (field name, function(row, relation maps) -> value)
+        self.relations = {}  # field name -> (function(ids) -> queryset, function(rows) -> {id: value})
+        for name, field in serializer.fields.items():
+            if not field.write_only:
+                self.getters.append((name, self._plan(name, field)))
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        try:
+            return cls(serializer)
+        except Unsupported:
+            return None
+
+    def _model_field(self, field):
+        try:
+            return self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise Unsupported(field.source)
+
+    def _plan(self, name, field):
+        model_field = self._model_field(field)
+        pk = self.model._meta.pk.attname
+
+        if isinstance(field, serializers.ManyRelatedField) and model_field.many_to_many and model_field.concrete:
+            if type(field.child_relation) is not serializers.SlugRelatedField:
+                raise Unsupported(name)
+            self.relations[name] = self._many_slugs(model_field, field.child_relation.slug_field)
+            return lambda row, maps: maps[name].get(row[pk], [])
+
+        if isinstance(field, serializers.ListSerializer) and model_field.one_to_many:
+            child = FastSerializer(field.child)
+            self.relations[name] = self._nested(model_field, child)
+            return lambda row, maps: maps[name].get(row[pk], [])
+
+        if model_field.is_relation and not (model_field.many_to_one and model_field.concrete):
+            raise Unsupported(name)
+
+        if type(field) is serializers.SlugRelatedField:
+            column = f'{model_field.name}__{field.slug_field}'
+            self.columns.add(column)
+            return lambda row, maps: row[column]
+
+        if type(field) is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+            column = model_field.attname
+            self.columns.add(column)
+            return lambda row, maps: row[column]
+
+        if model_field.is_relation:
+            raise Unsupported(name)
+        column = model_field.attname
+        self.columns.add(column)
+
+        if isinstance(field, serializers.FileField):
+            return self._file_getter(field, model_field, column)
+        if type(field) in IDENTITY_FIELDS or (type(field) is serializers.JSONField and not field.binary):
+            return lambda row, maps: row[column]
+        convert = field.to_representation
+        return lambda row, maps: None if row[column] is None else convert(row[column])
+
+    def _file_getter(self, field, model_field, column):
+        if not getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return lambda row, maps: row[column] or None
+        storage, request = model_field.storage, self.request
+        if isinstance(field, VariantImageField) and self.image_size:
+            self.columns.add('image_variants')
+            size = self.image_size
+            return lambda row, maps: variant_url(storage, row[column], row['image_variants'], size, request)
+        return lambda row, maps: variant_url(storage, row[column], None, None, request)
+
+    def _many_slugs(self, model_field, slug_field):
+        through = model_field.remote_field.through
+        source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+
+        def query(ids):
+            return through.objects.filter(**{f'{source}_id__in': ids}).order_by() \
+                .values_list(f'{source}_id', f'{target}_id', f'{target}__{slug_field}')
+
+        def collect(rows):
+            # Sorted here rather than with ORDER BY: a page's worth of rows, and no sort step in the plan
+            grouped = defaultdict(list)
+            for owner_id, _, slug in sorted(rows):
+                grouped[owner_id].append(slug)
+            return grouped
+        return query, collect
+
+    def _nested(self, relation, child):
+        if child.relations:
+            raise Unsupported(relation.name)  # Would need a second round of queries per page
+        foreign_key = relation.field.attname
+        pk = relation.related_model._meta.pk.attname
+        columns = child.columns | {foreign_key}
+
+        def query(ids):
+            return relation.related_model.objects.filter(**{f'{foreign_key}__in': ids}).order_by().values(*columns)
+
+        def collect(rows):
+            grouped = defaultdict(list)
+            for row in sorted(rows, key=lambda row: row[pk]):
+                grouped[row[foreign_key]].append(row)
+            return {owner_id: child.serialize(group) for owner_id, group in grouped.items()}
+        return query, collect
+
+    def fetch_relations(self, ids):
+        """{field name: {owner id: value}} for the relation fields of the rows with primary keys `ids`."""
+        return {name: collect(list(query(ids))) for name, (query, collect) in self.relations.items()}
+
+    async def afetch_relations(self, ids):
+        """fetch_relations() through the async ORM, issuing the per-relation queries concurrently."""
+        names = list(self.relations)
+        results = await asyncio.gather(*(_alist(self.relations[name][0](ids)) for name in names))
+        return {name: self.relations[name][1](rows) for name, rows in zip(names, results)}
+
+    def serialize(self, rows, maps=None):
+        """Dicts for `rows` (values() dicts holding at least `self.columns`), in order."""
+        if not rows:
+            return []
+        if maps is None:
+            pk = self.model._meta.pk.attname
+            maps = self.fetch_relations([row[pk] for row in rows])
+        getters = self.getters
+        return [{name: getter(row, maps) for name, getter in getters} for row in rows]
+
+    async def aserialize(self, rows):
+        if not rows:
+            return []
+        pk = self.model._meta.pk.attname
+        return self.serialize(rows, await self.afetch_relations([row[pk] for row in rows]))
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def fast_serializer(view):
+    """A FastSerializer for the view's (sparse) serializer, or None when DRF has to serialize."""
+    return FastSerializer.for_serializer(view.get_serializer()) if settings.FAST_LIST_SERIALIZATION else None
+
+
+def fast_queryset(view, fast):
+    """The view's filtered queryset as values() rows carrying what `fast` and pagination read."""
+    columns = fast.columns | set(getattr(view, 'always_loaded_fields', ()))
+    return view.filter_queryset(view.get_queryset()).prefetch_related(None).values(*columns)
+
+
+class FastListMixin:
+    """
+    Serves `list` through FastSerializer when FAST_LIST_SERIALIZATION is on and every field of
+    the (sparse) serializer is supported; otherwise, or for any other action, DRF as usual.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fast = fast_serializer(self)
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = fast_queryset(self, fast)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.serialize(page))
+        return Response(fast.serialize(list(queryset)))
@@ -0,0 +1,15 @@
+from django_filters import rest_framework as django_filters
+
+from app.models import Recipe
+
+
+class RecipeFilter(django_filters.FilterSet):
+    min_rating = django_filters.NumberFilter(field_name='rating', lookup_expr='gte')  # Uses the indexed average
+
+    class Meta:
+        model = Recipe
+        fields = {
+            'categories': ['exact'],  # Exact match for categories
+            'tags': ['exact'],  # Exact match for tags
+            'ingredients_used': ['exact'],  # Exact match for ingredients
+        }
@@ -0,0 +1,113 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .caching import bump_version
+from .conditional import touch_recipes
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.IMAGE_PROCESSING_WORKERS, thread_name_prefix='image-variants')
+    return _executor
+
+
+def needs_variants(instance):
+    """True when the stored image has no variants yet, or they belong to a replaced file."""
+    return bool(instance.image) and instance.image_variants.get('source') != instance.image.name
+
+
+def schedule_variants(instance):
+    """Generate variants after the upload's transaction commits, off the request thread."""
+    model, pk = type(instance), instance.pk
+    if settings.IMAGE_PROCESSING_SYNC:
+        generate_variants(model, pk)
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_worker, model, pk))
+
+
+def _run_in_worker(model, pk):
+    try:
+        generate_variants(model, pk)
+    except Exception:
+        logger.exception('Could not generate image variants for %s %s', model._meta.label, pk)
+    finally:
+        connections.close_all()  # Worker threads own their connections
+
+
+def render_variant(source, spec):
+    """Resize an opened image according to an IMAGE_VARIANTS entry; returns (bytes, extension)."""
+    image = ImageOps.exif_transpose(source)
+    if spec.get('size'):
+        image = image.copy()
+        image.thumbnail(spec['size'], Image.LANCZOS)  # Keeps the aspect ratio, never upscales
+    image_format = spec.get('format') or source.format or 'JPEG'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=spec.get('quality', 82), optimize=True)
+    extension = {'JPEG': 'jpg'}.get(image_format, image_format.lower())
+    return buffer.getvalue(), extension
+
+
+def generate_variants(model, pk):
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not needs_variants(instance):
+        return
+    field = instance.image
+    directory, filename = os.path.split(field.name)
+    stem = os.path.splitext(filename)[0]
+    variants = {'source': field.name}
+    with field.open('rb'), Image.open(field) as source:
+        source.load()
+        for name, spec in settings.IMAGE_VARIANTS.items():
+            content, extension = render_variant(source, spec)
+            path = os.path.join(directory, 'variants', f'{stem}_{name}.{extension}')
+            variants[name] = field.storage.save(path, ContentFile(content))
+    # update(): no post_save, so no re-scheduling; invalidate cached lists by hand
+    model.objects.filter(pk=pk, image=field.name).update(image_variants=variants)
+    bump_version(model)
+    if getattr(instance, 'recipe_id', None):
+        touch_recipes([instance.recipe_id])  # ?image_size= URLs in the recipe detail changed
+
+
+def requested_variant(request):
+    return request.query_params.get('image_size') if request is not None else None
+
+
+def variant_url(storage, name, variants, size, request):
+    """URL of the `size` variant when it exists, else of the upload; absolute when there is a request."""
+    if not name:
+        return None
+    if size and size != 'source' and size in (variants or {}):
+        name = variants[size]
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class VariantImageField(serializers.ImageField):
+    """
+    Image URL that honours ?image_size=<variant> (see IMAGE_VARIANTS) when that variant
+    has been generated, and falls back to the original upload otherwise.
+    """
+    def to_representation(self, value):
+        request = self.context.get('request', None)
+        if not value or not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return super().to_representation(value)
+        variants = getattr(getattr(value, 'instance', None), 'image_variants', None)
+        return variant_url(value.storage, value.name, variants, requested_variant(request), request)
@@ -0,0 +1,110 @@
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import get_changes, get_versions
+from .replicas import primary_reads
+
+# Recipe data the in-memory indexes hold, versioned apart from Recipe so each index only moves
+# when something it indexes does. api.signals bumps them with the ids of the recipes changed.
+RECIPE_ROWS = 'app.recipe.rows'  # Recipes created or deleted
+RECIPE_INSTRUCTIONS = 'app.recipe.instructions'
+RECIPE_CATEGORY = 'app.recipe.category'
+RECIPE_TAGS = 'app.recipe.tags'
+RECIPE_INGREDIENTS = 'app.recipe.ingredients'  # ingredients_used links
+RECIPE_ALTERNATIVES = 'app.recipe.alternatives'  # IngredientModel alternative_ingredient
+PATCH_LIMIT = 1000  # Changed recipes beyond which a full build is the cheaper catch-up
+
+
+def sorted_insert(values, value):
+    """Insert into a sorted array('q') unless already present."""
+    position = bisect_left(values, value)
+    if position == len(values) or values[position] != value:
+        values.insert(position, value)
+
+
+def sorted_remove(values, value):
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+def sorted_contains(values, value):
+    position = bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+class InMemoryIndex:
+    """
+    Base for per-process indexes that answer queries without touching the database.
+
+    Built lazily on first use. Writes are picked up through the shared cache version counters
+    of `source_models`: when they move, the recipes bump_version() logged with each move are
+    re-read through patch(), and the index is rebuilt only when that log is incomplete, too
+    long, or the index can't patch. Indexes whose signal receivers patch them in place call
+    synced() instead. IN_MEMORY_INDEX_MAX_AGE bounds staleness from any race in between.
+    """
+    source_models = ()
+    instances = weakref.WeakSet()  # Every index of this process, for reset_all()
+
+    def __init__(self):
+        InMemoryIndex.instances.add(self)
+        self.lock = threading.RLock()
+        self.versions = None
+        self.built_at = None
+
+    def build(self):
+        """Load the whole index from the database."""
+        raise NotImplementedError
+
+    def patch(self, recipe_ids):
+        """Re-read a few changed recipes from the database; False when only build() can catch up."""
+        return False
+
+    def ensure_fresh(self):
+        versions = get_versions(self.source_models)
+        expired = self.built_at is None or time.monotonic() - self.built_at > settings.IN_MEMORY_INDEX_MAX_AGE
+        if versions != self.versions or expired:
+            # The versions come from the primary's writes: a lagging replica could miss rows they cover
+            with self.lock, primary_reads():
+                if expired or not self.apply_changes(versions):
+                    self.build()
+                    self.built_at = time.monotonic()
+                self.versions = versions
+
+    def apply_changes(self, versions):
+        changed = set()
+        for model, seen, current in zip(self.source_models, self.versions, versions):
+            if seen != current:
+                recipe_ids = get_changes(model, seen, current)
+                if recipe_ids is None:
+                    return False
+                changed |= recipe_ids
+        return len(changed) <= PATCH_LIMIT and self.patch(sorted(changed))
+
+    def synced(self):
+        """Called after applying a local change: the index already reflects the bumped versions."""
+        if self.built_at is not None:
+            self.versions = get_versions(self.source_models)
+            if transaction.get_connection().in_atomic_block:
+                transaction.on_commit(self.synced)  # Again after bump_version()'s commit-time bumps
+
+    def reset(self):
+        """Forget the current contents; the next ensure_fresh() rebuilds from the database."""
+        with self.lock:
+            self.versions = None
+            self.built_at = None
+
+    @classmethod
+    def reset_all(cls):
+        """Reset every index, e.g. after rolling back writes their signal receivers already patched in."""
+        for index in list(cls.instances):
+            index.reset()
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.advisor import DEFAULT_REQUESTS, analyze, load_requests
+
+
+class Command(BaseCommand):
+    help = ('Replay captured API requests, EXPLAIN the SQL they run and report sequential scans '
+            'with the composite indexes that would avoid them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', help='JSON list or NDJSON of {"method", "path", "user", "data"}')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed executions per flagged statement')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        requests = load_requests(options['requests']) if options['requests'] else DEFAULT_REQUESTS
+        report = analyze(requests, repeat=options['repeat'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f'{report["statements"]} distinct statements, {len(report["findings"])} full scans')
+        for finding in report['findings']:
+            self.stdout.write(f'  {finding["median_ms"]:>9.3f}ms  {finding["problem"]} on {finding["table"]}  '
+                              f'({finding["request"]})')
+        if not report['proposals']:
+            self.stdout.write(self.style.SUCCESS('No index proposals.'))
+        for proposal in report['proposals']:
+            fields = ', '.join(f"'{field}'" for field in proposal['fields'])
+            self.stdout.write(self.style.WARNING(
+                f'{proposal["table"]}: models.Index(fields=[{fields}])  '
+                f'-- {proposal["queries"]} queries, {proposal["total_ms"]}ms, e.g. {proposal["examples"][0]}'
+            ))
@@ -0,0 +1,66 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarking import compare, load_baseline, run_benchmarks, save_baseline, uncovered_routes
+from api.seeding import DEFAULT_SIZES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database, drive every API route through the test client and report '
+            'throughput, p50/p95/p99 latency and query count; optionally compare with a JSON baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every seed_data default size')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per route')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per route')
+        parser.add_argument('--route', action='append', dest='routes', help='Only routes whose label contains this')
+        parser.add_argument('--save', help='Write the results to this JSON baseline file')
+        parser.add_argument('--baseline', help='Fail when a route regresses against this JSON baseline')
+        parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p50 slowdown (0.25 = 25%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore p50 differences below this')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes()
+        if missing:
+            self.stderr.write(self.style.WARNING(f'Routes without a benchmark: {", ".join(sorted(missing))}'))
+
+        sizes = {name: int(size * options['scale']) for name, size in DEFAULT_SIZES.items()}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            counts = seed_dataset(seed=options['seed'], **sizes)
+            self.stderr.write(f'Seeded {counts} in {time.perf_counter() - started:.1f}s')
+            results = run_benchmarks(options['iterations'], options['warmup'], options['routes'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.stdout.write(f'{"route":<34}{"status":>7}{"queries":>9}{"req/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+            for label, row in results.items():
+                self.stdout.write(f'{label:<34}{row["status"]:>7}{row["queries"]:>9}{row["rps"]:>9}'
+                                  f'{row["p50_ms"]:>10}{row["p95_ms"]:>10}{row["p99_ms"]:>10}')
+        errors = [label for label, row in results.items() if row['status'] >= 400]
+        if errors:
+            self.stderr.write(self.style.WARNING(f'Routes answering with an error status: {", ".join(errors)}'))
+
+        if options['save']:
+            meta = {'seed': options['seed'], 'sizes': sizes, 'iterations': options['iterations'],
+                    'vendor': connection.vendor}
+            save_baseline(options['save'], results, meta)
+            self.stderr.write(f'Baseline written to {options["save"]}')
+        if options['baseline']:
+            baseline = load_baseline(options['baseline'])
+            regressions = compare(results, baseline['routes'], options['threshold'], options['min_delta_ms'])
+            if regressions:
+                raise CommandError('Performance regressions:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmarking import LatencyInjector, run_concurrency
+from api.seeding import DEFAULT_SIZES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and compare concurrent-client throughput of the sync read '
+            'endpoints under a threaded WSGI worker with their async twins under one ASGI event loop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every seed_data default size')
+        parser.add_argument('--clients', type=int, action='append', help='Concurrent clients (repeatable; default 1, 8, 32)')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+        parser.add_argument('--threads', type=int, default=4, help='WSGI worker threads, as gunicorn --threads')
+        parser.add_argument('--db-latency-ms', type=float, default=0.0,
+                            help='Sleep before every statement, like a database across a network')
+        parser.add_argument('--warm-cache', action='store_true', help='Let the response cache answer repeated requests')
+        parser.add_argument('--route', action='append', dest='routes', help='Only routes whose label contains this')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        sizes = {name: int(size * options['scale']) for name, size in DEFAULT_SIZES.items()}
+        clients = options['clients'] or [1, 8, 32]
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            started = time.perf_counter()
+            counts = seed_dataset(seed=options['seed'], **sizes)
+            self.stderr.write(f'Seeded {counts} in {time.perf_counter() - started:.1f}s')
+            with LatencyInjector(options['db_latency_ms'] / 1000):
+                results = run_concurrency(
+                    get_wsgi_application(), get_asgi_application(), clients, options['requests'],
+                    options['threads'], cold=not options['warm_cache'], only=options['routes'],
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"route":<18}{"clients":>8}{"wsgi req/s":>12}{"asgi req/s":>12}{"speedup":>9}'
+                          f'{"wsgi p95 ms":>13}{"asgi p95 ms":>13}{"errors":>8}')
+        for label, rows in results.items():
+            for count, row in rows.items():
+                wsgi, asgi = row['wsgi'], row['asgi']
+                speedup = asgi['rps'] / wsgi['rps'] if wsgi['rps'] else 0
+                self.stdout.write(f'{label:<18}{count:>8}{wsgi["rps"]:>12}{asgi["rps"]:>12}{speedup:>8.2f}x'
+                                  f'{wsgi["p95_ms"]:>13}{asgi["p95_ms"]:>13}{wsgi["errors"] + asgi["errors"]:>8}')
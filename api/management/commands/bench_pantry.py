@@ -0,0 +1,51 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.pantry import PantryIndex
+
+
+class Command(BaseCommand):
+    help = 'Measure pantry matching latency on a synthetic in-memory catalog (no database access).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--pantry-size', type=int, default=15)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredient_ids = range(1, options['ingredients'] + 1)
+        # Zipf-ish popularity: a few staples (salt, onion, ...) appear in most recipes
+        weights = [1 / rank for rank in ingredient_ids]
+
+        index = PantryIndex()
+        started = time.perf_counter()
+        for recipe_id in range(1, options['recipes'] + 1):
+            used = set(rng.choices(ingredient_ids, weights=weights, k=options['per_recipe']))
+            index.set_recipe_ingredients(recipe_id, used)
+            if rng.random() < 0.2:
+                ingredient = rng.choice(sorted(used))
+                index.set_recipe_alternatives(recipe_id, [(ingredient, rng.choice(ingredient_ids))])
+        build_seconds = time.perf_counter() - started
+
+        timings = []
+        for _ in range(options['queries']):
+            pantry = set(rng.choices(ingredient_ids, weights=weights, k=options['pantry_size']))
+            started = time.perf_counter()
+            index.match(pantry, limit=options['limit'])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        percentile = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+        self.stdout.write(f'Built index for {options["recipes"]} recipes in {build_seconds:.2f}s')
+        self.stdout.write(
+            f'match(): mean {statistics.mean(timings):.2f}ms  p50 {percentile(0.5):.2f}ms  '
+            f'p95 {percentile(0.95):.2f}ms  p99 {percentile(0.99):.2f}ms'
+        )
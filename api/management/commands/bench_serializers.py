@@ -0,0 +1,84 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from app.models import Product, Recipe
+from api.fastpath import FastSerializer
+from api.querysets import RECIPE_PLANNER
+from api.renderers import FastJSONRenderer
+from api.seeding import DEFAULT_SIZES, seed_dataset
+from api.serializers import ProductSerializer, RecipeSerializer
+
+TARGETS = {
+    'recipes': (Recipe, RecipeSerializer, RECIPE_PLANNER),
+    'products': (Product, ProductSerializer, None),
+}
+
+
+def drf_page(model, serializer_class, planner, request, size):
+    """Model instances through the ModelSerializer and JSONRenderer, as the list views did before api.fastpath."""
+    queryset = model.objects.order_by('-created_at', '-id')
+    if planner is not None:
+        queryset = planner.plan(queryset)
+    data = serializer_class(list(queryset[:size]), many=True, context={'request': request}).data
+    return JSONRenderer().render(data)
+
+
+def fast_page(model, serializer_class, planner, request, size):
+    fast = FastSerializer(serializer_class(context={'request': request}))
+    rows = list(model.objects.order_by('-created_at', '-id').values(*fast.columns)[:size])
+    return FastJSONRenderer().render(fast.serialize(rows))
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and time a page of recipes/products serialized by DRF '
+            'versus api.fastpath, checking both produce the same bytes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every seed_data default size')
+        parser.add_argument('--page-size', type=int, action='append', dest='page_sizes', help='Default: 100, 250, 500')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        page_sizes = options['page_sizes'] or [100, 250, 500]
+        sizes = {name: int(size * options['scale']) for name, size in DEFAULT_SIZES.items()}
+        request = Request(APIRequestFactory().get('/api/all_recipes/'))
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed_dataset(seed=options['seed'], **sizes)
+            results = {}
+            for target, args in TARGETS.items():
+                for size in page_sizes:
+                    body = drf_page(*args, request, size)
+                    if fast_page(*args, request, size) != body:
+                        raise CommandError(f'{target} x{size}: fast path output differs from DRF')
+                    row = {'bytes': len(body)}
+                    for label, build in (('drf', drf_page), ('fast', fast_page)):
+                        timings = []
+                        for _ in range(options['iterations']):
+                            started = time.perf_counter()
+                            build(*args, request, size)
+                            timings.append((time.perf_counter() - started) * 1000)
+                        row[f'{label}_ms'] = round(statistics.median(timings), 3)
+                    row['speedup'] = round(row['drf_ms'] / row['fast_ms'], 2) if row['fast_ms'] else None
+                    results[f'{target} x{size}'] = row
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f'{"page":<18}{"bytes":>10}{"drf ms":>10}{"fast ms":>10}{"speedup":>9}')
+        for label, row in results.items():
+            self.stdout.write(f'{label:<18}{row["bytes"]:>10}{row["drf_ms"]:>10}{row["fast_ms"]:>10}{row["speedup"]:>8}x')
@@ -0,0 +1,64 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.postings import TagPostingsIndex, page_ids
+
+
+class Command(BaseCommand):
+    help = 'Measure tag set filtering latency (select + one page of ids) on a synthetic in-memory catalog (no database access).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--per-recipe', type=int, default=5)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tag_ids = range(1, options['tags'] + 1)
+        # Zipf-ish popularity: a few tags (quick, vegetarian, ...) label a large share of recipes
+        weights = [1 / rank for rank in tag_ids]
+
+        rows = []
+        for recipe_id in range(1, options['recipes'] + 1):
+            category_id = rng.randint(1, options['categories'])
+            for tag_id in set(rng.choices(tag_ids, weights=weights, k=options['per_recipe'])):
+                rows.append((recipe_id, category_id, tag_id))
+        index = TagPostingsIndex()
+        started = time.perf_counter()
+        index.load(rows)
+        build_seconds = time.perf_counter() - started
+
+        pick = lambda count: set(rng.choices(tag_ids, weights=weights, k=count))
+        shapes = {
+            'any of 3': lambda: {'any_tags': pick(3)},
+            'all of 2': lambda: {'all_tags': pick(2)},
+            'all of 2 + category': lambda: {'all_tags': pick(2), 'category': rng.randint(1, options['categories'])},
+            'any of 3 - exclude 2': lambda: {'any_tags': pick(3), 'exclude_tags': pick(2)},
+            'exclude 1 (deep page)': lambda: {'exclude_tags': pick(1)},
+        }
+        self.stdout.write(f'Built index for {options["recipes"]} recipes x {options["tags"]} tags in {build_seconds:.2f}s')
+        for label, make_query in shapes.items():
+            timings, matched = [], []
+            for _ in range(options['queries']):
+                query = make_query()
+                offset = options['recipes'] // 2 if 'deep' in label else 0
+                started = time.perf_counter()
+                bits = index.select(**query)
+                count = bits.bit_count()
+                page_ids(bits, offset, options['page_size'])
+                timings.append((time.perf_counter() - started) * 1000)
+                matched.append(count)
+            timings.sort()
+            percentile = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))]
+            self.stdout.write(
+                f'{label:<24} mean {statistics.mean(timings):.3f}ms  p50 {percentile(0.5):.3f}ms  '
+                f'p95 {percentile(0.95):.3f}ms  p99 {percentile(0.99):.3f}ms  '
+                f'(mean {statistics.mean(matched):.0f} matches)'
+            )
@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORTERS, ExportFilterError, filter_orders
+
+
+class Command(BaseCommand):
+    help = 'Stream orders and their lines as CSV or NDJSON (to stdout, or to a file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--format', choices=sorted(EXPORTERS), default='csv')
+        parser.add_argument('--start', help='First day (YYYY-MM-DD) or datetime to include')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD) or datetime to include')
+        parser.add_argument('--status')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            queryset = filter_orders(start=options['start'], end=options['end'], status=options['status'])
+        except ExportFilterError as exc:
+            raise CommandError(str(exc))
+        exporter, _ = EXPORTERS[options['format']]
+        lines = exporter(queryset, chunk_size=options['chunk_size'])
+        if options['path'] == '-':
+            sys.stdout.writelines(lines)
+        else:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
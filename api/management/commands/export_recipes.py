@@ -0,0 +1,21 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.bulk import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Export every recipe as NDJSON (to stdout, or to a file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        lines = export_recipes(chunk_size=options['chunk_size'])
+        if options['path'] == '-':
+            sys.stdout.writelines(lines)
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as output:
+                output.writelines(lines)
@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from api.bulk import RecipeImporter
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an NDJSON file (one recipe per line, "-" for stdin).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        importer = RecipeImporter(chunk_size=options['chunk_size'])
+        if options['path'] == '-':
+            report = importer.run(sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                report = importer.run(lines)
+        for error in report['errors']:
+            self.stderr.write(f'line {error["line"]}: {error["error"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["created"]} recipes ({len(report["errors"])} errors).'
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recommendations import rebuild_neighbors
+
+
+class Command(BaseCommand):
+    help = 'Recompute every recipe\'s "users who favorited this also favorited" list from the Favorite table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild_neighbors(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Stored {rows} neighbor rows in {time.perf_counter() - started:.1f}s'))
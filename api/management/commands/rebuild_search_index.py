@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.search import product_index, recipe_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for recipes and products (e.g. after bulk loads).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for name, index in (('recipes', recipe_index), ('products', product_index)):
+            if not index.is_supported():
+                self.stdout.write(self.style.WARNING(f'Full-text search is not supported on this database, skipping {name}.'))
+                continue
+            count = index.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {name}.'))
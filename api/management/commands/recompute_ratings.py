@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute every recipe\'s rating average, review count and histogram from the Review table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = recompute_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated rating aggregates on {updated} recipes.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.seeding import DEFAULT_SIZES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = 'Insert a deterministic synthetic dataset (users, recipes, reviews, favorites, products, orders).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; also prefixes generated names')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every default size')
+        for name, size in DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name.replace("_", "-")}', type=int, dest=name, help=f'Default {size}')
+
+    def handle(self, *args, **options):
+        sizes = {
+            name: options[name] if options[name] is not None else int(size * options['scale'])
+            for name, size in DEFAULT_SIZES.items()
+        }
+        counts = seed_dataset(seed=options['seed'], **sizes)
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name}' for name, count in counts.items())))
@@ -0,0 +1,122 @@
+import threading
+from bisect import bisect_left
+
+from .caching import cache_stats
+
+# Upper bounds of the histogram buckets; +Inf is implicit
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)  # Bytes
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label value."""
+
+    def __init__(self, name, help_text, buckets, label='view'):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self.series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        position = bisect_left(self.buckets, value)  # Buckets are "less than or equal"
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {key: list(values) for key, values in self.series.items()}
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {values[-1]:.9g}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.values = {}
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            labels = ','.join(f'{name}="{_escape(str(label))}"' for name, label in zip(self.labels, label_values))
+            lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# In-process registry filled by api.middleware.PerformanceMiddleware; each worker exposes its own
+REQUEST_DURATION = Histogram('rapi_request_duration_seconds', 'Wall time per view action.', DURATION_BUCKETS)
+DB_DURATION = Histogram('rapi_db_duration_seconds', 'Time spent in SQL per request.', DURATION_BUCKETS)
+DB_QUERIES = Histogram('rapi_db_queries', 'SQL statements per request.', QUERY_COUNT_BUCKETS)
+SERIALIZER_DURATION = Histogram('rapi_serializer_duration_seconds', 'Time spent in serializer.data per request.',
+                                DURATION_BUCKETS)
+RESPONSE_SIZE = Histogram('rapi_response_size_bytes', 'Response body size (non-streaming responses).', SIZE_BUCKETS)
+RESPONSES = Counter('rapi_responses_total', 'Sampled responses by view action and status code.', ('view', 'status'))
+
+METRICS = (REQUEST_DURATION, DB_DURATION, DB_QUERIES, SERIALIZER_DURATION, RESPONSE_SIZE, RESPONSES)
+
+
+def observe(view, status, wall, db_time, db_queries, serializer_time, size):
+    REQUEST_DURATION.observe(view, wall)
+    DB_DURATION.observe(view, db_time)
+    DB_QUERIES.observe(view, db_queries)
+    SERIALIZER_DURATION.observe(view, serializer_time)
+    if size is not None:
+        RESPONSE_SIZE.observe(view, size)
+    RESPONSES.inc(view, status)
+
+
+def reset():
+    for metric in METRICS:
+        metric.reset()
+
+
+def render_prometheus():
+    """Text exposition format 0.0.4 for the histograms above plus the shared response cache counters."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.expose())
+    stats = cache_stats()
+    lines.extend([
+        '# HELP rapi_response_cache_hits_total Response cache hits (all processes).',
+        '# TYPE rapi_response_cache_hits_total counter',
+        f'rapi_response_cache_hits_total {stats["hits"]}',
+        '# HELP rapi_response_cache_misses_total Response cache misses (all processes).',
+        '# TYPE rapi_response_cache_misses_total counter',
+        f'rapi_response_cache_misses_total {stats["misses"]}',
+    ])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,141 @@
+import contextvars
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+from . import metrics
+
+_current = contextvars.ContextVar('rapi_request_stats', default=None)
+
+
+class RequestStats:
+    """Timings of one sampled request; also the execute_wrapper counting its SQL."""
+    __slots__ = ('view', 'db_queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def instrument_serializers():
+    """
+    Time BaseSerializer.data, which Serializer.data and ListSerializer.data both go through.
+    Only the outermost call is counted, so nested .data calls are not added twice.
+    """
+    original = serializers.BaseSerializer.data.fget
+    if getattr(original, 'instrumented', False):
+        return
+
+    def data(self):
+        stats = _current.get()
+        if stats is None or stats.serializer_depth:
+            return original(self)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            stats.serializer_depth -= 1
+            stats.serializer_time += time.perf_counter() - started
+
+    data.instrumented = True
+    serializers.BaseSerializer.data = property(data)
+
+
+def view_label(request, view_func):
+    """`RecipeViewSet.list`, `OrderViewSet.checkout`, `RecipesByTagView.get`, ..."""
+    cls = getattr(view_func, 'cls', None)  # Set by APIView.as_view()
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    method = request.method.lower()
+    actions = getattr(view_func, 'actions', None) or {}  # Set by ViewSet.as_view()
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+class PerformanceMiddleware:
+    """
+    Records wall time, SQL count and time, serializer time and response size per view action
+    for a METRICS_SAMPLE_RATE share of requests. Sampled responses get a Server-Timing header;
+    the aggregates are exposed by /api/_metrics (api.metrics). Keep it first in MIDDLEWARE.
+
+    Serializer time includes the queries lazily run while serializing; streamed bodies are
+    produced after the middleware returns and are not timed. Runs natively in both sync and
+    async chains, so async views stay on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        instrument_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with self.wrap_connections(stats):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        # Connections are per thread: wrap the ones of the thread the request's async ORM calls run in
+        wrapped = await sync_to_async(self.wrap_connections)(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(wrapped.close)()
+            _current.reset(token)
+        return self.record(request, response, stats, time.perf_counter() - started)
+
+    @staticmethod
+    def wrap_connections(stats):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        return stack
+
+    @staticmethod
+    def record(request, response, stats, wall):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            stats.view = view_label(request, match.func)
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = (
+            f'app;dur={wall * 1000:.1f}, db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries", '
+            f'serializer;dur={stats.serializer_time * 1000:.1f}'
+        )
+        metrics.observe(stats.view, response.status_code, wall, stats.db_time, stats.db_queries,
+                        stats.serializer_time, size)
+        return response
@@ -1,11 +1,159 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
 
-class CustomPageNumberPagination(PageNumberPagination):
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL (no table scan); exact COUNT(*) elsewhere."""
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on (created_at, id), newest first, for models that have `created_at`,
+    and on id alone otherwise. Each page is a range scan from the cursor position, so there
+    is no OFFSET and no COUNT(*), and rows inserted meanwhile never shift later pages.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'  # ?count=estimate adds an X-Estimated-Count header
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    @staticmethod
+    def get_ordering_fields(model):
+        field_names = {field.name for field in model._meta.concrete_fields}
+        return ('created_at', 'id') if 'created_at' in field_names else ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = self.get_ordering_fields(queryset.model)
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.estimated_count = estimate_count(queryset)
+
+        position, reverse = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self.position_filter(position, after=not reverse))
+        # Walking backwards means scanning ascending from the cursor and flipping the page afterwards
+        ordering = self.fields if reverse else [f'-{field}' for field in self.fields]
+        rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def position_filter(self, position, after):
+        """Lexicographic (a, b) < (a0, b0) for the next page, > for the previous one."""
+        lookup = 'lt' if after else 'gt'
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            tie = {name: position[name] for name in self.fields[:index]}
+            condition |= Q(**tie, **{f'{field}__{lookup}': position[field]})
+        return condition
+
+    def encode_cursor(self, row, reverse):
+        position = [str(row[field] if isinstance(row, dict) else getattr(row, field)) for field in self.fields]  # values() rows too
+        raw = json.dumps({'p': position, 'r': int(reverse)}).encode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, base64.urlsafe_b64encode(raw).decode())
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values = [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, data['p'])]
+            if len(values) != len(self.fields):
+                raise ValueError
+            return dict(zip(self.fields, values)), bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        headers = {}
+        if self.estimated_count is not None:
+            headers['X-Estimated-Count'] = str(self.estimated_count)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }, headers=headers)
+
+
+class KeysetOptInMixin:
+    """
+    Lets a client switch any paginator to keyset mode per request with ?pagination=cursor.
+    Following the returned links keeps it there; everyone else gets the usual page format.
+    """
+    mode_query_param = 'pagination'
+    keyset = None
+
+    def wants_keyset(self, request):
+        return (request.query_params.get(self.mode_query_param) == 'cursor'
+                or KeysetPagination.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.keyset = KeysetPagination(page_size=self.get_keyset_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CustomPageNumberPagination(KeysetOptInMixin, PageNumberPagination):
     page_size = 3  # Default items per page
     page_size_query_param = 'page_size'  # Allows users to specify page size
     max_page_size = 6  # Limits max items per page
 
-class ProductsPagePagination(PageNumberPagination):
+    def get_keyset_page_size(self, request):
+        return self.get_page_size(request)
+
+class ProductsPagePagination(KeysetOptInMixin, PageNumberPagination):
     page_size = 5  # Default items per page
     page_size_query_param = 'page_size'  # Allows users to specify page size
-    max_page_size = 10  # Limits max items per page
\ No newline at end of file
+    max_page_size = 10  # Limits max items per page
+
+    def get_keyset_page_size(self, request):
+        return self.get_page_size(request)
+
+class DefaultLimitOffsetPagination(KeysetOptInMixin, LimitOffsetPagination):
+    """Project-wide default (orders, order items, reviews, ...): limit/offset unless cursor mode is requested."""
+    def get_keyset_page_size(self, request):
+        return self.get_limit(request)
@@ -0,0 +1,120 @@
+import heapq
+from array import array
+from collections import Counter, defaultdict
+
+from app.models import IngredientModel, Recipe
+from .indexes import RECIPE_ALTERNATIVES, RECIPE_INGREDIENTS, RECIPE_ROWS, InMemoryIndex, sorted_contains, sorted_insert, sorted_remove
+
+
+class PantryIndex(InMemoryIndex):
+    """
+    Inverted index from ingredient to recipes for "what can I cook?" matching.
+
+    postings:     ingredient id -> sorted array('q') of recipe ids using it
+    required:     recipe id -> sorted array('q') of its ingredients_used ids
+    substitutes:  alternative ingredient id -> {(recipe id, ingredient id it can replace)}
+    """
+    source_models = (RECIPE_ROWS, RECIPE_INGREDIENTS, RECIPE_ALTERNATIVES)
+
+    def __init__(self):
+        super().__init__()
+        self.postings = {}
+        self.required = {}
+        self.substitutes = defaultdict(set)
+        self.alternatives = defaultdict(dict)  # recipe id -> {ingredient id: alternative id}
+
+    def build(self):
+        postings, required = defaultdict(list), defaultdict(list)
+        rows = Recipe.ingredients_used.through.objects.order_by('recipe_id', 'ingredientname_id') \
+            .values_list('recipe_id', 'ingredientname_id')
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            postings[ingredient_id].append(recipe_id)
+            required[recipe_id].append(ingredient_id)
+        self.postings = {key: array('q', sorted(values)) for key, values in postings.items()}
+        self.required = {key: array('q', values) for key, values in required.items()}
+        self.substitutes, self.alternatives = defaultdict(set), defaultdict(dict)
+        alternatives = IngredientModel.objects.filter(alternative_ingredient__isnull=False) \
+            .values_list('recipe_id', 'name_id', 'alternative_ingredient_id')
+        for recipe_id, ingredient_id, alternative_id in alternatives.iterator(chunk_size=10000):
+            self._add_alternative(recipe_id, ingredient_id, alternative_id)
+
+    # Incremental maintenance (from the change log, see InMemoryIndex)
+
+    def set_recipe_ingredients(self, recipe_id, ingredient_ids):
+        with self.lock:
+            for ingredient_id in self.required.pop(recipe_id, ()):
+                sorted_remove(self.postings.get(ingredient_id, array('q')), recipe_id)
+            ingredient_ids = sorted(set(ingredient_ids))
+            if ingredient_ids:
+                self.required[recipe_id] = array('q', ingredient_ids)
+            for ingredient_id in ingredient_ids:
+                sorted_insert(self.postings.setdefault(ingredient_id, array('q')), recipe_id)
+
+    def set_recipe_alternatives(self, recipe_id, alternatives):
+        """`alternatives` is an iterable of (ingredient id, alternative ingredient id)."""
+        with self.lock:
+            for ingredient_id, alternative_id in self.alternatives.pop(recipe_id, {}).items():
+                self.substitutes[alternative_id].discard((recipe_id, ingredient_id))
+            for ingredient_id, alternative_id in alternatives:
+                self._add_alternative(recipe_id, ingredient_id, alternative_id)
+
+    def patch(self, recipe_ids):
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = Recipe.ingredients_used.through.objects.filter(recipe_id__in=recipe_ids) \
+            .values_list('recipe_id', 'ingredientname_id')
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].append(ingredient_id)
+        alternatives = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = IngredientModel.objects.filter(recipe_id__in=recipe_ids, alternative_ingredient__isnull=False) \
+            .values_list('recipe_id', 'name_id', 'alternative_ingredient_id')
+        for recipe_id, ingredient_id, alternative_id in rows:
+            alternatives[recipe_id].append((ingredient_id, alternative_id))
+        with self.lock:
+            for recipe_id in recipe_ids:  # Deleted recipes come back empty and drop out
+                self.set_recipe_ingredients(recipe_id, ingredients[recipe_id])
+                self.set_recipe_alternatives(recipe_id, alternatives[recipe_id])
+        return True
+
+    def _add_alternative(self, recipe_id, ingredient_id, alternative_id):
+        self.substitutes[alternative_id].add((recipe_id, ingredient_id))
+        self.alternatives[recipe_id][ingredient_id] = alternative_id
+
+    # Querying
+
+    def match(self, owned, limit=10):
+        """
+        Top `limit` recipes by coverage: the share of a recipe's ingredients_used the pantry
+        satisfies, directly or through an IngredientModel alternative.
+        Returns [(recipe id, coverage, satisfied, required)], best first.
+        """
+        owned = set(owned)
+        satisfied, substituted = Counter(), defaultdict(set)
+        with self.lock:
+            for ingredient_id in owned:
+                satisfied.update(self.postings.get(ingredient_id, ()))  # Counted in C, not a Python loop
+            for alternative_id in owned:
+                for recipe_id, ingredient_id in self.substitutes.get(alternative_id, ()):
+                    # Only a missing ingredient still part of the recipe, and never through an alternative
+                    # the recipe already needs itself: that one is counted above
+                    needed = self.required.get(recipe_id, ())
+                    if ingredient_id not in owned and sorted_contains(needed, ingredient_id) \
+                            and not sorted_contains(needed, alternative_id):
+                        substituted[recipe_id].add(ingredient_id)  # A set: two owned alternatives stand in once
+            for recipe_id, ingredient_ids in substituted.items():
+                satisfied[recipe_id] += len(ingredient_ids)
+            required = self.required
+            coverage = {recipe_id: count / len(required[recipe_id]) for recipe_id, count in satisfied.items()}
+            if not coverage:
+                return []
+            # Cut at the k-th best coverage (C-level nlargest), then order only the survivors
+            threshold = min(heapq.nlargest(limit, coverage.values()))
+            candidates = [
+                (recipe_id, share, satisfied[recipe_id], len(required[recipe_id]))
+                for recipe_id, share in coverage.items() if share >= threshold
+            ]
+        # Best coverage first, then fewest missing ingredients, then newest recipe
+        candidates.sort(key=lambda row: (row[1], row[2] - row[3], row[0]), reverse=True)
+        return candidates[:limit]
+
+
+pantry_index = PantryIndex()
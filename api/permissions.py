@@ -18,19 +18,10 @@ class IsOwnerOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in ['GET', 'HEAD', 'OPTIONS']:  # Allow read-only requests
             return True
-        return obj.author == request.user or request.user.role == 'admin'
+        return obj.author_id == request.user.pk or request.user.role == 'admin'
 
 
 class IsRecipeAuthor(BasePermission):
+    """Compares ids, so neither side is loaded. Creates are checked in the view against the validated recipe."""
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user
-
-    def has_permission(self, request, view):
-        # Check if the user is the author of the recipe when creating a new ingredient
-        if view.action == 'create':
-            recipe_id = request.data.get('recipe')
-            if recipe_id:
-                from app.models import Recipe
-                recipe = Recipe.objects.get(id=recipe_id)
-                return recipe.author == request.user
-        return True
+        return obj.author_id == request.user.pk
@@ -0,0 +1,191 @@
+import re
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from app.models import Recipe
+from .indexes import RECIPE_CATEGORY, RECIPE_ROWS, RECIPE_TAGS, InMemoryIndex
+from .pantry import pantry_index
+
+NONZERO_BYTE = re.compile(rb'[^\x00]')
+BYTE_BITS = [tuple(bit for bit in range(7, -1, -1) if byte >> bit & 1) for byte in range(256)]  # Highest bit first
+
+
+def to_bits(ids):
+    """A Python int with bit `id` set for every id: the bitset form of a posting list."""
+    if not ids:
+        return 0
+    raw = bytearray(max(ids) // 8 + 1)
+    for value in ids:
+        raw[value >> 3] |= 1 << (value & 7)
+    return int.from_bytes(raw, 'little')
+
+
+def page_ids(bits, offset, limit):
+    """The ids ranked offset .. offset + limit - 1 in a bitset, highest first."""
+    if offset:
+        # Binary search the bit position with exactly `offset` ids above it; each probe is one C-level popcount
+        low, high = 0, bits.bit_length()
+        while low < high:
+            middle = (low + high) // 2
+            if (bits >> middle).bit_count() <= offset:
+                high = middle
+            else:
+                low = middle + 1
+        bits &= (1 << low) - 1
+    raw = bits.to_bytes((bits.bit_length() + 7) // 8, 'big')
+    top, ids = len(raw) - 1, []
+    for match in NONZERO_BYTE.finditer(raw):  # Skips runs of empty bytes in C
+        position = match.start()
+        base = (top - position) * 8
+        ids.extend(base + bit for bit in BYTE_BITS[raw[position]])
+        if len(ids) >= limit:
+            break
+    return ids[:limit]
+
+
+def ingredient_bits(ingredient_ids):
+    """Bitsets of the recipes using each ingredient, from the pantry index's posting lists."""
+    pantry_index.ensure_fresh()
+    with pantry_index.lock:
+        return [to_bits(pantry_index.postings.get(ingredient_id, ())) for ingredient_id in ingredient_ids]
+
+
+class BitsetResult:
+    """
+    A bitset of recipe ids that paginators can count and slice like a queryset, newest id first.
+    Only the ids of the requested slice are decoded and read from `queryset`.
+    """
+
+    def __init__(self, bits, queryset):
+        self.bits = bits
+        self.queryset = queryset
+
+    def count(self):
+        return self.bits.bit_count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, window):
+        if not isinstance(window, slice) or window.step is not None:
+            raise TypeError('BitsetResult only supports contiguous slices')
+        start = window.start or 0
+        stop = self.count() if window.stop is None else window.stop
+        ids = page_ids(self.bits, start, max(stop - start, 0))
+        rows = {row.pk: row for row in self.queryset.filter(pk__in=ids)} if ids else {}
+        return [rows[recipe_id] for recipe_id in ids if recipe_id in rows]  # Rows deleted meanwhile drop out
+
+
+class TagPostingsIndex(InMemoryIndex):
+    """
+    Per-tag and per-category recipe sets as int bitsets (bit n set = recipe n), so any-of,
+    all-of and exclude filters are C-level |, & and & ~ over a few kilobytes instead of joins.
+
+    universe:         every recipe id
+    tags/categories:  tag or category id -> bitset of its recipes
+    recipe_tags:      recipe id -> its tag ids, to patch the bitsets when they change
+    """
+    source_models = (RECIPE_ROWS, RECIPE_CATEGORY, RECIPE_TAGS)
+
+    def __init__(self):
+        super().__init__()
+        self.universe = 0
+        self.tags, self.categories = {}, {}
+        self.recipe_tags, self.recipe_category = {}, {}
+
+    def build(self):
+        # One LEFT JOIN: a row per (recipe, tag), tag None for untagged recipes
+        rows = Recipe.objects.order_by().values_list('pk', 'categories_id', 'tags')
+        self.load(rows.iterator(chunk_size=10000))
+
+    def load(self, rows):
+        """Replace the contents with (recipe id, category id, tag id) rows."""
+        recipe_tags, recipe_category = defaultdict(list), {}
+        for recipe_id, category_id, tag_id in rows:
+            recipe_category[recipe_id] = category_id
+            if tag_id is not None:
+                recipe_tags[recipe_id].append(tag_id)
+        tags, categories = defaultdict(list), defaultdict(list)
+        for recipe_id, tag_ids in recipe_tags.items():
+            for tag_id in tag_ids:
+                tags[tag_id].append(recipe_id)
+        for recipe_id, category_id in recipe_category.items():
+            if category_id is not None:
+                categories[category_id].append(recipe_id)
+        self.universe = to_bits(list(recipe_category))
+        self.tags = {tag_id: to_bits(ids) for tag_id, ids in tags.items()}
+        self.categories = {category_id: to_bits(ids) for category_id, ids in categories.items()}
+        self.recipe_tags = {recipe_id: tuple(tag_ids) for recipe_id, tag_ids in recipe_tags.items()}
+        self.recipe_category = recipe_category
+
+    # Incremental maintenance (from the change log, see InMemoryIndex)
+
+    @staticmethod
+    def _move(sets, recipe_id, old, new):
+        bit = 1 << recipe_id
+        for key in old:
+            if key in sets:
+                sets[key] &= ~bit
+        for key in new:
+            sets[key] = sets.get(key, 0) | bit
+
+    def set_recipe(self, recipe_id, category_id):
+        with self.lock:
+            self.universe |= 1 << recipe_id
+            previous = self.recipe_category.get(recipe_id)
+            self._move(self.categories, recipe_id, [previous] if previous is not None else [],
+                       [category_id] if category_id is not None else [])
+            self.recipe_category[recipe_id] = category_id
+
+    def set_recipe_tags(self, recipe_id, tag_ids):
+        with self.lock:
+            tag_ids = tuple(set(tag_ids))
+            self._move(self.tags, recipe_id, self.recipe_tags.pop(recipe_id, ()), tag_ids)
+            if tag_ids:
+                self.recipe_tags[recipe_id] = tag_ids
+
+    def patch(self, recipe_ids):
+        categories, tags = {}, defaultdict(list)
+        for recipe_id, category_id, tag_id in Recipe.objects.filter(pk__in=recipe_ids).values_list('pk', 'categories_id', 'tags'):
+            categories[recipe_id] = category_id
+            if tag_id is not None:
+                tags[recipe_id].append(tag_id)
+        with self.lock:
+            for recipe_id in recipe_ids:
+                if recipe_id in categories:
+                    self.set_recipe(recipe_id, categories[recipe_id])
+                    self.set_recipe_tags(recipe_id, tags[recipe_id])
+                else:  # Deleted
+                    self.remove_recipe(recipe_id)
+        return True
+
+    def remove_recipe(self, recipe_id):
+        with self.lock:
+            self.set_recipe_tags(recipe_id, ())
+            previous = self.recipe_category.pop(recipe_id, None)
+            self._move(self.categories, recipe_id, [previous] if previous is not None else [], [])
+            self.universe &= ~(1 << recipe_id)
+
+    # Querying
+
+    def select(self, any_tags=(), all_tags=(), exclude_tags=(), category=None, required=()):
+        """
+        Bitset of the recipes having at least one of `any_tags`, every one of `all_tags`, none of
+        `exclude_tags`, the given category, and set in every bitset of `required`.
+        """
+        with self.lock:
+            bits = self.universe
+            if any_tags:
+                bits &= reduce(or_, (self.tags.get(tag_id, 0) for tag_id in any_tags))
+            sets = [self.tags.get(tag_id, 0) for tag_id in all_tags] + list(required)
+            if category is not None:
+                sets.append(self.categories.get(category, 0))
+            for other in sorted(sets, key=int.bit_length):  # Smallest first: & shrinks to the shorter operand
+                bits &= other
+            for tag_id in exclude_tags:
+                bits &= ~self.tags.get(tag_id, 0)
+        return bits
+
+
+tag_postings_index = TagPostingsIndex()
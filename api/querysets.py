@@ -0,0 +1,112 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from app.models import IngredientName, PostImage, Tag
+
+
+class QuerysetPlanner:
+    """
+    Maps serializer field names to the select_related/prefetch_related calls they need,
+    so every row of a page is resolved with a fixed number of queries.
+    """
+    def __init__(self, select_related=None, prefetch_related=None):
+        self.select_related = dict(select_related or {})  # field name -> FK path
+        self.prefetch_related = dict(prefetch_related or {})  # field name -> reverse/M2M path
+
+    def plan(self, queryset, fields=None):
+        """Apply the joins/prefetches needed for `fields` (all known relations when None)."""
+        select = [path for field, path in self.select_related.items() if fields is None or field in fields]
+        prefetch = [path for field, path in self.prefetch_related.items() if fields is None or field in fields]
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+RECIPE_PLANNER = QuerysetPlanner(
+    select_related={'author': 'author', 'categories': 'categories'},
+    # Ordered by pk so related lists come out stable, and the same as api.fastpath builds them
+    prefetch_related={
+        'tags': Prefetch('tags', queryset=Tag.objects.order_by('pk')),
+        'ingredients_used': Prefetch('ingredients_used', queryset=IngredientName.objects.order_by('pk')),
+        'post_images': Prefetch('post_images', queryset=PostImage.objects.order_by('pk')),
+    },
+)
+
+
+def _split(values):
+    return {name.strip() for value in values for name in value.split(',') if name.strip()}
+
+
+def requested_fields(request, available):
+    """
+    Field names kept by ?fields=a,b and/or ?exclude=c on a safe request, or None for all of them.
+    Writes always use the full serializer so no input field is silently dropped.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields, exclude = _split(request.query_params.getlist('fields')), _split(request.query_params.getlist('exclude'))
+    if not fields and not exclude:
+        return None
+    unknown = (fields | exclude) - set(available)
+    if unknown:
+        raise ValidationError({'fields': f'Unknown field(s): {", ".join(sorted(unknown))}.'})
+    return frozenset((fields or set(available)) - exclude)
+
+
+_readable_sources = {}
+
+
+def readable_sources(serializer_class):
+    """{field name: source} of the fields a serializer class outputs; built once per class."""
+    if serializer_class not in _readable_sources:
+        fields = serializer_class().fields
+        _readable_sources[serializer_class] = {name: field.source for name, field in fields.items() if not field.write_only}
+    return _readable_sources[serializer_class]
+
+
+def prune_columns(queryset, sources, fields, always_loaded=(), column_dependencies=None):
+    """
+    only() the columns behind `fields`. Reverse and M2M relations are left to the planner's
+    prefetches. A field backed by anything but a model field (a property, a dotted source) may
+    read any column, so the queryset is returned untouched.
+    """
+    model = queryset.model
+    columns = {model._meta.pk.name, *always_loaded}
+    for name in fields:
+        source = sources[name]
+        try:
+            field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return queryset
+        if field.concrete and not field.many_to_many:
+            columns.add(field.name)
+            columns.update((column_dependencies or {}).get(name, ()))
+    return queryset.only(*columns)
+
+
+class PlannedQuerysetMixin:
+    """
+    Runs the view's queryset through `queryset_planner` for every action that serializes rows,
+    narrowed to the ?fields=/?exclude= selection: unrequested relations are neither joined nor
+    prefetched and unrequested columns are deferred.
+    """
+    queryset_planner = None
+    unplanned_actions = ('destroy',)  # Nothing is serialized, so the prefetches would be wasted
+    always_loaded_fields = ()  # Read outside the serializer (cursor pagination, conditional GET)
+    column_dependencies = {}  # Serializer field -> extra columns it reads, e.g. image -> image_variants
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'action', None) in self.unplanned_actions:
+            return queryset
+        sources = readable_sources(self.get_serializer_class())
+        fields = requested_fields(self.request, sources)
+        if self.queryset_planner is not None:
+            queryset = self.queryset_planner.plan(queryset, fields)
+        if fields is not None:
+            queryset = prune_columns(queryset, sources, fields, self.always_loaded_fields, self.column_dependencies)
+        return queryset
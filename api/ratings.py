@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from app.models import Recipe, Review
+from .caching import bump_version
+
+# Rating aggregates are versioned apart from Recipe: the in-memory indexes watch the Recipe
+# counter, and a review doesn't change anything they hold
+RATINGS_VERSION = 'app.recipe.ratings'
+
+
+def summarize(histogram):
+    """(review count, average rating) of a {"score": count} histogram."""
+    count = sum(histogram.values())
+    if not count:
+        return 0, 0
+    return count, sum(int(score) * n for score, n in histogram.items()) / count
+
+
+def apply_rating_change(recipe_id, added=None, removed=None):
+    """
+    Fold one review's rating into a recipe's aggregates: `added` for a new score, `removed`
+    for the score it replaces or deletes. The recipe row is locked so concurrent reviews
+    can't lose each other's updates.
+    """
+    with transaction.atomic():
+        histogram = Recipe.objects.select_for_update().values_list('rating_histogram', flat=True).get(pk=recipe_id)
+        histogram = dict(histogram or {})
+        if removed is not None:
+            remaining = histogram.get(str(removed), 0) - 1
+            if remaining > 0:
+                histogram[str(removed)] = remaining
+            else:
+                histogram.pop(str(removed), None)
+        if added is not None:
+            histogram[str(added)] = histogram.get(str(added), 0) + 1
+        count, average = summarize(histogram)
+        # update() skips post_save (no search re-index needed), so invalidate cached lists explicitly
+        Recipe.objects.filter(pk=recipe_id).update(
+            rating=average, rating_count=count, rating_histogram=histogram, updated_at=timezone.now(),
+        )
+    bump_version(RATINGS_VERSION)
+
+
+def recompute_ratings(batch_size=1000):
+    """Rebuild every recipe's aggregates from the Review table in one grouped pass."""
+    histograms = {}
+    for row in Review.objects.values('recipe_id', 'rating').annotate(n=Count('id')).order_by():
+        histograms.setdefault(row['recipe_id'], {})[str(row['rating'])] = row['n']
+
+    updated = 0
+    with transaction.atomic():
+        recipes = Recipe.objects.only('pk', 'rating', 'rating_count', 'rating_histogram').order_by('pk')
+        fields = ['rating', 'rating_count', 'rating_histogram', 'updated_at']  # updated_at drives the detail ETag
+        batch, now = [], timezone.now()
+        for recipe in recipes.iterator(chunk_size=batch_size):
+            histogram = histograms.get(recipe.pk, {})
+            count, average = summarize(histogram)
+            if (count, average, histogram) == (recipe.rating_count, recipe.rating, recipe.rating_histogram):
+                continue
+            recipe.rating, recipe.rating_count, recipe.rating_histogram, recipe.updated_at = average, count, histogram, now
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                Recipe.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+        if batch:
+            Recipe.objects.bulk_update(batch, fields)
+            updated += len(batch)
+    if updated:
+        bump_version(RATINGS_VERSION)
+    return updated
@@ -0,0 +1,185 @@
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from app.models import Favorite, RecipeNeighbor, Review
+
+logger = logging.getLogger(__name__)
+
+NEUTRAL_RATING = 3  # A favorite reviewed with this many stars (or not reviewed) weighs 1
+
+_executor = None
+_pending, _pending_lock = set(), threading.Lock()  # Recipe ids waiting for the next background refresh
+
+
+def _weighted(favorites):
+    """
+    (user id, recipe id, weight) for each row of a Favorite queryset. With RECOMMENDATION_RATING_WEIGHT
+    the user's own review of the recipe scales the weight by rating / NEUTRAL_RATING.
+    """
+    ratings = {}
+    if settings.RECOMMENDATION_RATING_WEIGHT:
+        reviews = Review.objects.filter(recipe_id__in=favorites.values('recipe_id'), user_id__in=favorites.values('user_id'))
+        for user_id, recipe_id, rating in reviews.order_by('id').values_list('user_id', 'recipe_id', 'rating').iterator(chunk_size=10000):
+            ratings[user_id, recipe_id] = rating  # Latest review wins
+    for user_id, recipe_id in favorites.values_list('user_id', 'recipe_id').iterator(chunk_size=10000):
+        yield user_id, recipe_id, ratings.get((user_id, recipe_id), NEUTRAL_RATING) / NEUTRAL_RATING
+
+
+def _top(scores, limit):
+    """The `limit` best {neighbor id: (score, co_count)} entries; ties go to the lower id."""
+    return dict(heapq.nlargest(limit, scores.items(), key=lambda item: (item[1][0], -item[0])))
+
+
+def _cosine(dot, norm_a, norm_b):
+    return dot / math.sqrt(norm_a * norm_b) if norm_a and norm_b else 0.0
+
+
+def rebuild_neighbors(batch_size=1000):
+    """
+    Recompute every recipe's top-N list from the Favorite table in one pass: each user's favorites
+    contribute to the dot product of every pair among them, so only co-favorited pairs are touched.
+    """
+    by_user, norms = defaultdict(dict), defaultdict(float)
+    for user_id, recipe_id, weight in _weighted(Favorite.objects.all()):
+        by_user[user_id][recipe_id] = weight
+        norms[recipe_id] += weight * weight
+
+    pairs = defaultdict(lambda: [0.0, 0])  # (a, b) with a < b -> [dot product, co_count]
+    for favorites in by_user.values():
+        items = sorted(favorites.items())
+        for index, (a, weight_a) in enumerate(items):
+            for b, weight_b in items[index + 1:]:
+                pair = pairs[a, b]
+                pair[0] += weight_a * weight_b
+                pair[1] += 1
+
+    neighbors = defaultdict(dict)
+    for (a, b), (dot, co_count) in pairs.items():
+        score = _cosine(dot, norms[a], norms[b])
+        if score > 0:
+            neighbors[a][b] = neighbors[b][a] = (score, co_count)
+
+    limit = settings.RECOMMENDATION_NEIGHBORS
+    rows = [RecipeNeighbor(recipe_id=recipe_id, neighbor_id=neighbor_id, score=score, co_count=co_count)
+            for recipe_id, scores in neighbors.items()
+            for neighbor_id, (score, co_count) in _top(scores, limit).items()]
+    with transaction.atomic():
+        RecipeNeighbor.objects.all().delete()
+        RecipeNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def scores_for(recipe_id):
+    """{neighbor id: (score, co_count)} for every recipe co-favorited with `recipe_id`."""
+    users = Favorite.objects.filter(recipe_id=recipe_id).values('user_id')
+    own, dots = {}, defaultdict(lambda: [0.0, 0])
+    favorites = list(_weighted(Favorite.objects.filter(user_id__in=users)))
+    for user_id, favorite_id, weight in favorites:
+        if favorite_id == recipe_id:
+            own[user_id] = weight
+    for user_id, favorite_id, weight in favorites:
+        if favorite_id != recipe_id:
+            pair = dots[favorite_id]
+            pair[0] += own[user_id] * weight
+            pair[1] += 1
+    if not dots:
+        return {}
+
+    norms = defaultdict(float)
+    for _, favorite_id, weight in _weighted(Favorite.objects.filter(recipe_id__in=[recipe_id, *dots])):
+        norms[favorite_id] += weight * weight
+    scores = {neighbor_id: (_cosine(dot, norms[recipe_id], norms[neighbor_id]), co_count)
+              for neighbor_id, (dot, co_count) in dots.items()}
+    return {neighbor_id: entry for neighbor_id, entry in scores.items() if entry[0] > 0}
+
+
+def _store(lists):
+    """Replace the stored lists of the given recipes ({recipe id: {neighbor id: (score, co_count)}})."""
+    with transaction.atomic():
+        RecipeNeighbor.objects.filter(recipe_id__in=list(lists)).delete()
+        RecipeNeighbor.objects.bulk_create([
+            RecipeNeighbor(recipe_id=recipe_id, neighbor_id=neighbor_id, score=score, co_count=co_count)
+            for recipe_id, entries in lists.items() for neighbor_id, (score, co_count) in entries.items()
+        ])
+
+
+def refresh_neighbors(recipe_ids):
+    """
+    Bring the lists up to date after favorites (or their review weights) of `recipe_ids` changed.
+    Only pairs involving such a recipe change score, so its own list is recomputed and the pair is
+    patched into the lists of its neighbors. A full list whose entry for it got worse may now miss
+    a better candidate that was never stored, so that list is recomputed too.
+    """
+    limit = settings.RECOMMENDATION_NEIGHBORS
+    for recipe_id in set(recipe_ids):
+        scores = scores_for(recipe_id)
+        owners = set(scores) | set(RecipeNeighbor.objects.filter(neighbor_id=recipe_id).values_list('recipe_id', flat=True))
+        stored = defaultdict(dict)
+        rows = RecipeNeighbor.objects.filter(recipe_id__in=owners).values_list('recipe_id', 'neighbor_id', 'score', 'co_count')
+        for owner_id, neighbor_id, score, co_count in rows:
+            stored[owner_id][neighbor_id] = (score, co_count)
+
+        changed, stale = {recipe_id: _top(scores, limit)}, []
+        for owner_id in owners:
+            entries = dict(stored[owner_id])
+            old, new = entries.pop(recipe_id, None), scores.get(owner_id)
+            if old is not None and len(stored[owner_id]) >= limit and (new is None or new[0] < old[0]):
+                stale.append(owner_id)
+                continue
+            if new is not None:
+                entries[recipe_id] = new
+            entries = _top(entries, limit)
+            if entries != stored[owner_id]:
+                changed[owner_id] = entries
+        for owner_id in stale:
+            changed[owner_id] = _top(scores_for(owner_id), limit)
+        _store(changed)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # One worker: flushes never overlap, so two never patch the same lists at once
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recipe-neighbors')
+    return _executor
+
+
+def schedule_refresh(recipe_id):
+    """
+    Refresh once the favorite change is committed (and, on cascades, once the recipe is gone).
+    The write itself only queues the recipe id; a background flush recomputes everything
+    queued during the last RECOMMENDATION_REFRESH_DELAY seconds, off the request thread.
+    """
+    if settings.RECOMMENDATION_REFRESH_SYNC:
+        transaction.on_commit(lambda: refresh_neighbors([recipe_id]))
+    else:
+        transaction.on_commit(lambda: _enqueue(recipe_id))
+
+
+def _enqueue(recipe_id):
+    with _pending_lock:
+        first = not _pending
+        _pending.add(recipe_id)
+    if first:  # Later ids ride along with the flush already waiting
+        get_executor().submit(_flush)
+
+
+def _flush():
+    time.sleep(settings.RECOMMENDATION_REFRESH_DELAY)  # Debounce: a burst of favorites costs one refresh
+    with _pending_lock:
+        recipe_ids = list(_pending)
+        _pending.clear()
+    try:
+        refresh_neighbors(recipe_ids)
+    except Exception:
+        logger.exception('Could not refresh recipe neighbors of %s', recipe_ids)
+    finally:
+        connections.close_all()  # Worker threads own their connections
@@ -0,0 +1,31 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Optional: without it FastJSONRenderer is plain JSONRenderer
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. Output matches the stdlib
+    renderer byte for byte for API data (compact separators, UTF-8, U+2028/U+2029 escaped);
+    datetimes, decimals and anything else orjson doesn't encode like DRF go through DRF's
+    JSONEncoder, and indented (?indent= / browsable API) or unencodable data falls back to the
+    stdlib path. One difference remains: NaN and infinities become null, where the strict
+    stdlib renderer raises.
+    """
+    # Datetimes pass through to DRF's encoder: orjson writes UTC as +00:00 where DRF writes Z
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+    default = staticmethod(JSONEncoder().default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.default, option=self.options)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for JSON embedded in <script> tags
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,104 @@
+import contextvars
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'rapi_primary_until'
+
+# 'replica' or 'pinned' during a safe request when replicas are configured, else None
+_routing = contextvars.ContextVar('rapi_read_routing', default=None)
+
+
+def read_routing():
+    return _routing.get()
+
+
+@contextmanager
+def primary_reads():
+    """Route the reads of the block to the primary, e.g. data stamped with the primary's cache versions."""
+    token = _routing.set(None)
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Writes (and migrations) go to `default`. Reads go to a random DATABASE_REPLICAS alias while
+    PrimaryPinMiddleware has marked the current request as replica-safe, and to `default`
+    otherwise: outside requests, in unsafe requests, for pinned clients and inside transactions.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _routing.get() == 'replica' and settings.DATABASE_REPLICAS and not connections['default'].in_atomic_block:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS  # They replicate the primary's schema
+
+
+class PrimaryPinMiddleware:
+    """
+    Routes the reads of safe requests to replicas, unless the client wrote within the last
+    PRIMARY_PIN_SECONDS: every unsafe request sets a cookie holding that deadline, and until
+    then the client reads from the primary, so it never misses its own writes to replication lag.
+    Bodies streamed after the response is returned read from the primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(self.routing(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _routing.set(self.routing(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.pin(request, response)
+
+    def routing(self, request):
+        if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+            return None
+        return 'pinned' if self.is_pinned(request) else 'replica'
+
+    @staticmethod
+    def pin(request, response):
+        if request.method not in SAFE_METHODS and settings.PRIMARY_PIN_SECONDS > 0:
+            deadline = int(time.time()) + settings.PRIMARY_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, str(deadline), max_age=settings.PRIMARY_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    @staticmethod
+    def is_pinned(request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
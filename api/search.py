@@ -0,0 +1,184 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from app.models import Product, Recipe
+
+PG_CONFIG = 'english'
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchIndex:
+    """
+    Weighted full-text index kept next to a model's table.
+    PostgreSQL stores a `search_vector` tsvector column (GIN indexed) on the table itself,
+    SQLite keeps an FTS5 shadow table keyed by rowid. Both are created by app migration 0005.
+    """
+    model = None
+    columns = ()  # (document key, tsvector weight, bm25 weight), most important first
+    trigram_column = None  # Column matched with pg_trgm similarity for short queries
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def fts_table(self):
+        return f'{self.table}_fts'
+
+    @staticmethod
+    def is_supported():
+        return connection.vendor in ('postgresql', 'sqlite')
+
+    def documents(self, ids):
+        """Yield (pk, {document key: text}) for the given primary keys."""
+        raise NotImplementedError
+
+    # Indexing
+
+    def index(self, ids):
+        ids = list(ids)
+        if not ids or not self.is_supported():
+            return
+        rows = list(self.documents(ids))
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                vector = ' || '.join(
+                    f"setweight(to_tsvector('{PG_CONFIG}', %s), '{weight}')" for _, weight, _ in self.columns
+                )
+                cursor.executemany(
+                    f'UPDATE {self.table} SET search_vector = {vector} WHERE id = %s',
+                    [[doc[key] for key, _, _ in self.columns] + [pk] for pk, doc in rows],
+                )
+            else:
+                self._delete_fts(cursor, ids)
+                names = ', '.join(key for key, _, _ in self.columns)
+                marks = ', '.join(['%s'] * (len(self.columns) + 1))
+                cursor.executemany(
+                    f'INSERT INTO {self.fts_table} (rowid, {names}) VALUES ({marks})',
+                    [[pk] + [doc[key] for key, _, _ in self.columns] for pk, doc in rows],
+                )
+
+    def remove(self, ids):
+        if connection.vendor == 'sqlite':  # The PostgreSQL column goes away with its row
+            with connection.cursor() as cursor:
+                self._delete_fts(cursor, list(ids))
+
+    def rebuild(self, batch_size=1000):
+        ids = list(self.model.objects.order_by('pk').values_list('pk', flat=True))
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.fts_table}')
+        for start in range(0, len(ids), batch_size):
+            self.index(ids[start:start + batch_size])
+        return len(ids)
+
+    def _delete_fts(self, cursor, ids):
+        if ids:
+            marks = ', '.join(['%s'] * len(ids))
+            cursor.execute(f'DELETE FROM {self.fts_table} WHERE rowid IN ({marks})', ids)
+
+    # Querying
+
+    def search(self, queryset, terms):
+        """Filter `queryset` to rows matching `terms`, best matches first."""
+        if connection.vendor == 'postgresql':
+            return self._search_postgresql(queryset, terms)
+        return self._search_sqlite(queryset, terms)
+
+    def _search_postgresql(self, queryset, terms):
+        tsquery = f"websearch_to_tsquery('{PG_CONFIG}', %s)"
+        match_sql = f'{self.table}.search_vector @@ {tsquery}'
+        rank_sql = f'ts_rank({self.table}.search_vector, {tsquery})'
+        match_params, rank_params = [terms], [terms]
+        if self.trigram_column and len(terms) <= settings.SEARCH_TRIGRAM_MAX_LENGTH:
+            # Short queries are where typos hurt most; pg_trgm's % operator uses the trigram GIN index
+            column = f'{self.table}.{self.trigram_column}'
+            match_sql = f'({match_sql} OR {column} %% %s)'
+            rank_sql = f'GREATEST({rank_sql}, similarity({column}, %s))'
+            match_params.append(terms)
+            rank_params.append(terms)
+        return queryset.annotate(
+            search_match=RawSQL(match_sql, match_params, output_field=BooleanField()),
+            search_rank=RawSQL(rank_sql, rank_params, output_field=FloatField()),
+        ).filter(search_match=True).order_by('-search_rank', '-pk')
+
+    def _search_sqlite(self, queryset, terms):
+        words = WORD_RE.findall(terms)
+        if not words:
+            return queryset
+        match = ' '.join(f'"{word}"*' for word in words)  # Quoted prefixes: every word must match
+        weights = ', '.join(str(bm25) for _, _, bm25 in self.columns)
+        # bm25() is "lower is better", so negate it to rank like ts_rank
+        rank_sql = (
+            f'SELECT -bm25({self.fts_table}, {weights}) FROM {self.fts_table} '
+            f'WHERE {self.fts_table} MATCH %s AND rowid = {self.table}.id'
+        )
+        return queryset.annotate(
+            search_rank=RawSQL(rank_sql, [match], output_field=FloatField()),
+        ).filter(pk__in=RawSQL(f'SELECT rowid FROM {self.fts_table} WHERE {self.fts_table} MATCH %s', [match])) \
+            .order_by('-search_rank', '-pk')
+
+
+class RecipeSearchIndex(SearchIndex):
+    model = Recipe
+    columns = (
+        ('title', 'A', 10.0),
+        ('tags', 'B', 5.0),
+        ('ingredients', 'B', 5.0),
+        ('description', 'C', 2.0),
+        ('instructions', 'D', 1.0),
+    )
+    trigram_column = 'title'
+
+    def documents(self, ids):
+        tags, ingredients = defaultdict(list), defaultdict(list)
+        for recipe_id, name in Recipe.tags.through.objects.filter(recipe_id__in=ids).values_list('recipe_id', 'tag__name'):
+            tags[recipe_id].append(name)
+        for recipe_id, name in Recipe.ingredients_used.through.objects.filter(recipe_id__in=ids) \
+                .values_list('recipe_id', 'ingredientname__name'):
+            ingredients[recipe_id].append(name)
+        for pk, title, description, instructions in Recipe.objects.filter(pk__in=ids) \
+                .values_list('pk', 'title', 'description', 'instructions'):
+            yield pk, {
+                'title': title,
+                'tags': ' '.join(tags[pk]),
+                'ingredients': ' '.join(ingredients[pk]),
+                'description': description or '',
+                'instructions': instructions or '',
+            }
+
+
+class ProductSearchIndex(SearchIndex):
+    model = Product
+    columns = (
+        ('name', 'A', 10.0),
+        ('description', 'C', 2.0),
+    )
+    trigram_column = 'name'
+
+    def documents(self, ids):
+        for pk, name, description in Product.objects.filter(pk__in=ids).values_list('pk', 'name', 'description'):
+            yield pk, {'name': name, 'description': description or ''}
+
+
+recipe_index = RecipeSearchIndex()
+product_index = ProductSearchIndex()
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for SearchFilter that ranks matches through the view's `search_index`.
+    Falls back to SearchFilter's icontains lookups on databases without a full-text index.
+    """
+    def filter_queryset(self, request, queryset, view):
+        index = getattr(view, 'search_index', None)
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms or index is None or not index.is_supported():
+            return super().filter_queryset(request, queryset, view)
+        return index.search(queryset, terms)
@@ -0,0 +1,129 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import (
+    Category, CustomUser, Favorite, IngredientModel, IngredientName, Order, OrderItem, PostImage, Product,
+    ProductCategories, Recipe, Review, Tag,
+)
+from .caching import bump_version
+from .indexes import RECIPE_ROWS
+from .ratings import recompute_ratings
+from .recommendations import rebuild_neighbors
+from .search import product_index, recipe_index
+
+DEFAULT_SIZES = {
+    'users': 50,
+    'categories': 12,
+    'tags': 60,
+    'ingredients': 300,
+    'recipes': 1000,
+    'reviews': 3000,
+    'favorites': 3000,
+    'product_categories': 8,
+    'products': 200,
+    'orders': 1000,
+}
+
+
+def seed_dataset(seed=0, batch_size=2000, **sizes):
+    """
+    Fill the database with a deterministic synthetic catalog for benchmarks and query analysis.
+    Everything goes through bulk_create; rows get spread-out created_at values so time-ordered
+    indexes and keyset pages behave like real history. Returns the number of rows per model.
+    """
+    sizes = {name: max(1, int(size)) for name, size in {**DEFAULT_SIZES, **sizes}.items()}  # Rows pick parents from every list
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    def past():
+        return now - datetime.timedelta(minutes=rng.randrange(60 * 24 * 365))
+
+    password = make_password('seeded')  # One hash for everyone; hashing per user would dominate
+    prefix = f's{seed}'
+
+    with transaction.atomic():
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', password=password,
+                       role=rng.choice(['user', 'user', 'chef', 'admin']))
+            for i in range(sizes['users'])
+        ], batch_size=batch_size)
+        categories = Category.objects.bulk_create(
+            [Category(name=f'{prefix}-category-{i}') for i in range(sizes['categories'])], batch_size=batch_size)
+        tags = Tag.objects.bulk_create([Tag(name=f'{prefix}-tag-{i}') for i in range(sizes['tags'])], batch_size=batch_size)
+        names = IngredientName.objects.bulk_create(
+            [IngredientName(name=f'{prefix}-ingredient-{i}') for i in range(sizes['ingredients'])], batch_size=batch_size)
+        chefs = [user for user in users if user.role != 'user'] or users
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(title=f'Recipe {i}', description=f'Description of recipe {i}', instructions='Mix, cook and serve.',
+                   categories=rng.choice(categories), author=rng.choice(chefs), is_published=rng.random() < 0.8,
+                   slug=f'{prefix}-recipe-{i}')
+            for i in range(sizes['recipes'])
+        ], batch_size=batch_size)
+        tag_rows, ingredient_rows, ingredient_models, images = [], [], [], []
+        for recipe in recipes:
+            for tag in rng.sample(tags, min(len(tags), rng.randint(1, 4))):
+                tag_rows.append(Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag.pk))
+            used = rng.sample(names, min(len(names), rng.randint(3, 10)))
+            for order, name in enumerate(used, start=1):
+                ingredient_rows.append(Recipe.ingredients_used.through(recipe_id=recipe.pk, ingredientname_id=name.pk))
+                ingredient_models.append(IngredientModel(
+                    recipe_id=recipe.pk, name_id=name.pk, quantity=str(rng.randint(1, 500)), unit='g', order=order,
+                    alternative_ingredient=rng.choice(names) if rng.random() < 0.1 else None, author_id=recipe.author_id,
+                ))
+            images.append(PostImage(recipe_id=recipe.pk, image=f'post_images/seed-{recipe.pk}.png'))
+        Recipe.tags.through.objects.bulk_create(tag_rows, batch_size=batch_size)
+        Recipe.ingredients_used.through.objects.bulk_create(ingredient_rows, batch_size=batch_size)
+        IngredientModel.objects.bulk_create(ingredient_models, batch_size=batch_size)
+        PostImage.objects.bulk_create(images, batch_size=batch_size)
+
+        reviews = Review.objects.bulk_create([
+            Review(user=rng.choice(users), recipe=rng.choice(recipes), rating=rng.randint(1, 5), comment='Seeded review')
+            for _ in range(sizes['reviews'] if recipes else 0)
+        ], batch_size=batch_size)
+        pairs = {(rng.choice(users).pk, rng.choice(recipes).pk) for _ in range(sizes['favorites'] if recipes else 0)}
+        favorites = Favorite.objects.bulk_create([Favorite(user_id=user, recipe_id=recipe) for user, recipe in pairs],
+                                                 batch_size=batch_size)
+
+        product_categories = ProductCategories.objects.bulk_create(
+            [ProductCategories(name=f'{prefix}-product-category-{i}') for i in range(sizes['product_categories'])],
+            batch_size=batch_size)
+        products = Product.objects.bulk_create([
+            Product(name=f'Product {i}', description=f'Description of product {i}', price=rng.randint(100, 10000) / 100,
+                    stock=rng.randint(0, 500), category=rng.choice(product_categories))
+            for i in range(sizes['products'])
+        ], batch_size=batch_size)
+        orders = Order.objects.bulk_create([
+            Order(user=rng.choice(users), status=rng.choice(['pending', 'completed']))
+            for _ in range(sizes['orders'])
+        ], batch_size=batch_size)
+        items = OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=rng.randint(1, 3), price=product.price)
+            for order in orders for product in rng.sample(products, min(len(products), rng.randint(1, 4)))
+        ], batch_size=batch_size)
+
+        # auto_now_add ignores explicit values on insert, so spread the timestamps afterwards
+        for model, rows, field in ((Recipe, recipes, 'created_at'), (Review, reviews, 'created_at'),
+                                   (Favorite, favorites, 'added_at'), (Product, products, 'created_at'),
+                                   (Order, orders, 'created_at')):
+            for row in rows:
+                setattr(row, field, past())
+            model.objects.bulk_update(rows, [field], batch_size=batch_size)
+
+    # bulk_create sends no signals: bring the derived data up to date by hand
+    for index, rows in ((recipe_index, recipes), (product_index, products)):
+        for start in range(0, len(rows), batch_size):
+            index.index(row.pk for row in rows[start:start + batch_size])
+    recompute_ratings(batch_size=batch_size)
+    rebuild_neighbors(batch_size=batch_size)
+    # RECIPE_ROWS without ids: every in-memory recipe index rebuilds
+    for model in (Recipe, RECIPE_ROWS, Tag, Category, IngredientName, IngredientModel, PostImage, Product, ProductCategories):
+        bump_version(model)
+    return {
+        'users': len(users), 'recipes': len(recipes), 'reviews': len(reviews), 'favorites': len(favorites),
+        'products': len(products), 'orders': len(orders), 'order_items': len(items),
+    }
@@ -1,13 +1,30 @@
+from django.db import models
 from rest_framework import serializers
+from .images import VariantImageField
+from .querysets import requested_fields
+from .similarity import find_duplicates
 from app.models import CustomUser,Recipe,IngredientName,IngredientModel,PostImage,Category,Tag,Favorite,Review, RoleRequest, Order, OrderItem, Product, ProductCategories
 
 
+class SparseFieldsetMixin:
+    """Drops the top-level fields left out by ?fields=/?exclude= (see api.querysets.requested_fields)."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        readable = [name for name, field in self.fields.items() if not field.write_only]
+        kept = requested_fields(self.context.get('request'), readable)
+        if kept is not None:
+            for name in set(readable) - kept:
+                self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'email', 'username', 'bio']
 
 class PostImageSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: VariantImageField}
+
     class Meta:
         model = PostImage
         fields = ['id', 'image']
@@ -29,7 +46,7 @@ class IngredientNameSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     # ingredients_used = serializers.PrimaryKeyRelatedField(queryset=IngredientName.objects.all(), many=True)
     # categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
     # tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
@@ -42,13 +59,15 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'description', 'instructions', 'ingredients_used', 'categories', 'tags', 'post_images', 'created_at', 'updated_at', 'author', 'is_published', 'uploaded_images']
-        read_only_fields = ['created_at', 'updated_at', 'is_published']
+        fields = ['id', 'title', 'description', 'instructions', 'ingredients_used', 'categories', 'tags', 'post_images', 'created_at', 'updated_at', 'author', 'is_published', 'rating', 'rating_count', 'rating_histogram', 'uploaded_images']
+        read_only_fields = ['created_at', 'updated_at', 'is_published', 'rating', 'rating_count', 'rating_histogram']
 
     def create(self, validated_data):
         uploaded_images = validated_data.pop('uploaded_images', [])  # Correct field name
         tags = validated_data.pop('tags', [])
         ingredients_used = validated_data.pop('ingredients_used', [])
+        # Checked before saving so the new recipe can't match itself; reported, never blocking
+        self.possible_duplicates = find_duplicates(validated_data.get('instructions'), tags, ingredients_used)
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         recipe.ingredients_used.set(ingredients_used)# ✅ Correct way to assign ManyToManyField
@@ -66,6 +85,18 @@ class IngredientModelSerializer(serializers.ModelSerializer):
 
 
 
+class IngredientListItemSerializer(serializers.Serializer):
+    """One line of a recipe's full ingredient list; ingredient ids are checked in one query for the whole list."""
+    name = serializers.IntegerField(min_value=1)
+    quantity = serializers.CharField(max_length=50, required=False, allow_null=True, allow_blank=True)
+    unit = serializers.CharField(max_length=50, required=False, allow_null=True, allow_blank=True)
+    order = serializers.IntegerField(min_value=0, required=False, allow_null=True)  # Defaults to the list position
+    alternative_ingredient = serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    alternative_ingredient_quantity = serializers.CharField(max_length=50, required=False, allow_null=True, allow_blank=True)
+    alternative_ingredient_unit = serializers.CharField(max_length=50, required=False, allow_null=True, allow_blank=True)
+
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
@@ -92,14 +123,23 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'product', 'quantity', 'order', 'price']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     order_items = OrderItemSerializer(many=True, read_only=True)
     class Meta:
         model = Order
         fields = ['id', 'user', 'created_at', 'updated_at','order_items']
         read_only_fields = ['created_at', 'updated_at']
 
-class ProductSerializer(serializers.ModelSerializer):
+class CheckoutItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)  # Existence is checked in one query at checkout time
+    quantity = serializers.IntegerField(min_value=1)
+
+class CheckoutSerializer(serializers.Serializer):
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: VariantImageField}
+
     class Meta:
         model = Product
         fields = ['id', 'name', 'price', 'description', 'image', 'price', 'stock','created_at', 'category']
@@ -0,0 +1,216 @@
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from app.models import Category, CustomUser, Favorite, IngredientModel, IngredientName, PostImage, Product, ProductCategories, Recipe, Review, Tag
+from .authentication import forget_token_version
+from .caching import bump_version
+from .conditional import touch_recipes
+from .images import needs_variants, schedule_variants
+from .indexes import RECIPE_ALTERNATIVES, RECIPE_CATEGORY, RECIPE_INGREDIENTS, RECIPE_INSTRUCTIONS, RECIPE_ROWS, RECIPE_TAGS
+from .recommendations import schedule_refresh
+from .search import product_index, recipe_index
+from .typeahead import typeahead_index
+
+# Receivers run in definition order: version bumps come first, so the in-memory indexes
+# patched further down can mark themselves in sync with the bumped counters.
+VERSIONED_MODELS = (Recipe, Tag, Category, IngredientName, IngredientModel, PostImage, Product, ProductCategories)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs):
+    """Any write to a cached model invalidates the responses built from it."""
+    if sender in VERSIONED_MODELS:
+        bump_version(sender)
+
+
+def changed_recipe_ids(instance, action, reverse, pk_set):
+    """The recipes whose tags or ingredients_used a post_* m2m_changed action touched."""
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return instance.__dict__.get('_cleared_recipe_ids', [])
+    return list(pk_set)  # tag.recipes.add(...) and friends: pk_set holds recipe ids
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients_used.through)
+def bump_recipe_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':  # tag.recipes.clear() doesn't say which recipes it touched
+        instance._cleared_recipe_ids = list(instance.recipes.values_list('pk', flat=True))
+    elif action.startswith('post_'):
+        bump_version(Recipe)
+        bump_version(RECIPE_TAGS if sender is Recipe.tags.through else RECIPE_INGREDIENTS,
+                     changed_recipe_ids(instance, action, reverse, pk_set))
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_fields(sender, instance, **kwargs):
+    """Snapshot the indexed columns, so post_save bumps only the versions of those that changed."""
+    if instance.pk is not None:
+        instance._previous_fields = Recipe.objects.filter(pk=instance.pk).values('instructions', 'categories_id').first()
+
+
+@receiver(post_save, sender=Recipe)
+def bump_recipe_fields(sender, instance, created, **kwargs):
+    previous = instance.__dict__.get('_previous_fields')
+    if created or previous is None:
+        bump_version(RECIPE_ROWS, [instance.pk])
+        return
+    for field, version in (('instructions', RECIPE_INSTRUCTIONS), ('categories_id', RECIPE_CATEGORY)):
+        if previous[field] != getattr(instance, field):
+            bump_version(version, [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_recipe_rows(sender, instance, **kwargs):
+    bump_version(RECIPE_ROWS, [instance.pk])
+
+
+@receiver(post_save, sender=IngredientModel)
+@receiver(post_delete, sender=IngredientModel)
+def bump_recipe_alternatives(sender, instance, **kwargs):
+    bump_version(RECIPE_ALTERNATIVES, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=IngredientName)
+def remember_linked_recipes(sender, instance, **kwargs):
+    instance._linked_recipe_ids = list(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=IngredientName)
+def bump_unlinked_recipes(sender, instance, **kwargs):
+    """The cascade dropped the name's M2M rows without m2m_changed."""
+    bump_version(RECIPE_TAGS if sender is Tag else RECIPE_INGREDIENTS, instance.__dict__.get('_linked_recipe_ids'))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, created, **kwargs):
+    recipe_index.index([instance.pk])
+    previous_category_id = (instance.__dict__.pop('_previous_fields', None) or {}).get('categories_id')
+    if typeahead_index.is_built and (created or previous_category_id != instance.categories_id):
+        typeahead_index.refresh_usage(Category, {previous_category_id, instance.categories_id})
+    typeahead_index.synced()
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    recipe_index.remove([instance.pk])
+    typeahead_index.reset()  # The cascade dropped its tag and ingredient links without m2m_changed
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients_used.through)
+def reindex_recipe_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    recipe_ids = changed_recipe_ids(instance, action, reverse, pk_set)
+
+    touch_recipes(recipe_ids)  # Conditional GET validators of the recipe detail
+    recipe_index.index(recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients_used.through)
+def recount_typeahead_usage(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_') or not typeahead_index.is_built:
+        return
+    if reverse:  # tag.recipes.add(...) and friends
+        typeahead_index.refresh_usage(type(instance), [instance.pk])
+    elif action == 'post_clear':
+        typeahead_index.reset()  # recipe.tags.clear() doesn't say which tags lost a recipe
+        return
+    else:
+        typeahead_index.refresh_usage(model, pk_set)
+    typeahead_index.synced()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=IngredientName)
+def index_typeahead_name(sender, instance, **kwargs):
+    if typeahead_index.is_built:
+        typeahead_index.put(sender, instance.pk, instance.name)
+    typeahead_index.synced()
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=IngredientName)
+def unindex_typeahead_name(sender, instance, **kwargs):
+    if typeahead_index.is_built:
+        typeahead_index.remove(sender, instance.pk)
+    typeahead_index.synced()
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+def touch_imaged_recipe(sender, instance, **kwargs):
+    if instance.recipe_id:
+        touch_recipes([instance.recipe_id])
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=IngredientName)
+def reindex_renamed_name(sender, instance, created, **kwargs):
+    """Tag and ingredient names are part of the recipe document."""
+    if not created:
+        recipe_index.index(instance.recipes.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    product_index.index([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    product_index.remove([instance.pk])
+
+
+@receiver(post_save, sender=PostImage)
+@receiver(post_save, sender=Product)
+def generate_image_variants(sender, instance, **kwargs):
+    if needs_variants(instance):
+        schedule_variants(instance)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def refresh_recipe_neighbors(sender, instance, **kwargs):
+    schedule_refresh(instance.recipe_id)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def reweight_recipe_neighbors(sender, instance, **kwargs):
+    """A review changes the weight of the reviewer's favorite of that recipe, if there is one."""
+    if settings.RECOMMENDATION_RATING_WEIGHT and Favorite.objects.filter(user_id=instance.user_id, recipe_id=instance.recipe_id).exists():
+        schedule_refresh(instance.recipe_id)
+
+
+@receiver(pre_save, sender=CustomUser)
+def detect_claim_change(sender, instance, update_fields=None, **kwargs):
+    """
+    Role or activation changes (e.g. RoleRequestViewSet.approve) make issued token claims stale:
+    bump token_version on the instance so the same UPDATE writes it and later saves keep it.
+    """
+    if instance.pk is None or (update_fields is not None and not {'role', 'is_active'} & set(update_fields)):
+        return  # New user, or a partial save such as last_login
+    previous = CustomUser.objects.filter(pk=instance.pk).values('role', 'is_active', 'token_version').first()
+    if previous is not None and (previous['role'], previous['is_active']) != (instance.role, instance.is_active):
+        instance.token_version = previous['token_version'] + 1
+        instance._claims_changed = True
+
+
+@receiver(post_save, sender=CustomUser)
+def revoke_stale_tokens(sender, instance, update_fields=None, **kwargs):
+    if not instance.__dict__.pop('_claims_changed', False):
+        return
+    if update_fields is not None and 'token_version' not in update_fields:
+        # save(update_fields=['role']) left the bumped version out of its UPDATE
+        CustomUser.objects.filter(pk=instance.pk).update(token_version=instance.token_version)
+    forget_token_version(instance.pk)
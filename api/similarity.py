@@ -0,0 +1,140 @@
+import hashlib
+import random
+from collections import defaultdict
+
+from django.conf import settings
+
+from app.models import Recipe
+from .indexes import RECIPE_INGREDIENTS, RECIPE_INSTRUCTIONS, RECIPE_ROWS, RECIPE_TAGS, InMemoryIndex
+from .search import WORD_RE
+
+PRIME = (1 << 61) - 1  # Mersenne prime for the (a * x + b) mod p hash family
+
+
+def recipe_features(instructions, tag_ids, ingredient_ids):
+    """The shingle set a recipe is compared on: its tags, ingredients_used and instruction words."""
+    features = {f'w:{word}' for word in WORD_RE.findall((instructions or '').lower())}
+    features.update(f't:{tag_id}' for tag_id in tag_ids)
+    features.update(f'i:{ingredient_id}' for ingredient_id in ingredient_ids)
+    return features
+
+
+def load_features(recipe_ids=None):
+    """{recipe id: feature set} for the given recipes (all of them when None), in three queries."""
+    recipes = Recipe.objects.all() if recipe_ids is None else Recipe.objects.filter(pk__in=recipe_ids)
+    parts = {recipe_id: (instructions, [], []) for recipe_id, instructions in recipes.values_list('pk', 'instructions').iterator(chunk_size=10000)}
+    for through, column, slot in ((Recipe.tags.through, 'tag_id', 1), (Recipe.ingredients_used.through, 'ingredientname_id', 2)):
+        rows = through.objects.all() if recipe_ids is None else through.objects.filter(recipe_id__in=recipe_ids)
+        for recipe_id, value in rows.values_list('recipe_id', column).iterator(chunk_size=10000):
+            if recipe_id in parts:
+                parts[recipe_id][slot].append(value)
+    return {recipe_id: recipe_features(*values) for recipe_id, values in parts.items()}
+
+
+class MinHasher:
+    """`permutations` independent (a * x + b) mod p hashes over stable 64-bit feature hashes."""
+
+    def __init__(self, permutations, seed=0):
+        rng = random.Random(seed)  # Fixed, so signatures agree across processes
+        self.params = [(rng.randrange(1, PRIME), rng.randrange(PRIME)) for _ in range(permutations)]
+
+    def signature(self, features):
+        hashes = [int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'big') for feature in features]
+        if not hashes:
+            return None
+        return tuple(min((a * value + b) % PRIME for value in hashes) for a, b in self.params)
+
+
+class SimilarityIndex(InMemoryIndex):
+    """
+    MinHash signatures of every recipe, split into SIMILARITY_MINHASH_BANDS bands of
+    SIMILARITY_MINHASH_ROWS values each. Recipes sharing any band bucket are candidates, and
+    only candidates are scored, so a query never compares against the whole catalog. The share
+    of equal signature values estimates the Jaccard similarity of the two feature sets.
+
+    signatures: recipe id -> signature tuple
+    buckets:    one {band values: {recipe ids}} dict per band
+    """
+    source_models = (RECIPE_ROWS, RECIPE_INSTRUCTIONS, RECIPE_TAGS, RECIPE_INGREDIENTS)  # What recipe_features() reads
+
+    def __init__(self):
+        super().__init__()
+        self.hasher = None
+        self.signatures = {}
+        self.buckets = []
+
+    def build(self):
+        bands, rows = settings.SIMILARITY_MINHASH_BANDS, settings.SIMILARITY_MINHASH_ROWS
+        self.hasher = MinHasher(bands * rows)
+        self.signatures, self.buckets = {}, [defaultdict(set) for _ in range(bands)]
+        for recipe_id, features in load_features().items():
+            self._add(recipe_id, self.hasher.signature(features))
+
+    def _bands(self, signature):
+        rows = settings.SIMILARITY_MINHASH_ROWS
+        return [signature[start:start + rows] for start in range(0, len(signature), rows)]
+
+    def _add(self, recipe_id, signature):
+        if signature is None:
+            return
+        self.signatures[recipe_id] = signature
+        for bucket, key in zip(self.buckets, self._bands(signature)):
+            bucket[key].add(recipe_id)
+
+    def _remove(self, recipe_id):
+        signature = self.signatures.pop(recipe_id, None)
+        if signature is not None:
+            for bucket, key in zip(self.buckets, self._bands(signature)):
+                bucket[key].discard(recipe_id)
+                if not bucket[key]:
+                    del bucket[key]
+
+    # Incremental maintenance (from the change log, see InMemoryIndex)
+
+    def patch(self, recipe_ids):
+        features = load_features(recipe_ids)
+        with self.lock:
+            for recipe_id in recipe_ids:
+                self._remove(recipe_id)
+                if recipe_id in features:  # Deleted recipes just drop out
+                    self._add(recipe_id, self.hasher.signature(features[recipe_id]))
+        return True
+
+    # Querying
+
+    def signature(self, features):
+        return self.hasher.signature(features)
+
+    def similar(self, signature, limit=10, threshold=0.0, exclude=()):
+        """[(recipe id, estimated Jaccard similarity)] of the bucket candidates, best first."""
+        if signature is None:
+            return []
+        with self.lock:
+            candidates = set()
+            for bucket, key in zip(self.buckets, self._bands(signature)):
+                candidates.update(bucket.get(key, ()))
+            candidates.difference_update(exclude)
+            size = len(signature)
+            scored = []
+            for recipe_id in candidates:
+                other = self.signatures[recipe_id]
+                score = sum(1 for mine, theirs in zip(signature, other) if mine == theirs) / size
+                if score >= threshold:
+                    scored.append((recipe_id, score))
+        scored.sort(key=lambda row: (-row[1], row[0]))
+        return scored[:limit]
+
+    def similar_to(self, recipe_id, limit=10, threshold=0.0):
+        with self.lock:
+            signature = self.signatures.get(recipe_id)
+        return self.similar(signature, limit, threshold, exclude={recipe_id})
+
+
+similarity_index = SimilarityIndex()
+
+
+def find_duplicates(instructions, tags, ingredients_used, limit=5):
+    """[(recipe id, similarity)] of existing recipes at or above SIMILARITY_DUPLICATE_THRESHOLD for an unsaved one."""
+    similarity_index.ensure_fresh()
+    features = recipe_features(instructions, [tag.pk for tag in tags], [name.pk for name in ingredients_used])
+    return similarity_index.similar(similarity_index.signature(features), limit, settings.SIMILARITY_DUPLICATE_THRESHOLD)
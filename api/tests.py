@@ -3,6 +3,20 @@ import pytest
 from rest_framework.test import APIClient
 from django.urls import reverse
 from app.models import Order, CustomUser, Product,OrderItem
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from api.pantry import pantry_index
+    from api.postings import tag_postings_index
+    from api.similarity import similarity_index
+    from api.typeahead import typeahead_index
+    cache.clear()
+    pantry_index.reset()  # Per-process indexes must not outlive the test's rolled-back rows
+    similarity_index.reset()
+    typeahead_index.reset()
+    tag_postings_index.reset()
 
 @pytest.mark.django_db
 def test_create_order():
@@ -51,4 +65,1389 @@ def test_create_order_item():
     assert response.status_code == 201
     assert OrderItem.objects.count() == 1
     assert OrderItem.objects.get().order == order
-    assert OrderItem.objects.get().product == product
\ No newline at end of file
+    assert OrderItem.objects.get().product == product
+
+
+def _seed_recipes(author, count, tags_per_recipe=3, ingredients_per_recipe=4):
+    from app.models import Category, Tag, IngredientName, Recipe, PostImage
+    category = Category.objects.create(name=f'Category for {author.username}')
+    tags = Tag.objects.bulk_create([Tag(name=f'{author.username}-tag-{i}') for i in range(10)])
+    names = IngredientName.objects.bulk_create([IngredientName(name=f'{author.username}-ing-{i}') for i in range(20)])
+    recipes = Recipe.objects.bulk_create([
+        Recipe(title=f'Recipe {i}', author=author, categories=category) for i in range(count)
+    ])
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[(i + j) % len(tags)].id)
+        for i, recipe in enumerate(recipes) for j in range(tags_per_recipe)
+    ])
+    Recipe.ingredients_used.through.objects.bulk_create([
+        Recipe.ingredients_used.through(recipe_id=recipe.id, ingredientname_id=names[(i + j) % len(names)].id)
+        for i, recipe in enumerate(recipes) for j in range(ingredients_per_recipe)
+    ])
+    PostImage.objects.bulk_create([PostImage(recipe=recipe, image=f'post_images/{recipe.id}.png') for recipe in recipes])
+    return recipes, tags
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [10, 300])
+def test_recipe_list_query_count_is_constant(count, django_assert_num_queries):
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    _seed_recipes(author, count)
+    client = APIClient()
+    # count + recipes (author/category joined) + tags + ingredients + images
+    with django_assert_num_queries(5):
+        response = client.get(reverse('recipes-list'), {'page_size': 6})
+    assert response.status_code == 200
+    assert len(response.data['results']) == 6
+
+
+@pytest.mark.django_db
+def test_recipe_retrieve_query_count(django_assert_num_queries):
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 5)
+    client = APIClient()
+    # recipe (author/category joined) + tags + ingredients + images
+    with django_assert_num_queries(4):
+        response = client.get(reverse('recipes-detail', args=[recipes[0].id]))
+    assert response.status_code == 200
+    assert len(response.data['tags']) == 3
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [10, 300])
+def test_my_recipes_query_count_is_constant(count, django_assert_num_queries):
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    _seed_recipes(author, count)
+    client = APIClient()
+    client.force_authenticate(user=author)
+    with django_assert_num_queries(4):
+        response = client.get(reverse('recipes-my-recipes'))
+    assert response.status_code == 200
+    assert len(response.data) == count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [10, 300])
+def test_recipes_by_tag_query_count_is_constant(count, django_assert_num_queries):
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    _, tags = _seed_recipes(author, count)
+    client = APIClient()
+    # count + recipes + tags + ingredients + images
+    with django_assert_num_queries(5):
+        response = client.get(reverse('recipes-by-tags'), {'tags': [tags[0].id, tags[1].id]})
+    assert response.status_code == 200
+    assert response.data['count'] > 0
+
+
+
+@pytest.mark.django_db
+def test_tag_list_is_cached_until_a_tag_changes():
+    from app.models import Tag
+    from api.caching import cache_stats
+    Tag.objects.create(name='vegan')
+    client = APIClient()
+    url = reverse('Tags-list')
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first['X-Cache'] == 'MISS'
+    assert second['X-Cache'] == 'HIT'
+    assert second.data == first.data
+    assert cache_stats() == {'hits': 1, 'misses': 1}
+
+    Tag.objects.create(name='spicy')
+    third = client.get(url)
+    assert third['X-Cache'] == 'MISS'
+    assert third.data['count'] == 2
+
+
+@pytest.mark.django_db
+def test_recipe_list_cache_keys_on_query_string_and_m2m_changes():
+    from app.models import Tag
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, tags = _seed_recipes(author, 10)
+    client = APIClient()
+    url = reverse('recipes-list')
+
+    assert client.get(url, {'page': 1})['X-Cache'] == 'MISS'
+    assert client.get(url, {'page': 2})['X-Cache'] == 'MISS'
+    assert client.get(url, {'page': 1})['X-Cache'] == 'HIT'
+
+    new_tag = Tag.objects.create(name='new-tag')
+    assert client.get(url, {'page': 1})['X-Cache'] == 'MISS'
+    assert client.get(url, {'page': 1})['X-Cache'] == 'HIT'
+    recipes[0].tags.add(new_tag)
+    assert client.get(url, {'page': 1})['X-Cache'] == 'MISS'
+
+
+@pytest.mark.django_db
+def test_response_cache_works_with_file_based_backend(tmp_path):
+    from django.core.cache import caches
+    from django.test import override_settings
+    from app.models import Category
+    backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)}}
+    with override_settings(CACHES=backend):
+        caches['default'].clear()
+        Category.objects.create(name='Dessert')
+        client = APIClient()
+        url = reverse('categories-list')
+        assert client.get(url)['X-Cache'] == 'MISS'
+        assert client.get(url)['X-Cache'] == 'HIT'
+        Category.objects.create(name='Soup')
+        response = client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert response.data['count'] == 2
+
+
+@pytest.mark.django_db
+def test_recipe_search_is_ranked_and_covers_tags_and_ingredients():
+    from app.models import Recipe, Tag, IngredientName
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    in_description = Recipe.objects.create(title='Weeknight supper', description='A quick tomato stew', author=author)
+    in_title = Recipe.objects.create(title='Tomato soup', description='Warming', author=author)
+    tagged = Recipe.objects.create(title='Green curry', author=author)
+    tagged.tags.add(Tag.objects.create(name='thai'))
+    with_basil = Recipe.objects.create(title='Pesto', author=author)
+    with_basil.ingredients_used.add(IngredientName.objects.create(name='basil'))
+    client = APIClient()
+    url = reverse('recipes-list')
+
+    ids = [row['id'] for row in client.get(url, {'search': 'tomato'}).data['results']]
+    assert ids == [in_title.id, in_description.id]
+    assert [row['id'] for row in client.get(url, {'search': 'thai'}).data['results']] == [tagged.id]
+    assert [row['id'] for row in client.get(url, {'search': 'bas'}).data['results']] == [with_basil.id]
+
+
+@pytest.mark.django_db
+def test_recipe_search_follows_tag_renames():
+    from app.models import Recipe, Tag
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipe = Recipe.objects.create(title='Noodles', author=author)
+    tag = Tag.objects.create(name='quick')
+    tag.recipes.add(recipe)
+    client = APIClient()
+    url = reverse('recipes-list')
+    assert client.get(url, {'search': 'quick'}).data['count'] == 1
+
+    tag.name = 'slow'
+    tag.save()
+    assert client.get(url, {'search': 'quick'}).data['count'] == 0
+    assert client.get(url, {'search': 'slow'}).data['count'] == 1
+
+
+@pytest.mark.django_db
+def test_product_search_ranks_name_matches_first():
+    from app.models import ProductCategories
+    category = ProductCategories.objects.create(name='Kitchen')
+    described = Product.objects.create(name='Pan', description='Great with a wok lid', price='10.00', category=category)
+    named = Product.objects.create(name='Carbon steel wok', price='30.00', category=category)
+    response = APIClient().get(reverse('product-list'), {'search': 'wok'})
+    assert [row['id'] for row in response.data['results']] == [named.id, described.id]
+
+
+@pytest.mark.django_db
+def test_recipe_cursor_pagination_walks_forward_and_back():
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 8)
+    expected = [recipe.id for recipe in sorted(recipes, key=lambda r: (r.created_at, r.id), reverse=True)]
+    client = APIClient()
+
+    first = client.get(reverse('recipes-list'), {'pagination': 'cursor', 'page_size': 3})
+    assert 'count' not in first.data
+    assert first.data['previous'] is None
+    second = client.get(first.data['next'])
+    third = client.get(second.data['next'])
+    seen = [row['id'] for page in (first, second, third) for row in page.data['results']]
+    assert seen == expected
+    assert third.data['next'] is None
+
+    back = client.get(third.data['previous'])
+    assert [row['id'] for row in back.data['results']] == expected[3:6]
+
+
+@pytest.mark.django_db
+def test_cursor_pages_are_stable_under_concurrent_inserts():
+    from app.models import Recipe
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 6)
+    client = APIClient()
+    first = client.get(reverse('recipes-list'), {'pagination': 'cursor', 'page_size': 3})
+    Recipe.objects.create(title='Brand new', author=author)  # Would shift an OFFSET-based page 2
+    second = client.get(first.data['next'])
+    ids = [row['id'] for row in first.data['results'] + second.data['results']]
+    assert sorted(ids) == sorted(recipe.id for recipe in recipes)
+
+
+@pytest.mark.django_db
+def test_order_items_cursor_mode_with_estimated_count():
+    from app.models import ProductCategories
+    user = CustomUser.objects.create_user(username='buyer', email='buyer@example.com', password='testpass')
+    category = ProductCategories.objects.create(name='Kitchen')
+    product = Product.objects.create(name='Pan', price='10.00', category=category)
+    order = Order.objects.create(user=user)
+    items = OrderItem.objects.bulk_create([OrderItem(order=order, product=product, price='10.00') for _ in range(5)])
+    client = APIClient()
+
+    response = client.get(reverse('orderitem-list'), {'pagination': 'cursor', 'limit': 2, 'count': 'estimate'})
+    assert response['X-Estimated-Count'] == '5'
+    assert [row['id'] for row in response.data['results']] == [items[4].id, items[3].id]
+    assert client.get(reverse('orderitem-list'), {'cursor': 'not-a-cursor'}).status_code == 404
+    # Page-number and limit/offset clients are unaffected
+    assert client.get(reverse('orderitem-list'), {'limit': 2}).data['count'] == 5
+
+
+@pytest.mark.django_db
+def test_reviews_maintain_recipe_rating_aggregates():
+    from app.models import Recipe
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipe = Recipe.objects.create(title='Stew', author=author)
+    client = APIClient()
+    client.force_authenticate(user=author)
+    url = reverse('recipe_reviews-list', kwargs={'recipe_pk': recipe.id})
+
+    first = client.post(url, {'user': author.id, 'recipe': recipe.id, 'rating': 5, 'comment': 'Great'}, format='json')
+    client.post(url, {'user': author.id, 'recipe': recipe.id, 'rating': 3, 'comment': 'Ok'}, format='json')
+    recipe.refresh_from_db()
+    assert (recipe.rating, recipe.rating_count, recipe.rating_histogram) == (4, 2, {'5': 1, '3': 1})
+
+    detail = reverse('recipe_reviews-detail', kwargs={'recipe_pk': recipe.id, 'pk': first.data['id']})
+    client.patch(detail, {'rating': 1}, format='json')
+    recipe.refresh_from_db()
+    assert (recipe.rating, recipe.rating_count, recipe.rating_histogram) == (2, 2, {'1': 1, '3': 1})
+
+    client.delete(detail)
+    recipe.refresh_from_db()
+    assert (recipe.rating, recipe.rating_count, recipe.rating_histogram) == (3, 1, {'3': 1})
+
+
+@pytest.mark.django_db
+def test_reviews_refresh_cached_lists_without_rebuilding_indexes():
+    from app.models import Recipe
+    from api.pantry import pantry_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipe = Recipe.objects.create(title='Stew', author=author)
+    client = APIClient()
+    client.force_authenticate(user=author)
+    assert client.get(reverse('recipes-list')).data['results'][0]['rating'] == 0
+    pantry_index.ensure_fresh()
+    built_at = pantry_index.built_at
+
+    client.post(reverse('recipe_reviews-list', kwargs={'recipe_pk': recipe.id}),
+                {'user': author.id, 'recipe': recipe.id, 'rating': 5, 'comment': 'Great'}, format='json')
+    assert client.get(reverse('recipes-list')).data['results'][0]['rating'] == 5
+    pantry_index.ensure_fresh()
+    assert pantry_index.built_at == built_at
+
+
+@pytest.mark.django_db
+def test_recipes_sort_and_filter_by_rating():
+    from io import StringIO
+    from django.core.management import call_command
+    from app.models import Recipe, Review
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    low = Recipe.objects.create(title='Low', author=author)
+    high = Recipe.objects.create(title='High', author=author)
+    unrated = Recipe.objects.create(title='Unrated', author=author)
+    Review.objects.bulk_create([
+        Review(user=author, recipe=low, rating=2, comment=''),
+        Review(user=author, recipe=high, rating=5, comment=''),
+        Review(user=author, recipe=high, rating=4, comment=''),
+    ])
+    call_command('recompute_ratings', stdout=StringIO())
+    high.refresh_from_db()
+    assert (high.rating, high.rating_count) == (4.5, 2)
+
+    client = APIClient()
+    url = reverse('recipes-list')
+    ordered = client.get(url, {'ordering': '-rating'}).data['results']
+    assert [row['id'] for row in ordered] == [high.id, low.id, unrated.id]
+    filtered = client.get(url, {'min_rating': 3}).data['results']
+    assert [row['id'] for row in filtered] == [high.id]
+
+
+@pytest.mark.django_db
+def test_bulk_import_endpoint_reports_bad_lines_and_round_trips_through_export():
+    import json
+    from app.models import Recipe, IngredientModel, Tag
+    admin = CustomUser.objects.create_user(username='boss', email='boss@example.com', password='testpass', role='admin')
+    Tag.objects.create(name='vegan')
+    lines = [
+        {'title': 'Salad', 'author': 'boss', 'tags': ['vegan', 'quick'], 'categories': 'Starters',
+         'ingredients_used': ['lettuce'],
+         'ingredients': [{'name': 'tomato', 'quantity': '2', 'unit': 'pcs', 'order': 1, 'alternative_ingredient': 'pepper'}]},
+        'not json',
+        {'title': 'Ghost', 'author': 'nobody'},
+        {'title': 'Soup', 'author': 'boss', 'slug': 'soup', 'tags': ['quick']},
+        {'title': 'Soup again', 'author': 'boss', 'slug': 'soup'},
+    ]
+    body = '\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+    client = APIClient()
+    client.force_authenticate(user=admin)
+
+    response = client.post(reverse('recipes-bulk-import'), body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert response.data['created'] == 2
+    assert [error['line'] for error in response.data['errors']] == [2, 3, 5]
+
+    salad = Recipe.objects.get(title='Salad')
+    assert sorted(salad.tags.values_list('name', flat=True)) == ['quick', 'vegan']
+    assert sorted(salad.ingredients_used.values_list('name', flat=True)) == ['lettuce', 'tomato']
+    item = IngredientModel.objects.get(recipe=salad)
+    assert (item.name.name, item.alternative_ingredient.name, item.quantity) == ('tomato', 'pepper', '2')
+    assert Tag.objects.filter(name='vegan').count() == 1
+
+    export = client.get(reverse('recipes-bulk-export'))
+    exported = [json.loads(line) for line in b''.join(export.streaming_content).decode().splitlines()]
+    assert [record['title'] for record in exported] == ['Salad', 'Soup']
+    assert exported[0]['ingredients'][0]['alternative_ingredient'] == 'pepper'
+
+
+@pytest.mark.django_db
+def test_bulk_import_requires_admin():
+    chef = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass', role='chef')
+    client = APIClient()
+    client.force_authenticate(user=chef)
+    response = client.post(reverse('recipes-bulk-import'), '{"title": "x", "author": "chef"}', content_type='application/x-ndjson')
+    assert response.status_code == 403
+
+
+@pytest.mark.django_db
+def test_pantry_ranks_recipes_by_coverage_with_substitutes():
+    from app.models import Recipe, IngredientName, IngredientModel
+    from api.pantry import pantry_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    egg, flour, milk, butter, oil = [IngredientName.objects.create(name=name) for name in ('egg', 'flour', 'milk', 'butter', 'oil')]
+    pancakes = Recipe.objects.create(title='Pancakes', author=author)
+    pancakes.ingredients_used.set([egg, flour, milk, butter])
+    omelette = Recipe.objects.create(title='Omelette', author=author)
+    omelette.ingredients_used.set([egg, butter])
+    Recipe.objects.create(title='Toast', author=author).ingredients_used.set([butter])
+    IngredientModel.objects.create(recipe=omelette, name=butter, alternative_ingredient=oil)
+    client = APIClient()
+    url = reverse('recipes-pantry')
+
+    response = client.get(url, {'ingredients': f'{egg.id},{oil.id},{flour.id}'})
+    assert [(row['id'], row['coverage'], row['missing_ingredients']) for row in response.data] == [
+        (omelette.id, 1.0, 0),  # oil stands in for butter
+        (pancakes.id, 0.5, 2),
+    ]
+
+    # Incremental updates: the changed recipes are patched in, the index isn't rebuilt
+    built_at = pantry_index.built_at
+    pancakes.ingredients_used.remove(milk, butter)
+    response = client.get(url, {'ingredients': [egg.id, flour.id], 'limit': 1})
+    assert [(row['id'], row['coverage']) for row in response.data] == [(pancakes.id, 1.0)]
+    assert pantry_index.built_at == built_at
+
+
+@pytest.mark.django_db
+def test_pantry_counts_an_alternative_the_recipe_also_needs_once():
+    from app.models import Recipe, IngredientName, IngredientModel
+    from api.pantry import pantry_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    butter, oil = IngredientName.objects.create(name='butter'), IngredientName.objects.create(name='oil')
+    fry = Recipe.objects.create(title='Fry', author=author)
+    fry.ingredients_used.set([butter, oil])
+    IngredientModel.objects.create(recipe=fry, name=butter, alternative_ingredient=oil)
+    pantry_index.ensure_fresh()
+    assert pantry_index.match([oil.id]) == [(fry.id, 0.5, 1, 2)]  # The oil is needed as oil already
+
+
+@pytest.mark.django_db
+def test_pantry_index_catches_up_with_other_processes():
+    from app.models import Recipe, IngredientName
+    from api.caching import bump_version
+    from api.indexes import RECIPE_INGREDIENTS
+    from api.pantry import pantry_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    salt = IngredientName.objects.create(name='salt')
+    recipe = Recipe.objects.create(title='Brine', author=author)
+    pantry_index.ensure_fresh()
+    built_at = pantry_index.built_at
+    # A bulk write from elsewhere: through rows appear without signals, only the logged version moves
+    Recipe.ingredients_used.through.objects.create(recipe_id=recipe.id, ingredientname_id=salt.id)
+    assert pantry_index.match([salt.id]) == []
+    bump_version(RECIPE_INGREDIENTS, [recipe.id])
+    pantry_index.ensure_fresh()
+    assert pantry_index.match([salt.id]) == [(recipe.id, 1.0, 1, 1)]
+    assert pantry_index.built_at == built_at
+
+    Recipe.ingredients_used.through.objects.filter(recipe_id=recipe.id).delete()
+    bump_version(Recipe)  # Not watched by the index
+    pantry_index.ensure_fresh()
+    assert pantry_index.match([salt.id]) == [(recipe.id, 1.0, 1, 1)]
+    bump_version(RECIPE_INGREDIENTS)  # No ids logged: only a rebuild can catch up
+    pantry_index.ensure_fresh()
+    assert pantry_index.match([salt.id]) == [] and pantry_index.built_at != built_at
+
+
+@pytest.mark.django_db
+def test_uploaded_images_get_size_selectable_variants(tmp_path, settings):
+    from io import BytesIO
+    from PIL import Image
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from app.models import Recipe, PostImage
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_PROCESSING_SYNC = True
+    buffer = BytesIO()
+    Image.new('RGBA', (1600, 900), (200, 50, 50, 255)).save(buffer, format='PNG')
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipe = Recipe.objects.create(title='Screenshot soup', author=author)
+    image = PostImage.objects.create(recipe=recipe, image=SimpleUploadedFile('shot.png', buffer.getvalue(), content_type='image/png'))
+
+    image.refresh_from_db()
+    assert set(image.image_variants) == {'source', 'thumbnail', 'medium', 'webp'}
+    with Image.open(tmp_path / image.image_variants['thumbnail']) as thumbnail:
+        assert thumbnail.size == (200, 113)
+        assert thumbnail.format == 'JPEG'
+    with Image.open(tmp_path / image.image_variants['webp']) as webp:
+        assert webp.format == 'WEBP'
+
+    client = APIClient()
+    url = reverse('recipes-detail', args=[recipe.id])
+    original = client.get(url).data['post_images'][0]['image']
+    thumbnail = client.get(url, {'image_size': 'thumbnail'}).data['post_images'][0]['image']
+    assert original.endswith(image.image.name)
+    assert thumbnail.endswith(image.image_variants['thumbnail'])
+
+
+@pytest.mark.django_db
+def test_order_export_streams_csv_and_ndjson_with_filters():
+    import csv
+    import datetime
+    import json
+    from django.utils import timezone
+    from app.models import ProductCategories
+    admin = CustomUser.objects.create_user(username='finance', email='finance@example.com', password='testpass', role='admin')
+    category = ProductCategories.objects.create(name='Kitchen')
+    pan = Product.objects.create(name='Pan', price='10.00', category=category)
+    wok = Product.objects.create(name='Wok', price='25.50', category=category)
+    recent = Order.objects.create(user=admin, status='completed')
+    OrderItem.objects.create(order=recent, product=pan, quantity=2, price='10.00')
+    OrderItem.objects.create(order=recent, product=wok, quantity=1, price='25.50')
+    empty = Order.objects.create(user=admin)
+    old = Order.objects.create(user=admin, status='completed')
+    Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(days=30))
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    url = reverse('order-export')
+
+    response = client.get(url)
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+    assert [(row['order_id'], row['product_name']) for row in rows] == [
+        (str(recent.id), 'Pan'), (str(recent.id), 'Wok'), (str(empty.id), ''), (str(old.id), ''),
+    ]
+
+    since = (timezone.now() - datetime.timedelta(days=1)).date().isoformat()
+    response = client.get(url, {'export_format': 'ndjson', 'start': since, 'status': 'completed'})
+    orders = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    assert [order['order_id'] for order in orders] == [recent.id]
+    assert [(item['product_name'], item['quantity'], item['price']) for item in orders[0]['items']] == [
+        ('Pan', 2, '10.00'), ('Wok', 1, '25.50'),
+    ]
+    assert client.get(url, {'start': 'yesterday'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_order_export_date_bounds_cover_whole_days_and_reject_impossible_ones():
+    import json
+    from django.utils import timezone
+    admin = CustomUser.objects.create_user(username='finance', email='finance@example.com', password='testpass', role='admin')
+    order = Order.objects.create(user=admin)
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    today = timezone.localdate().isoformat()
+    response = client.get(reverse('order-export'), {'export_format': 'ndjson', 'end': today})  # A date bound covers its whole day
+    assert [json.loads(line)['order_id'] for line in b''.join(response.streaming_content).decode().splitlines()] == [order.id]
+    for bound in ({'start': '2024-02-30'}, {'start': '2024-01-01T25:00:00'}, {'end': '9999-12-31'}):
+        response = client.get(reverse('order-export'), bound)
+        assert response.status_code == 400
+        assert response.data == {'error': f'Invalid date: {next(iter(bound.values()))}'}
+
+
+@pytest.mark.django_db
+def test_checkout_creates_order_and_reports_short_lines():
+    from app.models import ProductCategories
+    user = CustomUser.objects.create_user(username='buyer', email='buyer@example.com', password='testpass')
+    category = ProductCategories.objects.create(name='Kitchen')
+    pan = Product.objects.create(name='Pan', price='10.00', stock=5, category=category)
+    wok = Product.objects.create(name='Wok', price='25.50', stock=1, category=category)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    url = reverse('order-checkout')
+
+    response = client.post(url, {'items': [{'product': pan.id, 'quantity': 2}, {'product': wok.id, 'quantity': 1},
+                                           {'product': pan.id, 'quantity': 1}]}, format='json')
+    assert response.status_code == 201
+    assert [(item['product'], item['quantity'], item['price']) for item in response.data['order_items']] == [
+        (pan.id, 2, '10.00'), (wok.id, 1, '25.50'), (pan.id, 1, '10.00'),  # One item per submitted line
+    ]
+    pan.refresh_from_db()
+    wok.refresh_from_db()
+    assert (pan.stock, wok.stock) == (2, 0)
+
+    response = client.post(url, {'items': [{'product': pan.id, 'quantity': 1}, {'product': wok.id, 'quantity': 1},
+                                           {'product': 999999, 'quantity': 1}]}, format='json')
+    assert response.status_code == 409
+    assert [(line['product'], line['error']) for line in response.data['lines']] == [
+        (wok.id, 'Insufficient stock.'), (999999, 'Product not found.'),
+    ]
+
+    response = client.post(url, {'items': [{'product': pan.id, 'quantity': 1}, {'product': wok.id, 'quantity': 1},
+                                           {'product': pan.id, 'quantity': 2}]}, format='json')
+    assert response.status_code == 409
+    assert [(line['line'], line['product'], line['requested'], line['requested_total']) for line in response.data['lines']] == [
+        (0, pan.id, 1, 3), (1, wok.id, 1, 1), (2, pan.id, 2, 3),
+    ]
+    pan.refresh_from_db()
+    assert pan.stock == 2  # The successful line was rolled back with the rest
+    assert Order.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_checkout_keeps_one_item_per_submitted_line():
+    from app.models import ProductCategories
+    from api.checkout import place_order
+    user = CustomUser.objects.create_user(username='buyer', email='buyer@example.com', password='testpass')
+    category = ProductCategories.objects.create(name='Kitchen')
+    pan = Product.objects.create(name='Pan', price='10.00', stock=4, category=category)
+    wok = Product.objects.create(name='Wok', price='25.50', stock=2, category=category)
+    lines = [{'product': pan.id, 'quantity': 1}, {'product': wok.id, 'quantity': 2}, {'product': pan.id, 'quantity': 3}]
+
+    order, items = place_order(user, lines)
+    expected = [(line['product'], line['quantity']) for line in lines]
+    assert [(item.product_id, item.quantity) for item in items] == expected  # items[i] is lines[i]
+    assert list(order.items.order_by('id').values_list('product_id', 'quantity')) == expected
+    pan.refresh_from_db()
+    assert pan.stock == 0  # Repeated lines still draw on the stock as one decrement
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_checkouts_never_oversell():
+    from concurrent.futures import ThreadPoolExecutor
+    from django.db import connection, OperationalError
+    from app.models import ProductCategories
+    from api.checkout import CheckoutError, place_order
+    buyers = CustomUser.objects.bulk_create([CustomUser(username=f'buyer{i}', email=f'buyer{i}@example.com') for i in range(20)])
+    category = ProductCategories.objects.create(name='Flash sale')
+    product = Product.objects.create(name='Limited pan', price='10.00', stock=7, category=category)
+
+    def attempt(buyer):
+        try:
+            place_order(buyer, [{'product': product.id, 'quantity': 1}])
+            return 'ok'
+        except CheckoutError:
+            return 'sold out'
+        except OperationalError:  # SQLite serialises writers; a locked database is a failed attempt, not an oversell
+            return 'locked'
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        outcomes = list(pool.map(attempt, buyers))
+
+    product.refresh_from_db()
+    sold = outcomes.count('ok')
+    assert 0 < sold <= 7
+    assert product.stock == 7 - sold
+    assert OrderItem.objects.filter(product=product).count() == sold
+    if connection.vendor == 'postgresql':
+        assert sold == 7
+
+
+@pytest.mark.django_db
+def test_index_advisor_finds_no_full_scans_on_keyset_pages():
+    from api.advisor import analyze, propose_index
+    from api.seeding import seed_dataset
+    seed_dataset(users=5, recipes=40, reviews=80, favorites=40, products=20, orders=30)
+
+    sql = ('SELECT "app_review"."id" FROM "app_review" WHERE "app_review"."recipe_id" = 1 '
+           'ORDER BY "app_review"."created_at" DESC, "app_review"."id" DESC')
+    assert propose_index('app_review', sql) == ('recipe_id', '-created_at')
+
+    report = analyze([{'method': 'GET', 'path': '/api/all_recipes/?pagination=cursor'},
+                      {'method': 'GET', 'path': '/api/orders/?pagination=cursor'}], repeat=1)
+    assert report['statements'] > 0
+    assert report['proposals'] == []  # Covered by the composite indexes of migration 0008
+
+
+@pytest.mark.django_db
+def test_sampled_requests_get_server_timing_and_metrics():
+    from api import metrics
+    metrics.reset()
+    author = CustomUser.objects.create_user(username='timed', email='timed@example.com', password='testpass', role='chef')
+    _seed_recipes(author, 3)
+    client = APIClient()
+
+    response = client.get(reverse('recipes-list'))
+    assert response.status_code == 200
+    assert response['Server-Timing'].startswith('app;dur=')
+    assert 'desc="5 queries"' in response['Server-Timing']
+
+    assert client.get(reverse('metrics')).status_code == 401
+    admin = CustomUser.objects.create_user(username='ops', email='ops@example.com', password='testpass', role='admin')
+    client.force_authenticate(user=admin)
+    body = client.get(reverse('metrics')).content.decode()
+    assert 'rapi_request_duration_seconds_count{view="RecipeViewSet.list"} 1' in body
+    assert 'rapi_db_queries_sum{view="RecipeViewSet.list"} 5' in body
+    assert 'rapi_responses_total{view="RecipeViewSet.list",status="200"} 1' in body
+    assert 'rapi_response_cache_misses_total' in body
+
+
+@pytest.mark.django_db
+def test_unsampled_requests_are_not_timed(settings):
+    from api import metrics
+    metrics.reset()
+    settings.METRICS_SAMPLE_RATE = 0
+    response = APIClient().get(reverse('Tags-list'))
+    assert 'Server-Timing' not in response
+    assert metrics.REQUEST_DURATION.series == {}
+
+
+@pytest.mark.django_db
+def test_api_benchmark_covers_every_route_and_flags_regressions():
+    from api.benchmarking import compare, run_benchmarks, uncovered_routes
+    from api.seeding import seed_dataset
+    assert uncovered_routes() == set()
+    seed_dataset(users=5, recipes=20, reviews=40, favorites=20, products=10, orders=10)
+
+    results = run_benchmarks(iterations=3, warmup=1, only=['recipes-detail', 'recipe_reviews-list', 'order-checkout'])
+    assert set(results) == {'recipes-detail', 'async-recipes-detail', 'recipe_reviews-list', 'order-checkout'}
+    assert {label: row['status'] for label, row in results.items()} == {
+        'recipes-detail': 200, 'async-recipes-detail': 200, 'recipe_reviews-list': 200, 'order-checkout': 201}
+    assert results['recipes-detail']['queries'] == 4
+    assert results['recipes-detail']['p50_ms'] <= results['recipes-detail']['p99_ms']
+
+    assert compare(results, results) == []
+    baseline = {label: {**row, 'queries': row['queries'] - 1, 'p50_ms': row['p50_ms'] / 10 - 1} for label, row in results.items()}
+    regressions = compare({'recipes-detail': results['recipes-detail']}, baseline)
+    assert regressions[0] == 'recipes-detail: 3 -> 4 queries'
+    assert regressions[1].startswith('recipes-detail: p50')
+
+
+@pytest.mark.django_db
+def test_benchmark_write_routes_leave_no_phantom_rows_in_the_indexes():
+    from app.models import Recipe
+    from api.benchmarking import run_benchmarks
+    from api.postings import tag_postings_index
+    from api.seeding import DEFAULT_SIZES, seed_dataset
+    counts = seed_dataset(**{name: int(size * 0.01) for name, size in DEFAULT_SIZES.items()})  # Rounds some sizes to 0
+    assert counts['recipes'] >= 1
+    tag_postings_index.ensure_fresh()
+    results = run_benchmarks(iterations=2, warmup=1, only=['recipes-create'])
+    assert results['recipes-create']['status'] == 201
+    tag_postings_index.ensure_fresh()
+    assert tag_postings_index.universe.bit_count() == Recipe.objects.count()
+
+
+@pytest.mark.django_db
+def test_recipe_detail_conditional_get(django_assert_num_queries, monkeypatch):
+    from app.models import PostImage
+    from api.serializers import RecipeSerializer
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, tags = _seed_recipes(author, 2)
+    client = APIClient()
+    url = reverse('recipes-detail', args=[recipes[0].id])
+    response = client.get(url)
+    etag = response['ETag']
+    assert etag.startswith('"') and response['Last-Modified']
+
+    def fail(*args, **kwargs):
+        raise AssertionError('serialized a 304')
+    monkeypatch.setattr(RecipeSerializer, 'to_representation', fail)
+    with django_assert_num_queries(1):  # Just the recipe row, no prefetches
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert not_modified['ETag'] == etag
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+    monkeypatch.undo()
+
+    PostImage.objects.create(recipe=recipes[0], image='post_images/new.png')  # New image touches the recipe
+    after_image = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert after_image.status_code == 200
+    assert after_image['ETag'] != etag
+
+    tags[0].name = 'renamed'
+    tags[0].save()  # Renames leave the recipe row alone; the Tag version moves the validator
+    assert client.get(url, HTTP_IF_NONE_MATCH=after_image['ETag']).status_code == 200
+
+
+@pytest.mark.django_db
+def test_list_conditional_get_follows_version_counters():
+    from app.models import Tag
+    Tag.objects.create(name='Quick')
+    client = APIClient()
+    for name in ('recipes-list', 'Tags-list', 'categories-list', 'product-list'):
+        response = client.get(reverse(name))
+        assert client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+    etag = client.get(reverse('Tags-list'))['ETag']
+    assert client.get(reverse('Tags-list'), {'page': 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    Tag.objects.create(name='Slow')
+    response = client.get(reverse('Tags-list'), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert len(response.data['results'] if 'results' in response.data else response.data) == 2
+
+
+def _access_token(client, username):
+    response = client.post(reverse('token_obtain_pair'), {'username': username, 'password': 'testpass'}, format='json')
+    return response.data['access']
+
+
+@pytest.mark.django_db
+def test_stateless_jwt_skips_user_lookup_and_honours_revocation(settings, django_assert_num_queries):
+    from app.models import Favorite, RoleRequest
+    from rest_framework_simplejwt.tokens import AccessToken
+    settings.STATELESS_JWT = True
+    cook = CustomUser.objects.create_user(username='cook', email='cook@example.com', password='testpass')
+    admin = CustomUser.objects.create_user(username='root', email='root@example.com', password='testpass', role='admin')
+    recipes, _ = _seed_recipes(admin, 1)
+    Favorite.objects.create(user=cook, recipe=recipes[0])
+    client = APIClient()
+    token = _access_token(client, 'cook')
+    assert AccessToken(token)['role'] == 'user'
+
+    client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+    client.get(reverse('favourites-list'))  # Caches the token version
+    with django_assert_num_queries(2):  # count + page; no CustomUser row
+        assert client.get(reverse('favourites-list')).status_code == 200
+    settings.STATELESS_JWT = False
+    with django_assert_num_queries(3):
+        assert client.get(reverse('favourites-list')).status_code == 200
+    settings.STATELESS_JWT = True
+
+    role_request = RoleRequest.objects.create(user=cook, requested_role='chef')
+    admin_client = APIClient()
+    admin_client.credentials(HTTP_AUTHORIZATION=f'JWT {_access_token(admin_client, "root")}')
+    assert admin_client.get(reverse('role-requests-approve', args=[role_request.id])).status_code == 200
+
+    assert client.get(reverse('favourites-list')).status_code == 401  # Role claim is stale
+    client.credentials(HTTP_AUTHORIZATION=f'JWT {_access_token(client, "cook")}')
+    assert client.get(reverse('favourites-list')).status_code == 200
+
+
+@pytest.mark.django_db
+def test_stateless_jwt_leaves_the_user_endpoints_on_the_database_user(settings):
+    settings.STATELESS_JWT = True
+    CustomUser.objects.create_user(username='cook', email='cook@example.com', password='testpass')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'JWT {_access_token(client, "cook")}')
+    response = client.get('/auth/users/me/')
+    assert response.status_code == 200
+    assert (response.data['username'], response.data['email']) == ('cook', 'cook@example.com')
+
+
+@pytest.mark.django_db
+def test_ingredient_create_checks_authorship_on_validated_recipe():
+    from app.models import IngredientName
+    author = CustomUser.objects.create_user(username='owner', email='owner@example.com', password='testpass', role='chef')
+    other = CustomUser.objects.create_user(username='other', email='other@example.com', password='testpass', role='chef')
+    recipes, _ = _seed_recipes(author, 1)
+    salt = IngredientName.objects.create(name='Salt')
+    client = APIClient()
+    url = reverse('recipe_ingredients_model-list', kwargs={'recipe_pk': recipes[0].id})
+    payload = {'name': salt.id, 'recipe': recipes[0].id, 'quantity': '1', 'unit': 'pinch'}
+    client.force_authenticate(user=other)
+    assert client.post(url, payload, format='json').status_code == 403
+    client.force_authenticate(user=author)
+    response = client.post(url, payload, format='json')
+    assert response.status_code == 201, response.data
+    assert recipes[0].ingredient_model_set.filter(name=salt).exists()
+
+
+@pytest.mark.django_db
+def test_sparse_fieldsets_prune_serializer_and_queryset():
+    from app.models import ProductCategories
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 4)
+    client = APIClient()
+
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(reverse('recipes-list'), {'fields': 'id,title,author'})
+    assert response.status_code == 200
+    assert set(response.data['results'][0]) == {'id', 'title', 'author'}
+    assert response.data['results'][0]['author'] == 'chef'
+    assert len(captured) == 2  # count + recipes joined to author; no category join, no prefetches
+    assert '"instructions"' not in captured[-1]['sql'] and '"app_category"' not in captured[-1]['sql']
+
+    with CaptureQueriesContext(connection) as captured:
+        response = client.get(reverse('recipes-list'), {'exclude': 'post_images,instructions', 'pagination': 'cursor'})
+    assert 'post_images' not in response.data['results'][0] and 'tags' in response.data['results'][0]
+    assert len(captured) == 3  # recipes + tags + ingredients
+
+    detail = client.get(reverse('recipes-detail', args=[recipes[0].id]), {'fields': 'title'})
+    assert detail.data == {'title': recipes[0].title} and detail['ETag']
+
+    assert client.get(reverse('recipes-list'), {'fields': 'title,secret'}).status_code == 400
+    category = ProductCategories.objects.create(name='Pans')
+    Product.objects.create(name='Skillet', price='20.00', stock=3, category=category)
+    assert set(client.get(reverse('product-list'), {'fields': 'id,name'}).data['results'][0]) == {'id', 'name'}
+    Order.objects.create(user=author)
+    assert set(client.get(reverse('order-list'), {'fields': 'id,user'}).data['results'][0]) == {'id', 'user'}
+
+
+@pytest.mark.django_db
+def test_fast_list_serialization_matches_drf_byte_for_byte(settings):
+    from app.models import ProductCategories, Recipe
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 8)
+    Recipe.objects.filter(pk=recipes[0].pk).update(title='Crème brûlée “quoted”', categories=None, rating=4.25,
+                                                   rating_count=4, rating_histogram={'5': 1, '4': 3})
+    recipes[1].post_images.update(image_variants={'thumbnail': 'post_images/thumb.jpg'})
+    category = ProductCategories.objects.create(name='Pans')
+    Product.objects.create(name='Skillet', price='19.90', stock=3, category=category, image='product_images/s.png',
+                           image_variants={'thumbnail': 'product_images/s-thumb.jpg'})
+    Product.objects.create(name='Lid', price='4.00', stock=0, category=category)
+    client = APIClient()
+
+    requests = [
+        ('recipes-list', {}),
+        ('recipes-list', {'page': 2, 'page_size': 5}),
+        ('recipes-list', {'pagination': 'cursor', 'page_size': 6}),
+        ('recipes-list', {'fields': 'id,title,tags,categories'}),
+        ('recipes-list', {'exclude': 'description,ingredients_used', 'image_size': 'thumbnail'}),
+        ('recipes-list', {'ordering': '-rating', 'search': 'Recipe'}),
+        ('product-list', {}),
+        ('product-list', {'image_size': 'thumbnail', 'fields': 'id,image,price,category'}),
+    ]
+    for name, params in requests:
+        bodies = []
+        for fast in (False, True):
+            settings.FAST_LIST_SERIALIZATION = fast
+            cache.clear()
+            response = client.get(reverse(name), params)
+            assert response.status_code == 200
+            bodies.append(response.content)
+        assert bodies[0] == bodies[1], (name, params)
+
+
+def test_fast_json_renderer_matches_json_renderer():
+    from decimal import Decimal
+    from rest_framework.renderers import JSONRenderer
+    from api.renderers import FastJSONRenderer
+    data = {'text': 'naïve \u2028 \u2029 "q"', 'price': Decimal('1.50'), 'n': [1, 2.5, None, True], 1: 'int key'}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    context = {'indent': 2}
+    assert FastJSONRenderer().render(data, renderer_context=context) == JSONRenderer().render(data, renderer_context=context)
+
+
+@pytest.mark.django_db
+def test_fast_json_renderer_matches_json_renderer_on_real_recipes():
+    import datetime
+    from rest_framework.renderers import JSONRenderer
+    from api.renderers import FastJSONRenderer
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 3)
+    client = APIClient()
+    for url in (reverse('recipes-list'), reverse('recipes-detail', args=[recipes[0].id])):
+        data = client.get(url).data
+        assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    moments = {
+        'aware': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'naive': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456),
+        'date': datetime.date(2024, 1, 2), 'time': datetime.time(1, 2, 3, 456789),
+    }
+    assert FastJSONRenderer().render(moments) == JSONRenderer().render(moments)
+
+
+@pytest.mark.django_db
+def test_recipe_neighbors_stay_in_sync_and_drive_recommendations(django_capture_on_commit_callbacks, settings):
+    from app.models import Favorite, RecipeNeighbor, Review
+    from api.recommendations import rebuild_neighbors
+    settings.RECOMMENDATION_REFRESH_SYNC = True
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass', role='chef')
+    recipes, _ = _seed_recipes(author, 5)
+    users = [CustomUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='testpass')
+             for i in range(3)]
+
+    def snapshot():
+        return {(row.recipe_id, row.neighbor_id): (round(row.score, 6), row.co_count) for row in RecipeNeighbor.objects.all()}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for user, picks in zip(users, [(0, 1, 2), (0, 1), (1, 3)]):
+            for index in picks:
+                Favorite.objects.create(user=user, recipe=recipes[index])
+        Review.objects.create(user=users[0], recipe=recipes[2], rating=5, comment='Great')
+    incremental = snapshot()
+    assert rebuild_neighbors() == len(incremental)
+    assert snapshot() == incremental
+
+    client = APIClient()
+    similar = client.get(reverse('recipes-similar', args=[recipes[0].id]))
+    assert similar.status_code == 200
+    assert [row['id'] for row in similar.data][0] == recipes[1].id  # Shared by two fans
+    assert client.get(reverse('recipes-similar', args=[999999])).status_code == 404
+
+    client.force_authenticate(user=users[1])
+    recommended = client.get(reverse('favourites-recommended'))
+    assert recommended.status_code == 200
+    assert {row['id'] for row in recommended.data} == {recipes[2].id, recipes[3].id}  # Never what they already like
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Favorite.objects.filter(user=users[0], recipe=recipes[1]).delete()
+        recipes[3].delete()
+    incremental = snapshot()
+    rebuild_neighbors()
+    assert snapshot() == incremental
+
+
+@pytest.mark.django_db
+def test_minhash_index_flags_duplicates_and_finds_similar_recipes():
+    from app.models import Recipe, Tag
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass', role='chef')
+    recipes, tags = _seed_recipes(author, 6, tags_per_recipe=2, ingredients_per_recipe=4)
+    original = recipes[0]
+    Recipe.objects.filter(pk=original.pk).update(instructions='Whisk the eggs, fold in sugar and bake for twenty minutes')
+    client = APIClient()
+    client.force_authenticate(user=author)
+    payload = {
+        'title': 'Same cake again', 'description': 'Copy', 'instructions': 'Whisk the eggs, fold in sugar and bake for twenty minutes',
+        'tags': list(original.tags.values_list('name', flat=True)),
+        'ingredients_used': list(original.ingredients_used.values_list('name', flat=True)),
+        'categories': original.categories.name, 'author': 'chef',
+    }
+    response = client.post(reverse('recipes-list'), payload, format='json')
+    assert response.status_code == 201, response.data
+    assert [row['id'] for row in response.data['possible_duplicates']] == [original.id]
+    copy = Recipe.objects.get(pk=response.data['id'])
+
+    similar = client.get(reverse('recipes-more-like-this', args=[original.id]))
+    assert similar.status_code == 200
+    assert similar.data[0]['id'] == copy.id and similar.data[0]['similarity'] == 1.0
+
+    copy.tags.set([Tag.objects.create(name='fresh-tag')])  # Patched in from the change log
+    copy.instructions = 'Grill quickly'
+    copy.save()
+    assert copy.id not in [row['id'] for row in client.get(reverse('recipes-more-like-this', args=[original.id])).data[:1]]
+    assert client.get(reverse('recipes-more-like-this', args=[999999])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_similarity_index_patches_logged_changes_instead_of_rebuilding():
+    from django.core.cache import cache
+    from api.caching import CHANGES_KEY, get_version
+    from api.indexes import RECIPE_INSTRUCTIONS
+    from api.similarity import similarity_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 3)
+    similarity_index.ensure_fresh()
+    built_at, versions = similarity_index.built_at, similarity_index.versions
+
+    recipes[0].description = 'Not hashed'
+    recipes[0].save()
+    similarity_index.ensure_fresh()
+    assert similarity_index.versions == versions  # Only the fields it hashes move its versions
+
+    before = similarity_index.signatures[recipes[0].pk]
+    recipes[0].instructions = 'Simmer the beans overnight'
+    recipes[0].save()  # As if saved by another process: no receiver touches the index
+    similarity_index.ensure_fresh()
+    assert similarity_index.built_at == built_at and similarity_index.signatures[recipes[0].pk] != before
+
+    recipes[1].delete()
+    recipes[2].instructions = 'Roast the squash'
+    recipes[2].save()
+    cache.delete(CHANGES_KEY.format(RECIPE_INSTRUCTIONS, get_version(RECIPE_INSTRUCTIONS)))  # Evicted log: start over
+    similarity_index.ensure_fresh()
+    assert similarity_index.built_at != built_at
+    assert set(similarity_index.signatures) == {recipes[0].pk, recipes[2].pk}
+
+
+def test_replica_router_pins_clients_to_primary_after_writes(settings):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from app.models import Recipe
+    from api.replicas import PIN_COOKIE, PrimaryPinMiddleware, ReplicaRouter
+    settings.DATABASE_REPLICAS = ['replica_0']
+    settings.PRIMARY_PIN_SECONDS = 30
+    router, seen = ReplicaRouter(), []
+    middleware = PrimaryPinMiddleware(lambda request: seen.append(router.db_for_read(Recipe)) or HttpResponse())
+    factory = RequestFactory()
+
+    assert router.db_for_read(Recipe) == 'default' and router.db_for_write(Recipe) == 'default'  # Outside requests
+    middleware(factory.get('/api/all_recipes/'))
+    written = middleware(factory.post('/api/all_recipes/'))
+    pinned = factory.get('/api/all_recipes/')
+    pinned.COOKIES[PIN_COOKIE] = written.cookies[PIN_COOKIE].value
+    middleware(pinned)
+    expired = factory.get('/api/all_recipes/')
+    expired.COOKIES[PIN_COOKIE] = '1'
+    middleware(expired)
+    assert seen == ['replica_0', 'default', 'default', 'replica_0']
+    assert not router.allow_migrate('replica_0', 'app') and router.allow_migrate('default', 'app')
+
+
+def test_index_builds_read_from_the_primary_during_replica_requests(settings, monkeypatch):
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from api.pantry import pantry_index
+    from api.replicas import PrimaryPinMiddleware, read_routing
+    settings.DATABASE_REPLICAS = ['replica_0']
+    seen = []
+    monkeypatch.setattr(pantry_index, 'build', lambda: seen.append(read_routing()))
+    middleware = PrimaryPinMiddleware(lambda request: seen.append(read_routing()) or pantry_index.ensure_fresh() or HttpResponse())
+
+    middleware(RequestFactory().get('/api/all_recipes/pantry/'))
+    assert seen == ['replica', None]  # Stamped with the primary's versions, so built from the primary
+
+
+@pytest.mark.django_db
+def test_async_read_endpoints_match_the_viewsets():
+    from app.models import ProductCategories, Review
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 8)
+    Review.objects.bulk_create([Review(user=author, recipe=recipes[0], rating=rating, comment='ok') for rating in (3, 5)])
+    category = ProductCategories.objects.create(name='Pans')
+    Product.objects.create(name='Skillet', price='19.90', stock=3, category=category)
+    client = APIClient()
+    client.force_authenticate(user=author)
+
+    requests = [
+        ('recipes-list', {}, {}),
+        ('recipes-list', {}, {'page': 2, 'page_size': 5}),
+        ('recipes-list', {}, {'page': 'last', 'fields': 'id,title,tags'}),
+        ('recipes-list', {}, {'page': 9}),  # 404
+        ('recipes-list', {}, {'pagination': 'cursor', 'page_size': 3}),  # The viewset's own list(), in a thread
+        ('recipes-list', {}, {'ordering': '-title', 'search': 'Recipe', 'tags': recipes[0].tags.first().pk}),
+        ('recipes-detail', {'pk': recipes[0].pk}, {}),
+        ('recipes-detail', {'pk': recipes[1].pk}, {'exclude': 'instructions'}),
+        ('recipes-detail', {'pk': 0}, {}),  # 404
+        ('recipe_reviews-list', {'recipe_pk': recipes[0].pk}, {'limit': 1, 'offset': 1}),
+        ('product-list', {}, {}),
+        ('Tags-list', {}, {'limit': 4}),
+        ('categories-list', {}, {}),
+    ]
+    async_names = {'recipe_reviews-list': 'async-recipe-reviews-list', 'Tags-list': 'async-tags-list',
+                   'product-list': 'async-product-list', 'categories-list': 'async-categories-list'}
+    for name, kwargs, params in requests:
+        responses = []
+        for url_name in (name, async_names.get(name, f'async-{name}')):
+            cache.clear()
+            responses.append(client.get(reverse(url_name, kwargs=kwargs), params))
+        sync, native = responses
+        assert sync.status_code == native.status_code, (name, params)
+        assert sync.content == native.content.replace(b'/api/async/', b'/api/'), (name, params)  # Page links
+
+    # Cache hits and conditional GETs on the async side
+    url = reverse('async-recipes-list')
+    first = client.get(url)
+    assert first['X-Cache'] == 'MISS' and client.get(url)['X-Cache'] == 'HIT'
+    assert client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    detail = client.get(reverse('async-recipes-detail', kwargs={'pk': recipes[0].pk}))
+    assert client.get(reverse('async-recipes-detail', kwargs={'pk': recipes[0].pk}),
+                      HTTP_IF_NONE_MATCH=detail['ETag']).status_code == 304
+
+    anonymous = APIClient().get(reverse('async-recipe-reviews-list', kwargs={'recipe_pk': recipes[0].pk}))
+    assert anonymous.status_code == 401
+    assert client.post(reverse('async-tags-list'), {'name': 'new'}).status_code == 405
+
+
+@pytest.mark.django_db
+def test_typeahead_ranks_by_usage_and_follows_signals(django_assert_num_queries):
+    from app.models import Category, IngredientName, Recipe, Tag
+    from api.caching import bump_version
+    from api.typeahead import typeahead_index
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    pepper, bell, salt = (IngredientName.objects.create(name=name) for name in ('Black Pepper', 'Bell pepper', 'Salt'))
+    soup, sweet = Tag.objects.create(name='Soup'), Tag.objects.create(name='Sweet')
+    baking = Category.objects.create(name='Baking')
+    for index in range(3):
+        recipe = Recipe.objects.create(title=f'Dish {index}', author=author, categories=baking if index else None)
+        recipe.ingredients_used.set([bell] + ([pepper] if index == 2 else []))
+        recipe.tags.set([soup, sweet][:index])
+    client = APIClient()
+    url = reverse('typeahead')
+
+    response = client.get(url, {'q': 'pe'})
+    assert response.status_code == 200
+    assert response.data == {
+        'ingredients': [{'id': bell.pk, 'name': 'Bell pepper', 'recipe_count': 3},
+                        {'id': pepper.pk, 'name': 'Black Pepper', 'recipe_count': 1}],  # Any word matches
+        'tags': [], 'categories': [],
+    }
+    with django_assert_num_queries(0):  # Built now, and answered from memory
+        response = client.get(url, {'q': 's', 'kind': 'tags,ingredients', 'limit': 2})
+    assert [row['name'] for row in response.data['tags']] == ['Soup', 'Sweet']
+    assert [row['name'] for row in response.data['ingredients']] == ['Salt']
+    assert set(response.data) == {'tags', 'ingredients'}
+
+    # Signals keep names and counts current without a rebuild
+    sweet.name = 'Sugar'
+    sweet.save()
+    Recipe.objects.get(title='Dish 0').tags.add(sweet)
+    soup.recipes.remove(*Recipe.objects.filter(title__in=['Dish 1', 'Dish 2']))
+    dessert = Category.objects.create(name='Bakery')
+    dish = Recipe.objects.get(title='Dish 1')
+    dish.categories = dessert
+    dish.save()
+    built_at = typeahead_index.built_at
+    assert typeahead_index.lookup('tags', 'S') == [(sweet.pk, 'Sugar', 2), (soup.pk, 'Soup', 0)]
+    assert typeahead_index.lookup('categories', 'bak') == [(dessert.pk, 'Bakery', 1), (baking.pk, 'Baking', 1)]  # Ties by name
+    typeahead_index.ensure_fresh()
+    assert typeahead_index.built_at == built_at
+    bump_version(Recipe)  # Recipe writes that leave names and links alone don't rebuild it
+    typeahead_index.ensure_fresh()
+    assert typeahead_index.built_at == built_at
+
+    bump_version(IngredientName)  # Another process wrote: rebuilt on the next lookup
+    IngredientName.objects.filter(pk=salt.pk).update(name='Sea salt')
+    assert client.get(url, {'q': 'sea', 'kind': 'ingredients'}).data['ingredients'][0]['name'] == 'Sea salt'
+
+    assert client.get(url, {'kind': 'spices'}).status_code == 400
+    assert client.get(url, {'limit': 'x'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_bulk_replace_ingredients_diffs_the_list_in_one_request():
+    from app.models import Recipe, IngredientName, IngredientModel
+    chef = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass', role='chef')
+    other = CustomUser.objects.create_user(username='other', email='other@example.com', password='testpass', role='chef')
+    recipe = Recipe.objects.create(title='Stew', author=chef)
+    flour, salt, egg, milk = (IngredientName.objects.create(name=name) for name in ('flour', 'salt', 'egg', 'milk'))
+    IngredientModel.objects.create(name=flour, recipe=recipe, quantity='1', unit='cup', order=1, author=chef)
+    IngredientModel.objects.create(name=salt, recipe=recipe, quantity='1', unit='tsp', order=2, author=chef)
+    recipe.ingredients_used.add(flour, salt)
+    url = reverse('recipe_ingredients_model-bulk-replace', kwargs={'recipe_pk': recipe.pk})
+    assert url == f'/api/all_recipes/{recipe.pk}/ingredients_model/bulk/'
+    client = APIClient()
+    client.force_authenticate(user=chef)
+
+    body = [
+        {'name': egg.pk, 'quantity': '2'},
+        {'name': flour.pk, 'quantity': '3', 'unit': 'cups', 'alternative_ingredient': milk.pk},
+    ]
+    response = client.put(url, body, format='json')
+    assert response.status_code == 200
+    assert (response.data['created'], response.data['updated'], response.data['deleted']) == (1, 1, 1)
+    assert [(row['name'], row['order']) for row in response.data['results']] == [(egg.pk, 1), (flour.pk, 2)]
+    rows = IngredientModel.objects.filter(recipe=recipe).order_by('order')
+    assert [(row.name_id, row.quantity, row.alternative_ingredient_id) for row in rows] == [(egg.pk, '2', None), (flour.pk, '3', milk.pk)]
+    # salt was linked on its own, so dropping its line leaves the link
+    assert sorted(recipe.ingredients_used.values_list('name', flat=True)) == ['egg', 'flour', 'salt']
+
+    response = client.put(url, [{'name': egg.pk}, {'name': egg.pk}, {'name': 999}], format='json')
+    assert response.status_code == 400
+    assert [error['index'] for error in response.data['items']] == [1, 2]
+    assert IngredientModel.objects.filter(recipe=recipe).count() == 2
+
+    client.force_authenticate(user=other)
+    assert client.put(url, [], format='json').status_code == 403
+    assert IngredientModel.objects.filter(recipe=recipe).count() == 2
+
+
+@pytest.mark.django_db
+def test_recipes_by_tag_set_algebra_follows_signals_and_matches_cursor_pages():
+    from app.models import Category, IngredientName, Recipe, Tag
+    from api.postings import page_ids, tag_postings_index, to_bits
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    vegan, quick, spicy = (Tag.objects.create(name=name) for name in ('vegan', 'quick', 'spicy'))
+    mains = Category.objects.create(name='Mains')
+    rice = IngredientName.objects.create(name='rice')
+    salad, curry, stew, soup = (Recipe.objects.create(title=title, author=author) for title in ('Salad', 'Curry', 'Stew', 'Soup'))
+    salad.tags.add(vegan, quick)
+    curry.tags.add(vegan, spicy)
+    curry.ingredients_used.add(rice)
+    stew.tags.add(spicy)
+    url = reverse('recipes-by-tags')
+    client = APIClient()
+
+    def titles(**params):
+        response = client.get(url, params)
+        assert response.status_code == 200
+        return [row['title'] for row in response.data['results']]
+
+    assert titles(tags=f'{vegan.id},{spicy.id}') == ['Stew', 'Curry', 'Salad']
+    assert titles(all_tags=[vegan.id, spicy.id]) == ['Curry']
+    assert titles(exclude_tags=vegan.id) == ['Soup', 'Stew']
+    assert titles(tags=spicy.id, ingredients=rice.id) == ['Curry']
+    assert titles(tags=vegan.id, limit=1, offset=1) == ['Salad']
+    assert client.get(url, {'tags': 'x'}).status_code == 400
+
+    # Writes patch the changed recipes into the bitsets, nothing is rebuilt
+    built_at, versions = tag_postings_index.built_at, tag_postings_index.versions
+    salad.title = 'Green salad'
+    salad.save()
+    tag_postings_index.ensure_fresh()
+    assert tag_postings_index.versions == versions  # Titles aren't indexed
+    soup.tags.add(vegan)
+    stew.categories = mains
+    stew.save()
+    curry.delete()
+    assert titles(tags=vegan.id) == ['Soup', 'Green salad']
+    assert titles(category=mains.id) == ['Stew']
+    quick.delete()
+    assert titles(exclude_tags=spicy.id) == ['Soup', 'Green salad']
+    assert tag_postings_index.built_at == built_at
+
+    # Cursor pages run the same filters in SQL
+    response = client.get(url, {'tags': [vegan.id, spicy.id], 'pagination': 'cursor'})
+    assert sorted(row['title'] for row in response.data['results']) == ['Green salad', 'Soup', 'Stew']
+
+    bits = to_bits([3, 9, 64, 200, 1000])
+    assert page_ids(bits, 0, 2) == [1000, 200]
+    assert page_ids(bits, 2, 10) == [64, 9, 3]
+    assert page_ids(bits, 5, 10) == []
+
+
+@pytest.mark.django_db
+def test_recipe_list_facets_follow_the_filters_and_are_cached(django_assert_num_queries):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from app.models import Category, IngredientName, Recipe, Tag
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    mains, sides = Category.objects.create(name='Mains'), Category.objects.create(name='Sides')
+    vegan, quick = Tag.objects.create(name='vegan'), Tag.objects.create(name='quick')
+    rice = IngredientName.objects.create(name='rice')
+    curry = Recipe.objects.create(title='Curry', author=author, categories=mains)
+    salad = Recipe.objects.create(title='Salad', author=author, categories=sides)
+    Recipe.objects.create(title='Stew', author=author, categories=mains)
+    curry.tags.add(vegan, quick)
+    salad.tags.add(vegan)
+    curry.ingredients_used.add(rice)
+    url = reverse('recipes-list')
+    client = APIClient()
+
+    response = client.get(url, {'facets': 'categories,tags,ingredients_used'})
+    facets = response.data['facets']
+    assert facets['categories'] == [{'id': mains.id, 'name': 'Mains', 'count': 2}, {'id': sides.id, 'name': 'Sides', 'count': 1}]
+    assert facets['tags'] == [{'id': vegan.id, 'name': 'vegan', 'count': 2}, {'id': quick.id, 'name': 'quick', 'count': 1}]
+    assert facets['ingredients_used'] == [{'id': rice.id, 'name': 'rice', 'count': 1}]
+
+    filtered = client.get(url, {'facets': 'tags', 'tags': vegan.id}).data
+    assert filtered['count'] == 2 and list(filtered['facets']) == ['tags']
+    assert filtered['facets']['tags'] == [{'id': vegan.id, 'name': 'vegan', 'count': 2}, {'id': quick.id, 'name': 'quick', 'count': 1}]
+    # Another page of the same filters reuses the cached counts: no queries beyond the page's own
+    with CaptureQueriesContext(connection) as plain:
+        client.get(url, {'tags': vegan.id, 'page': 1, 'page_size': 1})
+    with django_assert_num_queries(len(plain)):
+        client.get(url, {'facets': 'tags', 'tags': vegan.id, 'page': 2, 'page_size': 1})
+
+    quick.delete()
+    assert client.get(url, {'facets': 'tags', 'tags': vegan.id}).data['facets']['tags'] == [{'id': vegan.id, 'name': 'vegan', 'count': 2}]
+    assert client.get(url, {'facets': 'price'}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_claim_change_revocation_survives_later_saves_of_the_same_instance():
+    from rest_framework_simplejwt.tokens import AccessToken
+    cook = CustomUser.objects.create_user(username='cook', email='cook@example.com', password='testpass')
+    client = APIClient()
+    token = _access_token(client, 'cook')
+    cook.role = 'chef'
+    cook.save()
+    assert cook.token_version == AccessToken(token)['token_version'] + 1
+    cook.first_name = 'Cook'
+    cook.save()  # Must not write the old version back
+    cook.refresh_from_db()
+    assert cook.token_version == AccessToken(token)['token_version'] + 1
+    client.credentials(HTTP_AUTHORIZATION=f'JWT {token}')
+    assert client.get(reverse('favourites-list')).status_code == 401
+
+    cook.is_active = False
+    cook.save(update_fields=['is_active'])
+    cook.refresh_from_db()
+    assert cook.token_version == AccessToken(token)['token_version'] + 2
+
+
+@pytest.mark.django_db
+def test_version_bumps_inside_a_transaction_repeat_on_commit(django_capture_on_commit_callbacks):
+    from django.db import transaction
+    from app.models import Tag
+    from api.caching import get_version
+    before = get_version(Tag)
+    with django_capture_on_commit_callbacks(execute=True):
+        with transaction.atomic():
+            Tag.objects.create(name='vegan')
+            during = get_version(Tag)
+    assert during == before + 1
+    assert get_version(Tag) == before + 2  # Entries rebuilt from pre-commit rows are orphaned
+
+
+@pytest.mark.django_db
+def test_bulk_import_reports_badly_typed_and_oversized_values_per_record():
+    import json
+    from app.models import Recipe
+    admin = CustomUser.objects.create_user(username='boss', email='boss@example.com', password='testpass', role='admin')
+    lines = [
+        {'title': 'Good', 'author': 'boss', 'tags': ['quick']},
+        {'title': 'Dict tag', 'author': 'boss', 'tags': [{}]},
+        {'title': 'Number', 'author': 'boss', 'ingredients_used': [1]},
+        {'title': 'x' * 256, 'author': 'boss'},
+        {'title': 'Bad unit', 'author': 'boss', 'ingredients': [{'name': 'salt', 'unit': 'u' * 51}]},
+        {'title': 'Also good', 'author': 'boss', 'categories': 'Mains'},
+    ]
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    body = '\n'.join(json.dumps(line) for line in lines)
+    response = client.post(reverse('recipes-bulk-import'), body, content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert [error['line'] for error in response.data['errors']] == [2, 3, 4, 5]
+    assert sorted(Recipe.objects.values_list('title', flat=True)) == ['Also good', 'Good']
+
+
+@pytest.mark.django_db
+def test_bulk_import_reports_undecodable_lines_and_keeps_going():
+    from app.models import Recipe
+    from api.bulk import RecipeImporter
+    CustomUser.objects.create_user(username='boss', email='boss@example.com', password='testpass', role='admin')
+    lines = [b'{"title": "First", "author": "boss"}\n', b'\xff\xfe\n', b'{"title": "Last", "author": "boss"}\n']
+    report = RecipeImporter(chunk_size=1).run(lines)  # The first chunk is written before the bad line is read
+    assert report['created'] == 2
+    assert [error['line'] for error in report['errors']] == [2]
+    assert report['errors'][0]['error'].startswith('Invalid UTF-8')
+    assert sorted(Recipe.objects.values_list('title', flat=True)) == ['First', 'Last']
+
+
+@pytest.mark.django_db
+def test_recompute_ratings_moves_the_detail_validators():
+    from app.models import Review
+    from api.ratings import recompute_ratings
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 1)
+    client = APIClient()
+    url = reverse('recipes-detail', args=[recipes[0].id])
+    etag = client.get(url)['ETag']
+    Review.objects.bulk_create([Review(user=author, recipe=recipes[0], rating=5, comment='Great')])  # No signals
+    assert recompute_ratings() == 1
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['rating'] == 5
+
+
+@pytest.mark.django_db
+def test_favorite_writes_only_queue_the_neighbor_refresh(django_capture_on_commit_callbacks, settings, monkeypatch):
+    from app.models import Favorite, RecipeNeighbor
+    from api import recommendations
+    settings.RECOMMENDATION_REFRESH_DELAY = 0
+    submitted = []
+    monkeypatch.setattr(recommendations, 'get_executor', lambda: type('Executor', (), {'submit': staticmethod(submitted.append)}))
+    monkeypatch.setattr(recommendations.connections, 'close_all', lambda: None)  # The flush runs on the test's connection here
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass', role='chef')
+    recipes, _ = _seed_recipes(author, 3)
+    fans = [CustomUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='testpass') for i in range(2)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        for fan in fans:
+            Favorite.objects.create(user=fan, recipe=recipes[0])
+            Favorite.objects.create(user=fan, recipe=recipes[1])
+    assert not RecipeNeighbor.objects.exists()  # Nothing computed on the write path
+    assert len(submitted) == 1 and recommendations._pending == {recipes[0].id, recipes[1].id}
+
+    submitted[0]()
+    assert not recommendations._pending
+    assert set(RecipeNeighbor.objects.values_list('recipe_id', 'neighbor_id')) == {(recipes[0].id, recipes[1].id), (recipes[1].id, recipes[0].id)}
+
+
+@pytest.mark.django_db
+def test_recipe_list_pages_are_ordered_newest_first():
+    import warnings
+    author = CustomUser.objects.create_user(username='chef', email='chef@example.com', password='testpass')
+    recipes, _ = _seed_recipes(author, 4)
+    client = APIClient()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # UnorderedObjectListWarning
+        pages = [client.get(reverse('recipes-list'), {'page': page, 'page_size': 2}).data['results'] for page in (1, 2)]
+    assert [row['id'] for page in pages for row in page] == [recipe.id for recipe in reversed(recipes)]
@@ -0,0 +1,152 @@
+import heapq
+from bisect import bisect_left, insort
+
+from django.db.models import Count
+
+from app.models import Category, IngredientName, Recipe, Tag
+from .indexes import RECIPE_CATEGORY, RECIPE_INGREDIENTS, RECIPE_ROWS, RECIPE_TAGS, InMemoryIndex
+
+# kind -> (model, Recipe field referencing it); usage is the number of recipes doing so
+SOURCES = {
+    'ingredients': (IngredientName, 'ingredients_used'),
+    'tags': (Tag, 'tags'),
+    'categories': (Category, 'categories'),
+}
+KINDS = {model: kind for kind, (model, _) in SOURCES.items()}
+KEY_END = '\U0010ffff'  # Sorts after any character a key can continue with
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def word_keys(name):
+    """Every word-start suffix of a normalized name, so 'black pepper' is found by 'bl' and 'pe'."""
+    words = name.split(' ')
+    return {' '.join(words[index:]) for index in range(len(words)) if words[index]}
+
+
+def count_usage(relation, ids=None):
+    """{entry id: recipes referencing it} over all entries, or only `ids`, in one grouped query."""
+    recipes = Recipe.objects.all() if ids is None else Recipe.objects.filter(**{f'{relation}__in': ids})
+    rows = recipes.values_list(relation).annotate(uses=Count('pk')).order_by()
+    return {entry_id: uses for entry_id, uses in rows if entry_id is not None}
+
+
+class PrefixTable:
+    """
+    One kind's entries, as sorted arrays searched with bisect.
+
+    keys:    sorted (word-start suffix, id) pairs; a prefix's matches are one contiguous range
+    ranked:  sorted (-usage, ' ' + normalized name, id) tuples, i.e. every entry best first
+    rank_of: id -> its `ranked` tuple
+    """
+
+    def __init__(self):
+        self.names, self.rank_of = {}, {}
+        self.keys, self.ranked = [], []
+
+    def load(self, names, usage):
+        self.names = dict(names)
+        self.rank_of = {entry_id: (-usage.get(entry_id, 0), ' ' + normalize(name), entry_id)
+                        for entry_id, name in self.names.items()}
+        self.keys = sorted((key, entry_id) for entry_id, rank in self.rank_of.items() for key in word_keys(rank[1][1:]))
+        self.ranked = sorted(self.rank_of.values())
+
+    @staticmethod
+    def _remove(sorted_list, item):
+        position = bisect_left(sorted_list, item)
+        if position < len(sorted_list) and sorted_list[position] == item:
+            del sorted_list[position]
+
+    def put(self, entry_id, name):
+        usage = -self.rank_of[entry_id][0] if entry_id in self.rank_of else 0
+        self.remove(entry_id)
+        self.names[entry_id] = name
+        rank = self.rank_of[entry_id] = (-usage, ' ' + normalize(name), entry_id)
+        for key in word_keys(rank[1][1:]):
+            insort(self.keys, (key, entry_id))
+        insort(self.ranked, rank)
+
+    def remove(self, entry_id):
+        rank = self.rank_of.pop(entry_id, None)
+        if rank is None:
+            return
+        for key in word_keys(rank[1][1:]):
+            self._remove(self.keys, (key, entry_id))
+        self._remove(self.ranked, rank)
+        del self.names[entry_id]
+
+    def set_usage(self, entry_id, usage):
+        rank = self.rank_of.get(entry_id)
+        if rank is not None and rank[0] != -usage:
+            self._remove(self.ranked, rank)
+            rank = self.rank_of[entry_id] = (-usage, *rank[1:])
+            insort(self.ranked, rank)
+
+    def top(self, prefix, limit):
+        """[(id, name, usage)] of the `limit` most used entries with a word starting with `prefix`."""
+        if not prefix:
+            matches = self.ranked[:limit]
+        else:
+            start = bisect_left(self.keys, (prefix,))
+            end = bisect_left(self.keys, (prefix + KEY_END,), start)
+            if (end - start) ** 2 > limit * len(self.ranked):
+                # Broad prefix: walking the ranking finds `limit` matches sooner than ranking the range
+                needle, matches = ' ' + prefix, []
+                for rank in self.ranked:
+                    if needle in rank[1]:  # A word of the name starts with the prefix
+                        matches.append(rank)
+                        if len(matches) == limit:
+                            break
+            else:
+                ids = {entry_id for _, entry_id in self.keys[start:end]}
+                matches = heapq.nsmallest(limit, map(self.rank_of.__getitem__, ids))
+        return [(entry_id, self.names[entry_id], -negated_usage) for negated_usage, _, entry_id in matches]
+
+
+class TypeaheadIndex(InMemoryIndex):
+    """
+    Prefix lookups over ingredient, tag and category names, ranked by how many recipes use each
+    entry. Answers from memory only; api.signals patches names and usage counts in place.
+    """
+    source_models = (RECIPE_ROWS, RECIPE_CATEGORY, RECIPE_TAGS, RECIPE_INGREDIENTS, IngredientName, Tag, Category)
+
+    def __init__(self):
+        super().__init__()
+        self.tables = {kind: PrefixTable() for kind in SOURCES}
+
+    def build(self):
+        for kind, (model, relation) in SOURCES.items():
+            names = model.objects.values_list('pk', 'name').iterator(chunk_size=10000)
+            self.tables[kind].load(names, count_usage(relation))
+
+    # Incremental maintenance (called from api.signals)
+
+    def put(self, model, entry_id, name):
+        with self.lock:
+            self.tables[KINDS[model]].put(entry_id, name)
+
+    def remove(self, model, entry_id):
+        with self.lock:
+            self.tables[KINDS[model]].remove(entry_id)
+
+    def refresh_usage(self, model, ids):
+        """Recount the recipes referencing a few entries after their Recipe rows or M2M links changed."""
+        ids = [entry_id for entry_id in ids if entry_id is not None]
+        if not ids:
+            return
+        usage = count_usage(SOURCES[KINDS[model]][1], ids)
+        with self.lock:
+            table = self.tables[KINDS[model]]
+            for entry_id in ids:
+                table.set_usage(entry_id, usage.get(entry_id, 0))
+
+    # Querying
+
+    def lookup(self, kind, prefix, limit=10):
+        with self.lock:
+            return self.tables[kind].top(normalize(prefix), limit)
+
+
+typeahead_index = TypeaheadIndex()
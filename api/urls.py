@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework import routers
-from api import views
+from api import async_views, views
 from rest_framework_nested import routers
 
 router = routers.DefaultRouter()
@@ -31,5 +31,14 @@ urlpatterns = [
     path(r'', include(ingredients_model_router.urls)),
     path(r'', include(reviews_router.urls)),
     path('recipe/by-tag/', views.RecipesByTagView.as_view(), name='recipes-by-tags'),# To view recipes by their tags
+    path('_metrics', views.MetricsView.as_view(), name='metrics'),# Prometheus scrape endpoint (admins only)
+    path('typeahead/', views.TypeaheadView.as_view(), name='typeahead'),# Name autocomplete for the recipe editor
+    # Async twins of the hot read paths (api.async_views), for ASGI workers
+    path('async/all_recipes/', async_views.recipe_list, name='async-recipes-list'),
+    path('async/all_recipes/<str:pk>/', async_views.recipe_detail, name='async-recipes-detail'),
+    path('async/all_recipes/<str:recipe_pk>/reviews/', async_views.review_list, name='async-recipe-reviews-list'),
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/all_tags/', async_views.tag_list, name='async-tags-list'),
+    path('async/all_categories/', async_views.category_list, name='async-categories-list'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
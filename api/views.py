@@ -1,16 +1,38 @@
 from django.shortcuts import render
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import UserSerializer, RecipeSerializer, IngredientNameSerializer, IngredientModelSerializer, PostImageSerializer, CategorySerializer, TagSerializer, FavoriteSerializer, ReviewSerializer, RoleRequestSerializer, ProductSerializer, OrderSerializer, OrderItemSerializer,ProductCategoriesSerializer
-from app.models import CustomUser, Recipe, IngredientName, IngredientModel, PostImage, Category, Tag, Favorite, Review, RoleRequest, Product, OrderItem, Order,ProductCategories
+from .serializers import UserSerializer, RecipeSerializer, IngredientNameSerializer, IngredientModelSerializer, IngredientListItemSerializer, PostImageSerializer, CategorySerializer, TagSerializer, FavoriteSerializer, ReviewSerializer, RoleRequestSerializer, ProductSerializer, OrderSerializer, OrderItemSerializer,ProductCategoriesSerializer, CheckoutSerializer
+from app.models import CustomUser, Recipe, IngredientName, IngredientModel, PostImage, Category, Tag, Favorite, Review, RoleRequest, Product, OrderItem, Order,ProductCategories, RecipeNeighbor
 from rest_framework import viewsets, status,permissions,generics,filters,parsers
 from django_filters.rest_framework import DjangoFilterBackend,OrderingFilter
 from rest_framework.permissions import BasePermission
 from .permissions import IsAdminUser, IsChefOrAdmin,IsRecipeAuthor
 from.paginations import CustomPageNumberPagination,ProductsPagePagination
+from .querysets import PlannedQuerysetMixin, RECIPE_PLANNER
+from .authentication import StatelessJWTAuthentication
+from .caching import CachedListMixin
+from .conditional import ConditionalGetMixin
+from .facets import FacetedListMixin
+from .fastpath import FastListMixin
+from .search import RankedSearchFilter, product_index, recipe_index
+from .filters import RecipeFilter
+from .ratings import RATINGS_VERSION, apply_rating_change
+from .bulk import IngredientListError, RecipeImporter, export_recipes, sync_recipe_ingredients
+from .pantry import pantry_index
+from .postings import BitsetResult, ingredient_bits, tag_postings_index
+from .similarity import similarity_index
+from .typeahead import SOURCES as TYPEAHEAD_SOURCES, typeahead_index
+from .exports import EXPORTERS, ExportFilterError, filter_orders
+from .checkout import CheckoutError, place_order
+from .metrics import render_prometheus
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.parsers import MultiPartParser, FormParser
 
 
@@ -26,7 +48,7 @@ class IsRecipeAuthorOrAdmin(BasePermission):
             return True
 
         # Write permissions are only allowed to the author of the recipe, or admin
-        return obj.author == request.user or request.user.role == 'admin' # Assuming you have a role field in the user model
+        return obj.author_id == request.user.pk or request.user.role == 'admin' # Assuming you have a role field in the user model
 
 
 class UserViewSet(viewsets.ModelViewSet):#To view all users
@@ -35,9 +57,11 @@ class UserViewSet(viewsets.ModelViewSet):#To view all users
     permission_classes = [IsAdminUser]
 
 
-class TagViewSet(viewsets.ModelViewSet):#To view all tags
+class TagViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):#To view all tags
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    cache_dependencies = (Tag,)
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -48,19 +72,65 @@ class TagViewSet(viewsets.ModelViewSet):#To view all tags
         return [permissions.AllowAny()]  # Anyone can view
 
 class RecipesByTagView(ListAPIView):# To filter recipes based on tags
+    """
+    Recipes by tag set algebra, newest first: ?tags= (any of), ?all_tags= (every one) and
+    ?exclude_tags= (none of), optionally narrowed by ?category= and ?ingredients= (every one).
+    Ids are repeated or comma separated. The filtering runs on api.postings' in-memory bitsets
+    and only the page's rows are read; cursor pages (?pagination=cursor) run it as SQL.
+    """
     serializer_class = RecipeSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    id_list_params = ('tags', 'all_tags', 'exclude_tags', 'ingredients')
 
-    def get_queryset(self):
-        tags = self.request.query_params.getlist('tags')  # Get tags as a list
-        if tags:
-            return Recipe.objects.filter(tags__id__in=tags).distinct()
-        return Recipe.objects.all()  # If no tag is provided, return all recipes
-
-
+    def get_filters(self):
+        params = self.request.query_params
+        try:
+            filters = {name: {int(value) for raw in params.getlist(name) for value in raw.split(',') if value.strip()}
+                       for name in self.id_list_params}
+            filters['category'] = int(params['category']) if params.get('category') else None
+        except ValueError:
+            raise ValidationError({"error": "Tag, category and ingredient ids must be integers."})
+        return filters
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        filters = self.get_filters()
+        queryset = Recipe.objects.all()
+        tagged = Recipe.tags.through.objects.values('recipe_id')
+        if filters['tags']:
+            queryset = queryset.filter(pk__in=tagged.filter(tag_id__in=filters['tags']))
+        for tag_id in filters['all_tags']:
+            queryset = queryset.filter(pk__in=tagged.filter(tag_id=tag_id))
+        if filters['exclude_tags']:
+            queryset = queryset.exclude(pk__in=tagged.filter(tag_id__in=filters['exclude_tags']))
+        for ingredient_id in filters['ingredients']:
+            queryset = queryset.filter(pk__in=Recipe.ingredients_used.through.objects.filter(
+                ingredientname_id=ingredient_id).values('recipe_id'))
+        if filters['category'] is not None:
+            queryset = queryset.filter(categories_id=filters['category'])
+        return RECIPE_PLANNER.plan(queryset.order_by('-pk'))
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None and self.paginator.wants_keyset(request):
+            return super().list(request, *args, **kwargs)
+        filters = self.get_filters()
+        tag_postings_index.ensure_fresh()
+        bits = tag_postings_index.select(
+            any_tags=filters['tags'], all_tags=filters['all_tags'], exclude_tags=filters['exclude_tags'],
+            category=filters['category'], required=ingredient_bits(filters['ingredients']) if filters['ingredients'] else (),
+        )
+        recipes = BitsetResult(bits, RECIPE_PLANNER.plan(Recipe.objects.all()))
+        page = self.paginate_queryset(recipes)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(recipes[:], many=True).data)
+
+
+
+class CategoryViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    cache_dependencies = (Category,)
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -71,16 +141,19 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return [permissions.AllowAny()]  # Anyone can view
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
+class RecipeViewSet(ConditionalGetMixin, CachedListMixin, FacetedListMixin, FastListMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.order_by('-created_at', '-id')  # Stable pages, served by recipe_created_idx
     serializer_class = RecipeSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter,]
-    filterset_fields = {
-        'categories': ['exact'],  # Exact match for categories
-        'tags': ['exact'],  # Exact match for tags
-        'ingredients_used': ['exact'],  # Exact match for ingredients
-    }
-    search_fields = ['title', 'description']
+    authentication_classes = [StatelessJWTAuthentication]
+    queryset_planner = RECIPE_PLANNER
+    cache_dependencies = (Recipe, RATINGS_VERSION, Tag, Category, IngredientName, PostImage)
+    detail_modified_field = 'updated_at'  # Touched by api.signals when images or M2M rows change
+    detail_dependencies = (Tag, Category, IngredientName)
+    always_loaded_fields = ('created_at', 'updated_at')  # Cursor pagination and ETags read them under ?fields=
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter,]
+    filterset_class = RecipeFilter  # categories/tags/ingredients_used exact matches plus min_rating
+    search_fields = ['title', 'description']  # Fallback when the database has no full-text index
+    search_index = recipe_index
     ordering_fields = ['title', 'created_at', 'rating']
     pagination_class = CustomPageNumberPagination
 
@@ -89,22 +162,116 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return [IsChefOrAdmin()]
         elif self.action in ['update', 'partial_update']:  # Chef can update only his recipes
             return [IsRecipeAuthorOrAdmin()]
-        elif self.action == 'destroy':
+        elif self.action in ['destroy', 'bulk_import', 'bulk_export']:
             return [IsAdminUser()]
         return [permissions.AllowAny()]  # Anyone can view
 
+    def perform_create(self, serializer):
+        serializer.save()
+        self.possible_duplicates = serializer.possible_duplicates
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Near-identical existing recipes (api.similarity), so clients can warn the chef
+        duplicates = dict(self.possible_duplicates)
+        titles = dict(Recipe.objects.filter(pk__in=duplicates).values_list('pk', 'title'))
+        response.data['possible_duplicates'] = [
+            {'id': recipe_id, 'title': titles[recipe_id], 'similarity': round(score, 4)}
+            for recipe_id, score in self.possible_duplicates if recipe_id in titles
+        ]
+        return response
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def my_recipes(self, request):
         """Retrieve recipes created by the logged-in user"""
-        recipes = Recipe.objects.filter(author=request.user)
+        recipes = self.get_queryset().filter(author_id=request.user.pk)
         serializer = self.get_serializer(recipes, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def pantry(self, request):
+        """Recipes ranked by how much of their ingredients_used the given ingredient ids cover"""
+        try:
+            owned = {int(value) for param in request.query_params.getlist('ingredients') for value in param.split(',') if value}
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response({"error": "ingredients and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        pantry_index.ensure_fresh()
+        matches = pantry_index.match(owned, limit=limit)
+        recipes = self.get_queryset().in_bulk([recipe_id for recipe_id, *_ in matches])
+        results = []
+        for recipe_id, coverage, satisfied, required in matches:
+            if recipe_id in recipes:
+                data = self.get_serializer(recipes[recipe_id]).data
+                data['coverage'] = round(coverage, 4)
+                data['missing_ingredients'] = required - satisfied
+                results.append(data)
+        return Response(results)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Recipes most often favorited by the same users, read from the precomputed RecipeNeighbor lists"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), settings.RECOMMENDATION_NEIGHBORS))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        neighbors = []
+        if pk.isdigit():
+            neighbors = list(RecipeNeighbor.objects.filter(recipe_id=pk).order_by('-score', 'neighbor_id')
+                             .values_list('neighbor_id', 'score')[:limit])
+        if not neighbors and not (pk.isdigit() and Recipe.objects.filter(pk=pk).exists()):
+            return Response({"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND)
+        recipes = self.get_queryset().in_bulk([neighbor_id for neighbor_id, _ in neighbors])
+        results = []
+        for neighbor_id, score in neighbors:
+            if neighbor_id in recipes:
+                data = self.get_serializer(recipes[neighbor_id]).data
+                data['similarity'] = round(score, 4)
+                results.append(data)
+        return Response(results)
+
+    @action(detail=True, methods=['get'])
+    def more_like_this(self, request, pk=None):
+        """Recipes sharing the most tags, ingredients and instruction words, found through the MinHash LSH index"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        similarity_index.ensure_fresh()
+        matches = similarity_index.similar_to(int(pk), limit=limit) if pk.isdigit() else []
+        if not matches and not (pk.isdigit() and Recipe.objects.filter(pk=pk).exists()):
+            return Response({"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND)
+        recipes = self.get_queryset().in_bulk([recipe_id for recipe_id, _ in matches])
+        results = []
+        for recipe_id, score in matches:
+            if recipe_id in recipes:
+                data = self.get_serializer(recipes[recipe_id]).data
+                data['similarity'] = round(score, 4)
+                results.append(data)
+        return Response(results)
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser])
+    def bulk_import(self, request):
+        """Import NDJSON recipes streamed in the request body; bad lines are reported, not fatal"""
+        report = RecipeImporter().run(request.stream or [])  # Read line by line, never the whole body at once
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export', permission_classes=[IsAdminUser])
+    def bulk_export(self, request):
+        """Stream every recipe as NDJSON"""
+        response = StreamingHttpResponse(export_recipes(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="recipes.ndjson"'
+        return response
+
 
 
 class IngredientNameViewSet(viewsets.ModelViewSet):
     queryset = IngredientName.objects.all()
     serializer_class = IngredientNameSerializer
+    authentication_classes = [StatelessJWTAuthentication]
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -117,17 +284,46 @@ class IngredientNameViewSet(viewsets.ModelViewSet):
 
 class IngredientModelViewSet(viewsets.ModelViewSet): #api/recipe/recipe_pk/ingredients_model
     serializer_class = IngredientModelSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     filter_backends = [DjangoFilterBackend]
     permission_classes = [IsAuthenticated, IsRecipeAuthor]
     def get_queryset(self):
         recipe_pk = self.kwargs['recipe_pk']  # Get recipe_pk from URL
         return IngredientModel.objects.filter(recipe_id=recipe_pk)
 
+    def perform_create(self, serializer):
+        # The serializer already fetched the recipe; check authorship on it instead of querying again
+        if serializer.validated_data['recipe'].author_id != self.request.user.pk:
+            raise PermissionDenied("Only the recipe's author can add ingredients to it.")
+        serializer.save()
+
+    @action(detail=False, methods=['put'], url_path='bulk')
+    def bulk_replace(self, request, recipe_pk=None):
+        """
+        PUT /api/all_recipes/{recipe_pk}/ingredients_model/bulk/ with the full ordered list replaces
+        the recipe's ingredient lines in one transaction: inserts, updates and deletes in bulk
+        """
+        serializer = IngredientListItemSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            # Locked, so two editors saving the same list apply one after the other
+            recipe = Recipe.objects.select_for_update().filter(pk=recipe_pk).first() if recipe_pk.isdigit() else None
+            if recipe is None:
+                return Response({"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND)
+            if recipe.author_id != request.user.pk:
+                raise PermissionDenied("Only the recipe's author can change its ingredients.")
+            try:
+                rows, counts = sync_recipe_ingredients(recipe, serializer.validated_data, request.user.pk)
+            except IngredientListError as exc:
+                return Response({"error": "Some ingredients are invalid.", "items": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({**counts, 'results': IngredientModelSerializer(rows, many=True).data})
+
 
 
 
 class ReviewViewSet(viewsets.ModelViewSet): #api/recipe/recipe_pk/reviews
     serializer_class = ReviewSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
     def get_queryset(self):
         return Review.objects.filter(recipe=self.kwargs['recipe_pk'])
@@ -142,36 +338,79 @@ class ReviewViewSet(viewsets.ModelViewSet): #api/recipe/recipe_pk/reviews
         except Recipe.DoesNotExist:
             return Response({"error": "Recipe not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        # serializer.save(recipe=recipe, user=request.user)
-        serializer.save(recipe=recipe)#Without user auth
+        with transaction.atomic():
+            # serializer.save(recipe=recipe, user=request.user)
+            review = serializer.save(recipe=recipe)#Without user auth
+            apply_rating_change(recipe.pk, added=review.rating)
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_recipe_id, old_rating = serializer.instance.recipe_id, serializer.instance.rating
+        review = serializer.save()
+        if review.recipe_id != old_recipe_id:
+            apply_rating_change(old_recipe_id, removed=old_rating)
+            apply_rating_change(review.recipe_id, added=review.rating)
+        elif review.rating != old_rating:
+            apply_rating_change(review.recipe_id, added=review.rating, removed=old_rating)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        recipe_id, rating = instance.recipe_id, instance.rating
+        instance.delete()
+        apply_rating_change(recipe_id, removed=rating)
+
 
 
 
 class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
-        return Favorite.objects.filter(user=user).distinct()
+        return Favorite.objects.filter(user_id=user.pk).distinct()
+
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        """Recipes similar to the user's most recent favorites, summed over them, minus what they already favorited"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        favorites = Favorite.objects.filter(user_id=request.user.pk)
+        recent = list(favorites.order_by('-added_at').values_list('recipe_id', flat=True)[:settings.RECOMMENDATION_SEED_FAVORITES])
+        ranked = list(RecipeNeighbor.objects.filter(recipe_id__in=recent).exclude(neighbor_id__in=favorites.values('recipe_id'))
+                      .values('neighbor_id').annotate(total=Sum('score')).order_by('-total', 'neighbor_id')
+                      .values_list('neighbor_id', 'total')[:limit])
+        recipes = RECIPE_PLANNER.plan(Recipe.objects.all()).in_bulk([recipe_id for recipe_id, _ in ranked])
+        context = self.get_serializer_context()
+        results = []
+        for recipe_id, score in ranked:
+            if recipe_id in recipes:
+                data = RecipeSerializer(recipes[recipe_id], context=context).data
+                data['score'] = round(score, 4)
+                results.append(data)
+        return Response(results)
 
 
 class RoleRequestViewSet(viewsets.ModelViewSet):
     serializer_class = RoleRequestSerializer
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         """Users see their own requests; admins see all requests"""
         if self.request.user.role == 'admin':
             return RoleRequest.objects.all()
-        return RoleRequest.objects.filter(user=self.request.user)
+        return RoleRequest.objects.filter(user_id=self.request.user.pk)
 
     def perform_create(self, serializer):
         """Ensure the request is created for the logged-in user"""
-        if RoleRequest.objects.filter(user=self.request.user).exists():
+        if RoleRequest.objects.filter(user_id=self.request.user.pk).exists():
             return Response({"error": "You already have a pending request."}, status=400)
         serializer.save(user=self.request.user)
 
@@ -200,15 +439,20 @@ class PostImageView(APIView):
 
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, CachedListMixin, FastListMixin, PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter,]
+    authentication_classes = [StatelessJWTAuthentication]
+    cache_dependencies = (Product, ProductCategories)
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter,]
     filterset_fields = {
         'category': ['exact'],  # Exact match for categories
     }
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'description']  # Fallback when the database has no full-text index
+    search_index = product_index
     pagination_class = ProductsPagePagination
+    always_loaded_fields = ('created_at',)
+    column_dependencies = {'image': ('image_variants',)}  # VariantImageField resolves ?image_size= from it
     parser_classes = (MultiPartParser, FormParser)
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -219,25 +463,62 @@ class ProductViewSet(viewsets.ModelViewSet):
         return [permissions.AllowAny()]  # Anyone can view
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(PlannedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    always_loaded_fields = ('created_at',)
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
         if self.action in ['create', 'update', 'partial_update']:
             return [IsChefOrAdmin()]
-        elif self.action == 'destroy':
+        elif self.action in ['destroy', 'export']:
             return [IsAdminUser()]
+        elif self.action == 'checkout':
+            return [IsAuthenticated()]
         return [permissions.AllowAny()]  # Anyone can view
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Create an order with all its items in one request, reserving stock atomically"""
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            order, items = place_order(request.user, serializer.validated_data['items'])
+        except CheckoutError as exc:
+            return Response({"error": "Some items could not be ordered.", "lines": exc.failures}, status=status.HTTP_409_CONFLICT)
+        data = OrderSerializer(order, context=self.get_serializer_context()).data
+        data['order_items'] = OrderItemSerializer(items, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream orders with their lines as CSV or NDJSON (?export_format=, ?start=, ?end=, ?status=)"""
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORTERS:
+            return Response({"error": f"export_format must be one of {sorted(EXPORTERS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = filter_orders(
+                start=request.query_params.get('start'),
+                end=request.query_params.get('end'),
+                status=request.query_params.get('status'),
+            )
+        except ExportFilterError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        exporter, content_type = EXPORTERS[export_format]
+        response = StreamingHttpResponse(exporter(queryset), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
+
 
 class OrderItemViewSet(viewsets.ModelViewSet):
     queryset = OrderItem.objects.all()
     serializer_class = OrderItemSerializer
+    authentication_classes = [StatelessJWTAuthentication]
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -250,6 +531,7 @@ class OrderItemViewSet(viewsets.ModelViewSet):
 class ProductCategoriesViewSet(viewsets.ModelViewSet):
     queryset = ProductCategories.objects.all()
     serializer_class = ProductCategoriesSerializer
+    authentication_classes = [StatelessJWTAuthentication]
 
     def get_permissions(self):
         """Assign different permissions based on actions."""
@@ -260,3 +542,33 @@ class ProductCategoriesViewSet(viewsets.ModelViewSet):
         return [permissions.AllowAny()]  # Anyone can view
 
 
+class TypeaheadView(APIView):
+    """Names starting with ?q= (at any word) per ?kind=ingredients,tags,categories, most used first"""
+    authentication_classes = []  # Public, and answered from memory: no user lookup either
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        kinds = list(dict.fromkeys(kind for param in request.query_params.getlist('kind') for kind in param.split(',') if kind))
+        if set(kinds) - TYPEAHEAD_SOURCES.keys():
+            return Response({"error": f"kind must be one of: {', '.join(TYPEAHEAD_SOURCES)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        typeahead_index.ensure_fresh()
+        prefix = request.query_params.get('q', '')
+        return Response({
+            kind: [{'id': entry_id, 'name': name, 'recipe_count': usage}
+                   for entry_id, name, usage in typeahead_index.lookup(kind, prefix, limit)]
+            for kind in kinds or TYPEAHEAD_SOURCES
+        })
+
+
+class MetricsView(APIView):
+    """Per-view request histograms of this process, in Prometheus text format."""
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,80 @@
+# Full-text search storage for recipes and products (see api/search.py).
+# PostgreSQL: a weighted tsvector column with a GIN index, plus pg_trgm indexes for typo-tolerant
+# short queries. SQLite: FTS5 shadow tables keyed by rowid. Other backends are left untouched and
+# keep SearchFilter's icontains lookups.
+
+from django.db import migrations
+
+RECIPE_DOCUMENT_PG = """
+    setweight(to_tsvector('english', coalesce(app_recipe.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(t.name, ' ') FROM app_recipe_tags rt JOIN app_tag t ON t.id = rt.tag_id
+        WHERE rt.recipe_id = app_recipe.id), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(i.name, ' ') FROM app_recipe_ingredients_used ri JOIN app_ingredientname i ON i.id = ri.ingredientname_id
+        WHERE ri.recipe_id = app_recipe.id), '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(app_recipe.description, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(app_recipe.instructions, '')), 'D')
+"""
+
+PRODUCT_DOCUMENT_PG = """
+    setweight(to_tsvector('english', coalesce(app_product.name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(app_product.description, '')), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, document, trigram_column in (
+            ('app_recipe', RECIPE_DOCUMENT_PG, 'title'),
+            ('app_product', PRODUCT_DOCUMENT_PG, 'name'),
+        ):
+            schema_editor.execute(f'ALTER TABLE {table} ADD COLUMN search_vector tsvector')
+            schema_editor.execute(f'UPDATE {table} SET search_vector = {document}')
+            schema_editor.execute(f'CREATE INDEX {table}_search_vector_gin ON {table} USING gin (search_vector)')
+            schema_editor.execute(
+                f'CREATE INDEX {table}_{trigram_column}_trgm ON {table} USING gin ({trigram_column} gin_trgm_ops)'
+            )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE app_recipe_fts USING fts5(title, tags, ingredients, description, instructions)'
+        )
+        schema_editor.execute("""
+            INSERT INTO app_recipe_fts (rowid, title, tags, ingredients, description, instructions)
+            SELECT r.id, r.title,
+                coalesce((SELECT group_concat(t.name, ' ') FROM app_recipe_tags rt
+                          JOIN app_tag t ON t.id = rt.tag_id WHERE rt.recipe_id = r.id), ''),
+                coalesce((SELECT group_concat(i.name, ' ') FROM app_recipe_ingredients_used ri
+                          JOIN app_ingredientname i ON i.id = ri.ingredientname_id WHERE ri.recipe_id = r.id), ''),
+                coalesce(r.description, ''), coalesce(r.instructions, '')
+            FROM app_recipe r
+        """)
+        schema_editor.execute('CREATE VIRTUAL TABLE app_product_fts USING fts5(name, description)')
+        schema_editor.execute("""
+            INSERT INTO app_product_fts (rowid, name, description)
+            SELECT id, name, coalesce(description, '') FROM app_product
+        """)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for table, trigram_column in (('app_recipe', 'title'), ('app_product', 'name')):
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_{trigram_column}_trgm')
+            schema_editor.execute(f'ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS app_recipe_fts')
+        schema_editor.execute('DROP TABLE IF EXISTS app_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_productcategories_product_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:21
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def backfill_ratings(apps, schema_editor):
+    Recipe = apps.get_model('app', 'Recipe')
+    Review = apps.get_model('app', 'Review')
+    histograms = {}
+    for row in Review.objects.values('recipe_id', 'rating').annotate(n=Count('id')):
+        histograms.setdefault(row['recipe_id'], {})[str(row['rating'])] = row['n']
+    recipes = list(Recipe.objects.filter(pk__in=histograms))
+    now = timezone.now()
+    for recipe in recipes:
+        recipe.updated_at = now  # Detail ETags/Last-Modified are built from it
+        histogram = histograms[recipe.pk]
+        recipe.rating_count = sum(histogram.values())
+        recipe.rating = sum(int(score) * n for score, n in histogram.items()) / recipe.rating_count
+        recipe.rating_histogram = histogram
+    Recipe.objects.bulk_update(recipes, ['rating', 'rating_count', 'rating_histogram', 'updated_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_histogram',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -13,6 +13,7 @@ class CustomUser(AbstractUser):
     username = models.CharField(max_length=50, unique=True)
     bio = models.TextField(blank=True, null=True)  # Allow empty bio
     image = models.ImageField(upload_to='images/', blank=True, null=True)  # Allow empty image
+    token_version = models.PositiveIntegerField(default=0)  # Bumped on role/activation changes; access tokens carry it
 
     groups = models.ManyToManyField(
         'auth.Group',
@@ -84,6 +85,17 @@ class Recipe(models.Model):
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='recipes')
     is_published = models.BooleanField(default=False)
     slug = models.SlugField(unique=True, blank=True, null=True)  # Add slug field and allow it to be blank
+    # Review aggregates, maintained incrementally by api.ratings so sorting/filtering never touches Review
+    rating = models.FloatField(default=0, db_index=True)  # Average review rating
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=dict, blank=True)  # {"5": 12, "4": 3, ...}
+
+    class Meta:
+        # Composite indexes matching the keyset pagination order (see api.paginations / advise_indexes)
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='recipe_created_idx'),
+            models.Index(fields=['author', '-created_at'], name='recipe_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -117,6 +129,9 @@ class Review(models.Model):
     comment = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['recipe', '-created_at', '-id'], name='review_recipe_created_idx')]
+
     def __str__(self):
         return f"Review by {self.user.username} on {self.recipe.title}"
 
@@ -127,6 +142,7 @@ class PostImage(models.Model):  # You'll need to define the fields for this mode
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='post_images', blank=True, null=True)
     image = models.ImageField(upload_to='post_images/',default = '', blank=True, null=True)
     alt_text = models.CharField(max_length=255, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # Resized copies written by api.images: {"thumbnail": "path", ...}
 
     def __str__(self):
         return f"Image for {self.recipe.title}"
@@ -140,11 +156,27 @@ class Favorite(models.Model):
 
     class Meta:
         unique_together = ('user', 'recipe') # Prevent duplicate favorites
+        indexes = [models.Index(fields=['user', '-added_at'], name='favorite_user_added_idx')]
 
     def __str__(self):
         return f"{self.user.username} favorited {self.recipe.title}"
 
 
+class RecipeNeighbor(models.Model):
+    """Precomputed "users who favorited this also favorited" top-N list, maintained by api.recommendations."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()  # Cosine similarity of the two recipes' (rating-weighted) favorite vectors
+    co_count = models.PositiveIntegerField()  # Users who favorited both
+
+    class Meta:
+        unique_together = ('recipe', 'neighbor')
+        indexes = [models.Index(fields=['recipe', '-score'], name='neighbor_recipe_score_idx')]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.neighbor_id} ({self.score:.3f})"
+
+
 
 class ProductCategories(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -161,9 +193,16 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)  # Number of items available
     image = models.ImageField(upload_to='product_images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # Resized copies written by api.images: {"thumbnail": "path", ...}
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(ProductCategories, on_delete=models.CASCADE, related_name='products',default='')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -173,6 +212,12 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=20, choices=[('pending', 'Pending'), ('completed', 'Completed')], default='pending')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 